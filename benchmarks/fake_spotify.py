@@ -0,0 +1,510 @@
+"""
+A local stand-in for the Spotify Web API, for benchmarks and offline runs.
+
+Emulates the endpoints the server uses with generated, deterministic data:
+search, tracks, artists, me, me/playlists, playlists/{id},
+playlists/{id}/tracks (including adding and replacing tracks),
+users/{id}/playlists, me/tracks, me/top/tracks, me/player/recently-played and
+me/player/*, where every context plays tracks in numbered order. Library and
+playlist reads carry ETags and honour If-None-Match. Latency, page sizes,
+collection sizes and HTTP 429 injection are configurable. Any bearer token is
+accepted.
+
+Point the server at it with:
+    python benchmarks/fake_spotify.py --port 8765 --latency-ms 50
+    SPOTIFY_MCP_API_BASE_URL=http://127.0.0.1:8765/v1/ \\
+    SPOTIFY_MCP_ACCESS_TOKEN=fake python src/main.py
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, cast
+from urllib.parse import parse_qs, urlsplit
+
+# Reads answered with an ETag, and 304 Not Modified when it still matches.
+_ETAG_PATHS = ("playlists/", "me/playlists", "me/tracks", "me/top/")
+# Spotify IDs are 22 base-62 characters; so are the generated ones, so that
+# ID handling (such as metric labels) behaves as it does against Spotify.
+_ID_RE = re.compile(r"[0-9A-Za-z]{22}")
+
+
+@dataclass
+class FakeSpotifyConfig:
+    """
+    Args:
+        latency (float): Seconds added to every response.
+        max_page_size (int): The largest page returned, whatever the
+            requested limit.
+        playlists (int): Number of the user's playlists.
+        playlist_tracks (int): Number of tracks in each playlist.
+        saved_tracks (int): Number of the user's liked songs.
+        top_tracks (int): Number of top tracks for each time range.
+        recent_tracks (int): Number of recently played tracks.
+        devices (int): Number of available devices.
+        rate_limit_every (int): Answer every Nth request with HTTP 429;
+            0 disables injection.
+        retry_after (int): The Retry-After header sent with a 429.
+    """
+
+    latency: float = 0.0
+    max_page_size: int = 50
+    playlists: int = 120
+    playlist_tracks: int = 200
+    saved_tracks: int = 500
+    top_tracks: int = 50
+    recent_tracks: int = 50
+    devices: int = 2
+    rate_limit_every: int = 0
+    retry_after: int = 1
+
+
+def spotify_id(kind: str, n: int) -> str:
+    """
+    A deterministic 22-character ID for the ``n``th object of a kind.
+    """
+    return f"{kind[0]}{n:021d}"
+
+
+_USER_ID = spotify_id("user", 0)
+_GENRES = [
+    "pop",
+    "dance pop",
+    "rock",
+    "indie rock",
+    "hip hop",
+    "jazz",
+    "house",
+    "techno",
+    "folk",
+    "classical",
+]
+
+
+def _artist(n: int) -> dict:
+    artist_id = spotify_id("artist", n)
+    return {
+        "id": artist_id,
+        "uri": f"spotify:artist:{artist_id}",
+        "name": f"Artist {n}",
+        "genres": [_GENRES[n % 10], _GENRES[(n * 3 + 1) % 10]],
+        "popularity": n * 13 % 101,
+    }
+
+
+def _track(n: int) -> dict:
+    track_id = spotify_id("track", n)
+    return {
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "name": f"Song {n}",
+        "artists": [
+            {
+                "id": spotify_id("artist", n % 97),
+                "uri": f"spotify:artist:{spotify_id('artist', n % 97)}",
+                "name": f"Artist {n % 97}",
+            }
+        ],
+        "album": {
+            "id": spotify_id("album", n % 311),
+            "name": f"Album {n % 311}",
+            "release_date": f"{1970 + n % 55}-01-01",
+        },
+        "duration_ms": 180_000 + n % 120_000,
+        "popularity": n * 37 % 101,
+        "explicit": False,
+    }
+
+
+def _playlist(n: int, tracks: int) -> dict:
+    playlist_id = spotify_id("playlist", n)
+    return {
+        "id": playlist_id,
+        "uri": f"spotify:playlist:{playlist_id}",
+        "name": f"Playlist {n}",
+        "snapshot_id": f"snapshot-{n}",
+        "owner": {"id": _USER_ID, "display_name": "Fake User"},
+        "public": False,
+        "tracks": {"total": tracks},
+    }
+
+
+# Timestamps are relative to startup so that they stay stable between requests.
+_STARTED = time.time()
+
+
+def _timestamp(seconds_ago: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_STARTED - seconds_ago))
+
+
+class FakeSpotify:
+    """
+    The fake API's state: its configuration, the player and request counts.
+    """
+
+    def __init__(self, config: FakeSpotifyConfig | None = None):
+        self.config = config or FakeSpotifyConfig()
+        self.requests: Counter[str] = Counter()
+        self.player: dict[str, Any] = {
+            "is_playing": False,
+            "shuffle_state": False,
+            "track": 0,
+            "context": None,
+        }
+        self.queue: list[str] = []
+        # Track numbers of the playlists that were created or changed.
+        self.playlist_contents: dict[int, list[int]] = {}
+        self.playlist_versions: Counter[int] = Counter()
+        self._lock = threading.Lock()
+        self._seen = 0
+
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    def _contents(self, playlist: int) -> list[int]:
+        if playlist in self.playlist_contents:
+            return self.playlist_contents[playlist]
+        if playlist >= self.config.playlists:
+            return []
+        return [playlist * 1000 + n for n in range(self.config.playlist_tracks)]
+
+    def _playlist(self, playlist: int) -> dict:
+        result = _playlist(playlist, len(self._contents(playlist)))
+        if self.playlist_versions[playlist]:
+            result["snapshot_id"] += f"-{self.playlist_versions[playlist]}"
+        return result
+
+    def _write_playlist(self, playlist: int, tracks: list[int]) -> dict:
+        with self._lock:
+            self.playlist_contents[playlist] = tracks
+            self.playlist_versions[playlist] += 1
+        return {"snapshot_id": self._playlist(playlist)["snapshot_id"]}
+
+    def _page(self, items: list, query: dict, total: int, path: str) -> dict:
+        offset = int(query.get("offset", 0))
+        limit = min(int(query.get("limit", 20)), self.config.max_page_size)
+        page = items[offset : offset + limit]
+        following = offset + limit
+        return {
+            "href": path,
+            "items": page,
+            "limit": limit,
+            "offset": offset,
+            "total": total,
+            "previous": None,
+            "next": (
+                f"{path}?offset={following}&limit={limit}"
+                if following < total
+                else None
+            ),
+        }
+
+    def handle(
+        self, method: str, path: str, query: dict, body: dict | None
+    ) -> tuple[int, dict | None, dict]:
+        """
+        Answer one request.
+
+        Returns:
+            tuple[int, dict | None, dict]: The status, JSON body and headers.
+        """
+        endpoint = _ID_RE.sub("{id}", path)
+        with self._lock:
+            self._seen += 1
+            self.requests[f"{method} {endpoint}"] += 1
+            throttle = (
+                self.config.rate_limit_every
+                and self._seen % self.config.rate_limit_every == 0
+            )
+        if throttle:
+            return (
+                429,
+                {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                {"Retry-After": str(self.config.retry_after)},
+            )
+        base = "http://{host}/v1/"
+        config = self.config
+
+        if method == "GET" and endpoint == "search":
+            limit = min(int(query.get("limit", 10)), config.max_page_size)
+            offset = int(query.get("offset", 0))
+            result = {}
+            # A query naming "Song N" or "Playlist N" finds that item first.
+            named = re.search(r"(?:song|playlist) (\d+)", query.get("q", ""), re.I)
+            seed = int(named.group(1)) if named else sum(map(ord, query.get("q", "")))
+            for kind in query.get("type", "track").split(","):
+                if kind == "track":
+                    items = [_track(seed + offset + i) for i in range(limit)]
+                elif kind == "playlist":
+                    items = [
+                        _playlist(seed + offset + i, config.playlist_tracks)
+                        for i in range(limit)
+                    ]
+                else:
+                    items = []
+                result[f"{kind}s"] = {
+                    "items": items,
+                    "limit": limit,
+                    "offset": offset,
+                    "total": 1000,
+                    "next": None,
+                }
+            return 200, result, {}
+        if method == "GET" and endpoint in ("tracks", "artists"):
+            ids = query.get("ids", "").split(",")
+            if len(ids) > 50:
+                return (
+                    400,
+                    {"error": {"status": 400, "message": "Too many ids requested"}},
+                    {},
+                )
+            make = _track if endpoint == "tracks" else _artist
+            return 200, {endpoint: [make(int(i[1:])) for i in ids]}, {}
+        if method == "GET" and endpoint == "me":
+            return 200, {"id": _USER_ID, "display_name": "Fake User"}, {}
+        if method == "GET" and endpoint == "me/playlists":
+            count = max([config.playlists - 1, *self.playlist_contents]) + 1
+            items = [self._playlist(n) for n in range(count)]
+            return 200, self._page(items, query, count, base + path), {}
+        if method == "POST" and endpoint == "users/{id}/playlists":
+            playlist = max([config.playlists - 1, *self.playlist_contents]) + 1
+            self._write_playlist(playlist, [])
+            return 201, self._playlist(playlist) | {"name": (body or {})["name"]}, {}
+        playlist = (
+            int(path.split("/")[1][1:]) if endpoint.startswith("playlists/{id}") else 0
+        )
+        if method == "GET" and endpoint == "playlists/{id}":
+            return 200, self._playlist(playlist), {}
+        if method == "GET" and endpoint == "playlists/{id}/tracks":
+            items = [
+                {"added_at": _timestamp(n * 3600), "track": _track(track)}
+                for n, track in enumerate(self._contents(playlist))
+            ]
+            return 200, self._page(items, query, len(items), base + path), {}
+        if method in ("POST", "PUT") and endpoint == "playlists/{id}/tracks":
+            uris = (body or {}).get("uris", [])
+            if len(uris) > 100:
+                return (
+                    400,
+                    {"error": {"status": 400, "message": "Too many ids requested"}},
+                    {},
+                )
+            tracks = [int(uri.rsplit(":", 1)[-1][1:]) for uri in uris]
+            if method == "POST":
+                tracks = self._contents(playlist) + tracks
+            status = 201 if method == "POST" else 200
+            return status, self._write_playlist(playlist, tracks), {}
+        if method == "GET" and endpoint == "me/tracks":
+            items = [
+                {"added_at": _timestamp(n * 3600), "track": _track(n)}
+                for n in range(config.saved_tracks)
+            ]
+            return 200, self._page(items, query, config.saved_tracks, base + path), {}
+        if method == "GET" and endpoint == "me/top/tracks":
+            shift = {"short_term": 0, "medium_term": 7, "long_term": 13}.get(
+                query.get("time_range", "medium_term"), 0
+            )
+            items = [_track(n * 3 + shift) for n in range(config.top_tracks)]
+            return 200, self._page(items, query, config.top_tracks, base + path), {}
+        if method == "GET" and endpoint == "me/player/recently-played":
+            limit = min(int(query.get("limit", 20)), config.max_page_size)
+            # Plays are whole seconds apart and cycle through 10 tracks, so that
+            # they repeat; ``after`` is in milliseconds.
+            after = int(query.get("after", 0)) // 1000
+            ages = [
+                n * 200
+                for n in range(config.recent_tracks)
+                if int(_STARTED) - n * 200 > after
+            ][:limit]
+            items = [
+                {"played_at": _timestamp(age), "track": _track(age // 200 % 10 * 5)}
+                for age in ages
+            ]
+            cursors = (
+                {
+                    "after": str((int(_STARTED) - ages[0]) * 1000),
+                    "before": str((int(_STARTED) - ages[-1]) * 1000),
+                }
+                if ages
+                else None
+            )
+            return 200, {"items": items, "next": None, "cursors": cursors}, {}
+        if method == "GET" and endpoint == "me/player/devices":
+            devices = [
+                {
+                    "id": f"device{n}",
+                    "name": f"Device {n}",
+                    "type": "Computer",
+                    "is_active": n == 0,
+                    "volume_percent": 50,
+                }
+                for n in range(config.devices)
+            ]
+            return 200, {"devices": devices}, {}
+        if method == "GET" and endpoint in ("me/player", "me/player/currently-playing"):
+            if not self.player["is_playing"] and not self.player["track"]:
+                return 204, None, {}
+            return (
+                200,
+                {
+                    "is_playing": self.player["is_playing"],
+                    "shuffle_state": self.player["shuffle_state"],
+                    "progress_ms": 1000,
+                    "item": _track(self.player["track"]),
+                    "device": {"id": "device0", "name": "Device 0"},
+                    "context": {"uri": self.player["context"]}
+                    if self.player["context"]
+                    else None,
+                },
+                {},
+            )
+        if method == "GET" and endpoint == "me/player/queue":
+            # The context plays tracks in numbered order.
+            track = self.player["track"]
+            return (
+                200,
+                {
+                    "currently_playing": _track(track),
+                    "queue": [_track(track + n) for n in range(1, 21)],
+                },
+                {},
+            )
+        if method == "PUT" and endpoint == "me/player/play":
+            self.player["is_playing"] = True
+            body = body or {}
+            if body.get("context_uri"):
+                self.player["context"] = body["context_uri"]
+            if body.get("uris"):
+                self.player["context"] = None
+            uri = body["uris"][0] if body.get("uris") else None
+            uri = (body.get("offset") or {}).get("uri", uri)
+            if uri:
+                track_id = uri.rsplit(":", 1)[-1]
+                self.player["track"] = (
+                    int(track_id[1:]) if track_id[1:].isdigit() else 0
+                )
+            return 204, None, {}
+        if method == "PUT" and endpoint == "me/player/pause":
+            self.player["is_playing"] = False
+            return 204, None, {}
+        if method == "PUT" and endpoint == "me/player/shuffle":
+            self.player["shuffle_state"] = query.get("state") == "true"
+            return 204, None, {}
+        if method == "POST" and endpoint in ("me/player/next", "me/player/previous"):
+            self.player["track"] += 1 if endpoint.endswith("next") else -1
+            return 204, None, {}
+        if method == "POST" and endpoint == "me/player/queue":
+            self.queue.append(query.get("uri", ""))
+            return 204, None, {}
+        return 404, {"error": {"status": 404, "message": "Service not found"}}, {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid delayed-ACK stalls.
+    disable_nagle_algorithm = True
+
+    def _respond(self) -> None:
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else None
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        path = url.path.removeprefix("/v1/").strip("/")
+        api = cast("FakeSpotifyServer", self.server).api
+        if api.config.latency:
+            time.sleep(api.config.latency)
+        status, payload, headers = api.handle(self.command, path, query, body)
+        data = b""
+        if payload is not None:
+            data = json.dumps(payload).replace("{host}", self.headers["Host"]).encode()
+        if self.command == "GET" and status == 200 and path.startswith(_ETAG_PATHS):
+            headers["ETag"] = f'"{hashlib.md5(data).hexdigest()}"'
+            if self.headers.get("If-None-Match") == headers["ETag"]:
+                status, data = 304, b""
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_PUT = do_POST = do_DELETE = _respond
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, api: FakeSpotify, host: str = "127.0.0.1", port: int = 0):
+        self.api = api
+        super().__init__((host, port), _Handler)
+
+    @property
+    def base_url(self) -> str:
+        host, port = cast(tuple[str, int], self.server_address[:2])
+        return f"http://{host}:{port}/v1/"
+
+    def start(self) -> "FakeSpotifyServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FakeSpotifyConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency * 1000)
+    parser.add_argument("--page-size", type=int, default=defaults.max_page_size)
+    parser.add_argument("--playlists", type=int, default=defaults.playlists)
+    parser.add_argument("--playlist-tracks", type=int, default=defaults.playlist_tracks)
+    parser.add_argument("--saved-tracks", type=int, default=defaults.saved_tracks)
+    parser.add_argument("--top-tracks", type=int, default=defaults.top_tracks)
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        default=defaults.rate_limit_every,
+        help="answer every Nth request with HTTP 429",
+    )
+    parser.add_argument("--retry-after", type=int, default=defaults.retry_after)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeSpotifyConfig:
+    return FakeSpotifyConfig(
+        latency=args.latency_ms / 1000,
+        max_page_size=args.page_size,
+        playlists=args.playlists,
+        playlist_tracks=args.playlist_tracks,
+        saved_tracks=args.saved_tracks,
+        top_tracks=args.top_tracks,
+        rate_limit_every=args.rate_limit_every,
+        retry_after=args.retry_after,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = FakeSpotifyServer(
+        FakeSpotify(config_from_args(args)), args.host, args.port
+    )
+    print(f"Fake Spotify Web API at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
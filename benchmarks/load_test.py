@@ -0,0 +1,188 @@
+"""
+Load-test the SSE server with many concurrent MCP sessions.
+
+Starts ``fake_spotify.py`` in-process and ``src/main.py --transport sse`` as
+a subprocess pointed at it, then opens ``--clients`` MCP sessions over SSE,
+spread across ``--users`` Spotify users, which call a mix of tools and
+resources back to back for ``--duration`` seconds. Reports requests per
+second, p50/p99 latency and errors, then stops the server with SIGTERM to
+exercise graceful shutdown. No Spotify account is needed.
+
+Usage:
+    python benchmarks/load_test.py --clients 50 --users 10 --duration 20
+    python benchmarks/load_test.py --workers 4 --clients 100 --latency-ms 30
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from fake_spotify import (
+    FakeSpotify,
+    FakeSpotifyServer,
+    add_config_arguments,
+    config_from_args,
+)
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from pydantic import AnyUrl
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+# The calls each session cycles through, as (kind, name, arguments).
+MIX = [
+    ("tool", "get_currently_playing", {}),
+    ("tool", "find_user_playlists", {"playlist_name": "Playlist 42"}),
+    ("tool", "play_song_by_artist_song", {"artist": "Artist 3", "song": "Song 100"}),
+    ("resource", "read://top_tracks_short_term", None),
+    ("tool", "play_user_playlist_by_name", {"playlist_name": "Playlist 42"}),
+    ("resource", "read://recent_tracks", None),
+    ("resource", "playback://state", None),
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_healthy(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not become healthy")
+
+
+async def _client(
+    url: str, user: str | None, deadline: float, timings: list[float], errors: list
+) -> None:
+    headers = {"X-Spotify-User": user} if user else None
+    async with sse_client(f"{url}/sse", headers=headers) as streams:
+        async with ClientSession(*streams) as session:
+            await session.initialize()
+            n = 0
+            while time.monotonic() < deadline:
+                kind, name, arguments = MIX[n % len(MIX)]
+                n += 1
+                start = time.perf_counter()
+                try:
+                    if kind == "tool":
+                        result = await session.call_tool(name, arguments)
+                        if result.isError:
+                            raise RuntimeError(
+                                getattr(result.content[0], "text", "tool error")
+                            )
+                    else:
+                        await session.read_resource(AnyUrl(name))
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+                timings.append((time.perf_counter() - start) * 1000)
+
+
+async def load(urls: list[str], clients: int, users: int, duration: float) -> dict:
+    timings: list[float] = []
+    errors: list[str] = []
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(
+                urls[n % len(urls)],
+                f"user-{n % users}" if users > 1 else None,
+                deadline,
+                timings,
+                errors,
+            )
+            for n in range(clients)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(timings),
+        "rps": len(timings) / elapsed,
+        "p50_ms": percentile(timings, 0.5) if timings else 0.0,
+        "p99_ms": percentile(timings, 0.99) if timings else 0.0,
+        "errors": errors,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    api = FakeSpotify(config_from_args(args))
+    fake = FakeSpotifyServer(api).start()
+    data = Path(tempfile.mkdtemp())
+    port = _free_port()
+    # Lift the request rate limit, unless set explicitly, so that the numbers
+    # measure the server rather than the token bucket.
+    env = {
+        "SPOTIFY_MCP_RATE_LIMIT": "10000",
+        "SPOTIFY_MCP_RATE_LIMIT_BURST": "10000",
+        **os.environ,
+        "SPOTIFY_MCP_API_BASE_URL": fake.base_url,
+        "SPOTIFY_MCP_ACCESS_TOKEN": "load-test",
+        "SPOTIFY_MCP_DB_PATH": str(data / "load-test.sqlite"),
+        "SPOTIFY_MCP_USER_DATA_DIR": str(data / "users"),
+    }
+    env.pop("SPOTIFY_MCP_SERVER_API_KEY", None)
+    proc = subprocess.Popen(
+        [sys.executable, str(MAIN), "--transport", "sse", "--host", "127.0.0.1"]
+        + ["--port", str(port), "--workers", str(args.workers)],
+        env=env,
+    )
+    urls = [f"http://127.0.0.1:{port + n}" for n in range(args.workers)]
+    try:
+        for url in urls:
+            _wait_healthy(url, proc)
+        result = asyncio.run(load(urls, args.clients, args.users, args.duration))
+    finally:
+        stop = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        code = proc.wait(timeout=60)
+        shutdown_ms = (time.perf_counter() - stop) * 1000
+        fake.shutdown()
+
+    print(
+        f"{args.clients} clients, {args.users} users, {args.workers} workers, "
+        f"{args.duration:.0f}s"
+    )
+    print(f"requests:   {result['requests']}")
+    print(f"throughput: {result['rps']:.1f} req/s")
+    print(f"latency:    p50 {result['p50_ms']:.1f}ms  p99 {result['p99_ms']:.1f}ms")
+    print(f"errors:     {len(result['errors'])}")
+    for error in sorted(set(result["errors"]))[:5]:
+        print(f"  {error}")
+    print(f"upstream requests: {api.total_requests()}")
+    print(f"shutdown: {shutdown_ms:.0f}ms, exit code {code}")
+    # uvicorn re-raises the signal it stopped on once shut down.
+    return 1 if result["errors"] or code not in (0, -signal.SIGTERM) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
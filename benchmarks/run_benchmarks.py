@@ -0,0 +1,156 @@
+"""
+Benchmark every MCP tool and resource against the local fake Spotify API.
+
+Starts ``fake_spotify.py`` in-process, points the server at it and calls
+each tool and resource ``--iterations`` times in registration order. For
+each one it reports the first call's latency, p50/p99 latency over all
+calls, and the upstream requests made by the first call and on average, so
+both cold paths and cached paths show up in the numbers. The request rate
+limit is lifted unless ``SPOTIFY_MCP_RATE_LIMIT`` is set. No Spotify account
+is needed.
+
+Usage:
+    python benchmarks/run_benchmarks.py --iterations 20 --latency-ms 30
+    python benchmarks/run_benchmarks.py --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from fake_spotify import (
+    FakeSpotify,
+    FakeSpotifyServer,
+    add_config_arguments,
+    config_from_args,
+    spotify_id,
+)
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# Arguments for tool parameters and resource template variables, by name.
+SAMPLE_ARGUMENTS = {
+    "uri": f"spotify:track:{spotify_id('track', 7)}",
+    "playlist_name": "Playlist 42",
+    "artist": "Artist 3",
+    "song": "Song 100",
+    "songs": [{"artist": f"Artist {n}", "song": f"Song {n}"} for n in range(10)],
+    "device_name": "Device 1",
+    "name": "Benchmark Playlist",
+    "track_uris": [f"spotify:track:{spotify_id('track', n)}" for n in range(250)],
+    "commands": ["next", "next", "next", "pause", "play"],
+}
+# Resource template variables end up in a URI host, so they cannot hold spaces.
+TEMPLATE_ARGUMENTS = {"artist": "Artist-3", "song": "Song-100"}
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def benchmark(api: FakeSpotify, iterations: int) -> list[dict]:
+    import main  # noqa: F401 - registers the tools and resources
+    from server import mcp
+
+    targets: list[tuple[str, Callable[[], Awaitable[Any]]]] = []
+    for tool in await mcp.list_tools():
+        required = tool.inputSchema.get("required", [])
+        missing = [name for name in required if name not in SAMPLE_ARGUMENTS]
+        if missing:
+            print(f"skipping tool {tool.name}: no sample for {missing}")
+            continue
+        arguments = {name: SAMPLE_ARGUMENTS[name] for name in required}
+        targets.append(
+            (f"tool {tool.name}", partial(mcp.call_tool, tool.name, arguments))
+        )
+    for resource in await mcp.list_resources():
+        uri = str(resource.uri)
+        targets.append((f"resource {uri}", partial(mcp.read_resource, uri)))
+    for template in await mcp.list_resource_templates():
+        uri = re.sub(
+            r"{(\w+)}", lambda m: TEMPLATE_ARGUMENTS[m.group(1)], template.uriTemplate
+        )
+        targets.append(
+            (f"resource {template.uriTemplate}", partial(mcp.read_resource, uri))
+        )
+
+    results = []
+    for name, call in targets:
+        timings, upstream, errors = [], [], 0
+        for _ in range(iterations):
+            before = api.total_requests()
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            timings.append((time.perf_counter() - start) * 1000)
+            upstream.append(api.total_requests() - before)
+        results.append(
+            {
+                "name": name,
+                "first_ms": timings[0],
+                "p50_ms": percentile(timings, 0.5),
+                "p99_ms": percentile(timings, 0.99),
+                "first_upstream": upstream[0],
+                "mean_upstream": statistics.mean(upstream),
+                "errors": errors,
+            }
+        )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    api = FakeSpotify(config_from_args(args))
+    server = FakeSpotifyServer(api).start()
+    # Settings are read at import, so configure the server before importing it.
+    # Lift the request rate limit, unless set explicitly, so that the numbers
+    # measure the server rather than the token bucket.
+    os.environ.setdefault("SPOTIFY_MCP_RATE_LIMIT", "10000")
+    os.environ.setdefault("SPOTIFY_MCP_RATE_LIMIT_BURST", "10000")
+    os.environ.update(
+        SPOTIFY_MCP_API_BASE_URL=server.base_url,
+        SPOTIFY_MCP_ACCESS_TOKEN="benchmark",
+        SPOTIFY_MCP_DB_PATH=str(Path(tempfile.mkdtemp(), "benchmark.sqlite")),
+    )
+    sys.path.insert(0, str(SRC))
+    try:
+        results = asyncio.run(benchmark(api, args.iterations))
+    finally:
+        server.shutdown()
+
+    width = max(len(r["name"]) for r in results)
+    print(
+        f"{'':{width}}  {'first':>8}  {'p50':>8}  {'p99':>8}  "
+        f"{'calls 1st':>9}  {'calls avg':>9}  errors"
+    )
+    for r in results:
+        print(
+            f"{r['name']:{width}}  {r['first_ms']:7.1f}ms  {r['p50_ms']:7.1f}ms  "
+            f"{r['p99_ms']:7.1f}ms  {r['first_upstream']:9d}  "
+            f"{r['mean_upstream']:9.1f}  {r['errors']}"
+        )
+    print(f"total upstream requests: {api.total_requests()}")
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
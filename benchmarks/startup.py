@@ -0,0 +1,104 @@
+"""
+Measure MCP server cold start: process spawn to the first tools/list response.
+
+Spawns ``src/main.py`` over stdio the way MCP hosts do, performs the
+initialize handshake and times how long it takes until the tool list comes
+back. No Spotify credentials are needed, since the client is created lazily.
+
+Usage:
+    python benchmarks/startup.py --runs 10 --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+MAIN = Path(__file__).resolve().parent.parent / "src" / "main.py"
+
+
+def _send(proc: subprocess.Popen, message: dict) -> None:
+    assert proc.stdin is not None
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _read_response(proc: subprocess.Popen, request_id: int) -> dict:
+    assert proc.stdout is not None
+    for line in proc.stdout:
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            return message
+    raise RuntimeError("Server exited before responding")
+
+
+def measure_once() -> float:
+    """
+    Start the server and return the seconds until tools/list is answered.
+    """
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(MAIN)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env=env,
+    )
+    try:
+        _send(
+            proc,
+            {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "initialize",
+                "params": {
+                    "protocolVersion": "2024-11-05",
+                    "capabilities": {},
+                    "clientInfo": {"name": "startup-benchmark", "version": "0"},
+                },
+            },
+        )
+        _read_response(proc, 1)
+        _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        response = _read_response(proc, 2)
+        elapsed = time.perf_counter() - start
+        if "error" in response or not response["result"]["tools"]:
+            raise RuntimeError(f"Unexpected tools/list response: {response}")
+        return elapsed
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="fail if the median cold start exceeds this many milliseconds",
+    )
+    args = parser.parse_args()
+
+    timings = [measure_once() * 1000 for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(
+        f"cold start to tools/list over {args.runs} runs: "
+        f"min {min(timings):.0f} ms, median {median:.0f} ms, max {max(timings):.0f} ms"
+    )
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"over budget: {median:.0f} ms > {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
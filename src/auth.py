@@ -1,13 +1,63 @@
+import os
+from functools import cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import spotipy
-from dotenv import find_dotenv, load_dotenv
-from spotipy.oauth2 import SpotifyOAuth
+from config import ACCESS_TOKEN
+from sessions import per_user, sessions, user_path
+from spotify import AsyncSpotify
+from tokens import TokenManager
+
+if TYPE_CHECKING:
+    from spotipy.oauth2 import SpotifyOAuth
+
+CACHE_PATH = Path(Path.home(), ".spotify_mcp_cache")
+
+
+@cache
+def _load_env() -> None:
+    from dotenv import find_dotenv, load_dotenv
+
+    load_dotenv(find_dotenv())
 
 
 class SpotipyClient:
+    """
+    The server's Spotify client.
+
+    Construction is cheap: credentials are loaded, and the token cache read,
+    only when the first request needs a token, so the MCP handshake never
+    waits on, or fails because of, authentication. Tokens are then served
+    from memory by a ``TokenManager``; spotipy's OAuth manager is imported
+    only for the first-time interactive authorization.
+
+    Each user (see ``sessions.current_user``) has their own token manager
+    and token cache, while every user shares ``sp`` and so its connection
+    pool, request scheduler and metrics.
+    """
+
     def __init__(self):
-        load_dotenv(find_dotenv())
+        self.tokens = per_user(self._token_manager)
+        self.sp = AsyncSpotify(
+            token_provider=self._static_token if ACCESS_TOKEN else self._user_token
+        )
+
+    def _token_manager(self, user: str | None) -> TokenManager:
+        return TokenManager(
+            user_path(CACHE_PATH, user),
+            credentials=self._credentials,
+            # Other users are named by network clients, so only the default,
+            # local user may start the interactive authorization.
+            authorize=self._authorize if user is None else None,
+        )
+
+    async def _user_token(self) -> str:
+        return await self.tokens.access_token()
+
+    def auth_manager(self, user: str | None = None) -> "SpotifyOAuth":
+        from spotipy.oauth2 import SpotifyOAuth
+
+        _load_env()
         scope = [
             "user-library-read",
             "user-read-playback-state",
@@ -20,10 +70,37 @@ class SpotipyClient:
             "user-read-recently-played",
             "user-top-read",
         ]
-        cache_path = Path(Path.home(), ".spotify_mcp_cache")
-        self.sp = spotipy.Spotify(
-            auth_manager=SpotifyOAuth(scope=scope, cache_path=cache_path)
-        )
+        return SpotifyOAuth(scope=scope, cache_path=user_path(CACHE_PATH, user))
+
+    @staticmethod
+    async def _static_token() -> str:
+        if ACCESS_TOKEN is None:
+            raise Exception("SPOTIFY_MCP_ACCESS_TOKEN is not set.")
+        return ACCESS_TOKEN
+
+    def _credentials(self) -> tuple[str, str]:
+        _load_env()
+        return os.environ["SPOTIPY_CLIENT_ID"], os.environ["SPOTIPY_CLIENT_SECRET"]
+
+    def _authorize(self, user: str | None = None) -> dict:
+        # Blocking: spotipy opens the browser and waits for the redirect.
+        auth_manager = self.auth_manager(user)
+        auth_manager.get_access_token(as_dict=False)
+        token = auth_manager.cache_handler.get_cached_token()
+        if token is None:
+            raise Exception(f"Authorization of user {user!r} stored no token.")
+        return token
+
+    async def aclose(self) -> None:
+        await sessions.aclose()
+        await self.sp.aclose()
 
 
 client = SpotipyClient()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Authorize a user of a multi-user server once: python src/auth.py <user>
+    client._authorize(sys.argv[1] if len(sys.argv) > 1 else None)
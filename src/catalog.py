@@ -0,0 +1,168 @@
+import asyncio
+import time
+from typing import cast
+
+from auth import client
+from cache import TTLCache
+from config import PLAYLIST_CACHE_SIZE, PLAYLIST_CACHE_TTL
+from metrics import metrics
+from models import Playlist, Track
+from name_index import NameIndex
+from pagination import paginate
+from sessions import per_user, totals
+from utils import logger
+
+# Only the fields Track.from_api reads, plus what pagination needs.
+_PLAYLIST_ITEM_FIELDS = (
+    "total,items(track(uri,name,is_local,duration_ms,popularity,"
+    "artists(id,name),album(name,release_date)))"
+)
+
+
+class PlaylistCatalog:
+    """
+    In-process cache of the current user's playlists.
+
+    The playlist listing is fetched once and reused until it is older than
+    ``ttl`` seconds or ``refresh`` is called. Per-playlist track listings are
+    kept in a bounded LRU and are dropped as soon as a refreshed listing
+    reports a new ``snapshot_id`` for that playlist. A fuzzy name index is
+    rebuilt alongside every refresh of the listing.
+    """
+
+    def __init__(
+        self, ttl: float = PLAYLIST_CACHE_TTL, maxsize: int = PLAYLIST_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self._playlists: list[Playlist] | None = None
+        self._index = NameIndex([])
+        self._fetched_at = 0.0
+        self._snapshots: dict[str, str] = {}
+        self._tracks = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._refresh_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._playlists is not None
+            and time.monotonic() - self._fetched_at < self.ttl
+        )
+
+    async def _fetch_playlists(self) -> list[Playlist]:
+        return await paginate(
+            client.sp.current_user_playlists, limit=50, project=Playlist.from_api
+        )
+
+    def _reconcile(self, playlists: list[Playlist]) -> None:
+        """
+        Drop cached track listings for playlists that changed or disappeared.
+        """
+        snapshots = {p.id: p.snapshot_id for p in playlists}
+        # The track listings are keyed by playlist ID.
+        for playlist_id in cast(list[str], self._tracks.keys()):
+            if snapshots.get(playlist_id) != self._snapshots.get(playlist_id):
+                self._tracks.pop(playlist_id)
+        self._snapshots = snapshots
+
+    async def playlists(self) -> list[Playlist]:
+        """
+        Get all of the current user's playlists, fetching them only when the
+        cached listing is missing or stale.
+
+        Returns:
+            list[Playlist]: The user's playlists.
+        """
+        if self._is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+            async with self._refresh_lock:
+                # Another caller may have refreshed while we waited.
+                if not self._is_fresh():
+                    await self._refresh()
+        return self._playlists or []
+
+    async def name_index(self) -> NameIndex:
+        """
+        Get the fuzzy name index for the user's playlists, refreshing the
+        catalog first if it is stale.
+
+        Returns:
+            NameIndex: An index of (playlist id, playlist name) entries.
+        """
+        await self.playlists()
+        return self._index
+
+    async def refresh(self) -> int:
+        """
+        Re-fetch the playlist listing, invalidating any track listings whose
+        playlist ``snapshot_id`` has changed.
+
+        Returns:
+            int: The number of playlists in the refreshed listing.
+        """
+        async with self._refresh_lock:
+            return await self._refresh()
+
+    async def _refresh(self) -> int:
+        playlists = await self._fetch_playlists()
+        self._reconcile(playlists)
+        self._playlists = playlists
+        self._index = NameIndex((p.id, p.name) for p in playlists)
+        self._fetched_at = time.monotonic()
+        logger.info(f"Playlist catalog refreshed: {len(playlists)} playlists")
+        return len(playlists)
+
+    async def playlist_tracks(self, playlist_id: str) -> list[Track]:
+        """
+        Get the items of one of the user's playlists, reusing the cached
+        listing while the playlist's ``snapshot_id`` is unchanged.
+
+        Args:
+            playlist_id (str): The ID of the playlist.
+
+        Returns:
+            list[Track]: The playlist's playable tracks, in playlist order.
+        """
+        await self.playlists()
+        items = self._tracks.get(playlist_id)
+        if items is not None:
+            return items
+
+        items = await paginate(
+            client.sp.playlist_items,
+            playlist_id,
+            limit=100,
+            fields=_PLAYLIST_ITEM_FIELDS,
+            market="from_token",
+            project=lambda item: Track.from_api(item.get("track")),
+        )
+        self._tracks.set(playlist_id, items)
+        return items
+
+    def invalidate(self, playlist_id: str | None = None) -> None:
+        """
+        Forget cached data so the next lookup goes to Spotify.
+
+        Args:
+            playlist_id (str | None, optional): Only forget this playlist's
+                tracks and mark the listing stale, keeping other playlists'
+                cached tracks. Use after changing or creating a playlist.
+                Defaults to None, which clears the whole catalog.
+        """
+        if playlist_id is not None:
+            self._tracks.pop(playlist_id)
+            self._fetched_at = 0.0
+            return
+        self._playlists = None
+        self._index = NameIndex([])
+        self._snapshots = {}
+        self._tracks.clear()
+
+
+catalog = per_user(lambda user: PlaylistCatalog())
+metrics.register_cache("playlists", totals(catalog, lambda c: (c.hits, c.misses)))
+metrics.register_cache(
+    "playlist_tracks", totals(catalog, lambda c: (c._tracks.hits, c._tracks.misses))
+)
@@ -0,0 +1,271 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Literal, Sequence, get_args
+
+from auth import client
+from config import COMMAND_WINDOW
+from devices import device_registry
+from scheduler import Priority, priority
+from sessions import per_user
+from spotify import SpotifyError
+from utils import logger
+
+PlaybackCommand = Literal[
+    "next", "previous", "pause", "play", "shuffle_on", "shuffle_off"
+]
+# Commands in the same group are coalesced; skips are kept in order with
+# everything else, while play state and shuffle are independent of each other.
+_GROUPS = {
+    "next": "skip",
+    "previous": "skip",
+    "pause": "play_state",
+    "play": "play_state",
+    "shuffle_on": "shuffle",
+    "shuffle_off": "shuffle",
+}
+# Net skips from which a burst jumps straight to its target track. A jump
+# costs three requests (the player and queue reads, then play), so it only
+# pays off beyond that many single skips.
+_JUMP_MIN_SKIPS = 4
+
+
+@dataclass
+class _Command:
+    name: str
+    future: asyncio.Future
+
+
+@dataclass
+class _Step:
+    """
+    The request, or run of skips, that a group of commands coalesced into.
+    """
+
+    name: str
+    commands: list[_Command] = field(default_factory=list)
+    count: int = 1
+
+
+def _coalesce(commands: Sequence[_Command]) -> list[_Step]:
+    """
+    Collapse a burst of playback commands into the requests that have the
+    same effect, in order.
+
+    Consecutive nexts become one step of N skips, and a previous straight
+    after a next cancels it out. Between skips, only the last play state
+    (pause or play) and the last shuffle state sent take effect, so the
+    others are dropped.
+    """
+    steps: list[_Step] = []
+    # Play state and shuffle steps since the last skip, by group.
+    settings: dict[str, _Step] = {}
+    for command in commands:
+        group = _GROUPS[command.name]
+        last = steps[-1] if steps else None
+        if group == "skip":
+            settings = {}
+            if last is not None and last.name == "next" and command.name == "next":
+                last.count += 1
+            elif last is not None and last.name == "next" and last.count > 0:
+                last.count -= 1
+            elif last is not None and last.name == command.name == "previous":
+                last.count += 1
+            else:
+                last = _Step(command.name)
+                steps.append(last)
+            last.commands.append(command)
+            continue
+        step = settings.get(group)
+        if step is None:
+            step = settings[group] = _Step(command.name)
+            steps.append(step)
+        step.name = command.name
+        step.commands.append(command)
+    return steps
+
+
+class CommandPipeline:
+    """
+    Coalesces bursts of transport commands into as few requests as possible.
+
+    Each command waits ``window`` seconds, and for any commands still in
+    flight, so that a burst such as next, next, next, pause is sent as one
+    batch. The batch is coalesced (see ``_coalesce``) and dispatched in order
+    to the device the registry targets, and every command gets the outcome
+    of the request it was folded into. Long runs of skips jump straight to
+    the target track in the playback context instead of skipping one at a
+    time.
+    """
+
+    def __init__(self, window: float = COMMAND_WINDOW):
+        self.window = window
+        self._pending: list[_Command] = []
+        self._batch: list[_Command] = []
+        self._dispatcher: asyncio.Task | None = None
+
+    async def submit(self, command: PlaybackCommand) -> dict:
+        """
+        Send a playback command.
+
+        Returns:
+            dict: The command, whether it was sent, coalesced into another
+                command or cancelled out, and the request it was sent as.
+
+        Raises:
+            Exception: If the request the command was sent as failed.
+        """
+        return await self._enqueue([command])[0]
+
+    async def submit_all(self, commands: list[PlaybackCommand]) -> list[dict]:
+        """
+        Send several playback commands as one burst.
+
+        Returns:
+            list[dict]: Each command's result, as from ``submit``, or its
+                error with the status ``failed``.
+        """
+        results = await asyncio.gather(*self._enqueue(commands), return_exceptions=True)
+        return [
+            {"command": command, "status": "failed", "error": str(result)}
+            if isinstance(result, BaseException)
+            else result
+            for command, result in zip(commands, results)
+        ]
+
+    def _enqueue(self, names: Sequence[str]) -> list[asyncio.Future]:
+        unknown = [name for name in names if name not in _GROUPS]
+        if unknown:
+            raise Exception(
+                f"Unknown playback commands {unknown}; "
+                f"expected one of {list(get_args(PlaybackCommand))}."
+            )
+        loop = asyncio.get_running_loop()
+        commands = [_Command(name, loop.create_future()) for name in names]
+        self._pending.extend(commands)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        return [command.future for command in commands]
+
+    async def _dispatch(self) -> None:
+        await asyncio.sleep(self.window)
+        # Commands that arrive while a batch is in flight form the next one.
+        while self._pending:
+            self._batch, self._pending = self._pending, []
+            steps = _coalesce(self._batch)
+            if len(steps) < len(self._batch):
+                logger.info(
+                    f"Coalesced {len(self._batch)} playback commands into "
+                    f"{len(steps)} steps"
+                )
+            for step in steps:
+                try:
+                    sent_as = await self._send(step)
+                except Exception as e:
+                    logger.error(
+                        f"Failed to send playback command {step.name}: {str(e)}"
+                    )
+                    self._fail(step, e)
+                    continue
+                try:
+                    self._resolve(step, sent_as)
+                except Exception as e:
+                    # Never stop the loop: later steps' callers would hang.
+                    logger.error(
+                        f"Failed to resolve playback command {step.name}: {str(e)}"
+                    )
+                    self._fail(step, e)
+
+    @staticmethod
+    def _resolve(step: _Step, sent_as: str | None) -> None:
+        for command in step.commands:
+            # Skip commands whose caller has given up on them.
+            if command.future.done():
+                continue
+            if sent_as is None:
+                status = "cancelled"
+            elif command is step.commands[-1]:
+                status = "sent"
+            else:
+                status = "coalesced"
+            command.future.set_result(
+                {"command": command.name, "status": status, "sent_as": sent_as}
+            )
+
+    @staticmethod
+    def _fail(step: _Step, error: Exception) -> None:
+        for command in step.commands:
+            if not command.future.done():
+                command.future.set_exception(error)
+
+    async def _send(self, step: _Step) -> str | None:
+        """
+        Send a step's requests.
+
+        Returns:
+            str | None: A description of what was sent, or None if the step's
+                commands cancelled out.
+        """
+        sp = client.sp
+        if step.name == "next":
+            if step.count == 0:
+                return None
+            if step.count >= _JUMP_MIN_SKIPS and await self._jump(step.count):
+                return f"jump {step.count} tracks ahead"
+            for _ in range(step.count):
+                await device_registry.run(sp.next_track)
+            return f"next x{step.count}"
+        if step.name == "previous":
+            for _ in range(step.count):
+                await device_registry.run(sp.previous_track)
+            return f"previous x{step.count}"
+        if step.name == "pause":
+            await device_registry.run(sp.pause_playback)
+        elif step.name == "play":
+            await device_registry.run(sp.start_playback)
+        else:
+            state = step.name == "shuffle_on"
+            await device_registry.run(lambda device_id: sp.shuffle(state, device_id))
+        return step.name
+
+    async def _jump(self, count: int) -> bool:
+        """
+        Start playing the track ``count`` places ahead in the queue, within
+        the current context.
+
+        Returns:
+            bool: False, having sent nothing, if playback has no context, the
+                queue is too short, or the target is not in the context (such
+                as a track the user queued); the skips are then sent one by
+                one.
+        """
+        sp = client.sp
+        with priority(Priority.INTERACTIVE):
+            playback, queue = await asyncio.gather(sp.current_playback(), sp.queue())
+        context = ((playback or {}).get("context") or {}).get("uri")
+        upcoming = (queue or {}).get("queue") or []
+        if context is None or len(upcoming) < count:
+            return False
+        target = upcoming[count - 1]["uri"]
+        try:
+            await device_registry.run(
+                lambda device_id: sp.start_playback(
+                    device_id=device_id, context_uri=context, offset={"uri": target}
+                )
+            )
+        except SpotifyError as e:
+            if e.http_status != 400:
+                raise
+            logger.info(f"Could not jump to {target} in {context}: {str(e)}")
+            return False
+        return True
+
+    async def aclose(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for command in self._batch + self._pending:
+            command.future.cancel()
+        self._batch, self._pending = [], []
+
+
+command_pipeline = per_user(lambda user: CommandPipeline())
@@ -0,0 +1,104 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Settings may also be set in the project's .env file; the environment wins.
+load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# Seconds before the cached playlist listing is considered stale.
+PLAYLIST_CACHE_TTL = _env_float("SPOTIFY_MCP_PLAYLIST_CACHE_TTL", 300.0)
+# Maximum number of playlists whose track listings are kept in memory.
+PLAYLIST_CACHE_SIZE = _env_int("SPOTIFY_MCP_PLAYLIST_CACHE_SIZE", 64)
+
+# Base URL of the Spotify Web API, overridable to target a local stand-in.
+API_BASE_URL = (
+    os.environ.get("SPOTIFY_MCP_API_BASE_URL") or "https://api.spotify.com/v1/"
+)
+# Static access token used instead of OAuth, for stand-in APIs and benchmarks.
+ACCESS_TOKEN = os.environ.get("SPOTIFY_MCP_ACCESS_TOKEN")
+# Negotiate HTTP/2 with the Web API (requires the optional h2 package).
+HTTP2 = os.environ.get("SPOTIFY_MCP_HTTP2", "").lower() in ("1", "true", "yes")
+# Maximum number of pooled connections to the Web API.
+HTTP_MAX_CONNECTIONS = _env_int("SPOTIFY_MCP_HTTP_MAX_CONNECTIONS", 20)
+# Per-request timeout in seconds.
+HTTP_TIMEOUT = _env_float("SPOTIFY_MCP_HTTP_TIMEOUT", 10.0)
+# Maximum number of page requests in flight when fetching a paged collection.
+PAGINATION_CONCURRENCY = _env_int("SPOTIFY_MCP_PAGINATION_CONCURRENCY", 8)
+# Seconds the user's device list is reused before it is re-fetched.
+DEVICE_CACHE_TTL = _env_float("SPOTIFY_MCP_DEVICE_CACHE_TTL", 30.0)
+# SQLite database holding the server's persistent local caches.
+DB_PATH = Path(
+    os.environ.get("SPOTIFY_MCP_DB_PATH") or Path(Path.home(), ".spotify_mcp.sqlite")
+)
+# Bytes of ETagged response bodies kept in memory for conditional requests,
+# shared by all users.
+ETAG_CACHE_MEMORY_BYTES = _env_int("SPOTIFY_MCP_ETAG_CACHE_MEMORY_BYTES", 16 << 20)
+# Bytes of older response bodies spilled to each user's database; 0 keeps none.
+ETAG_CACHE_DISK_BYTES = _env_int("SPOTIFY_MCP_ETAG_CACHE_DISK_BYTES", 128 << 20)
+# Seconds a resolved artist/song -> track URI stays valid.
+RESOLUTION_CACHE_TTL = _env_float("SPOTIFY_MCP_RESOLUTION_CACHE_TTL", 30 * 86400.0)
+# Seconds an artist/song that returned no track is remembered as a miss.
+RESOLUTION_CACHE_NEGATIVE_TTL = _env_float(
+    "SPOTIFY_MCP_RESOLUTION_CACHE_NEGATIVE_TTL", 86400.0
+)
+# Sustained Spotify requests per second allowed by the request scheduler.
+RATE_LIMIT = _env_float("SPOTIFY_MCP_RATE_LIMIT", 10.0)
+# Number of requests that may be sent in a burst above the sustained rate.
+RATE_LIMIT_BURST = _env_int("SPOTIFY_MCP_RATE_LIMIT_BURST", 20)
+# Tokens of the burst that bulk reads may not use, kept for playback commands.
+RATE_LIMIT_BULK_RESERVE = _env_int("SPOTIFY_MCP_RATE_LIMIT_BULK_RESERVE", 5)
+# Times a request answered with HTTP 429 is retried before the error surfaces.
+RATE_LIMIT_MAX_RETRIES = _env_int("SPOTIFY_MCP_RATE_LIMIT_MAX_RETRIES", 3)
+# Maximum number of track searches in flight when resolving a batch of songs.
+SEARCH_CONCURRENCY = _env_int("SPOTIFY_MCP_SEARCH_CONCURRENCY", 8)
+# Seconds after a liked-songs sync during which the local mirror is used as is.
+LIBRARY_SYNC_INTERVAL = _env_float("SPOTIFY_MCP_LIBRARY_SYNC_INTERVAL", 60.0)
+# Number of track URIs sent in one start_playback request.
+PLAYBACK_URI_CHUNK = _env_int("SPOTIFY_MCP_PLAYBACK_URI_CHUNK", 100)
+# Seconds before expiry at which the OAuth token is refreshed in the background.
+TOKEN_REFRESH_MARGIN = _env_float("SPOTIFY_MCP_TOKEN_REFRESH_MARGIN", 300.0)
+# Seconds the user's top tracks are reused before they are re-fetched.
+TOP_TRACKS_CACHE_TTL = _env_float("SPOTIFY_MCP_TOP_TRACKS_CACHE_TTL", 3600.0)
+# Seconds between playback state polls while a track is playing.
+PLAYBACK_POLL_INTERVAL = _env_float("SPOTIFY_MCP_PLAYBACK_POLL_INTERVAL", 2.0)
+# Longest interval, in seconds, the poll backs off to while paused or idle.
+PLAYBACK_IDLE_POLL_INTERVAL = _env_float(
+    "SPOTIFY_MCP_PLAYBACK_IDLE_POLL_INTERVAL", 30.0
+)
+# Seconds without reads or subscribers after which playback polling stops.
+PLAYBACK_POLL_TIMEOUT = _env_float("SPOTIFY_MCP_PLAYBACK_POLL_TIMEOUT", 300.0)
+# Number of track URIs sent in one playlist add or replace request.
+PLAYLIST_WRITE_CHUNK = _env_int("SPOTIFY_MCP_PLAYLIST_WRITE_CHUNK", 100)
+# Seconds between background collections of the user's recently played tracks.
+HISTORY_POLL_INTERVAL = _env_float("SPOTIFY_MCP_HISTORY_POLL_INTERVAL", 900.0)
+# Seconds the similarity engine's candidate tracks are reused before a rebuild.
+SIMILARITY_CACHE_TTL = _env_float("SPOTIFY_MCP_SIMILARITY_CACHE_TTL", 3600.0)
+# Directory holding each non-default user's token cache and database.
+USER_DATA_DIR = Path(
+    os.environ.get("SPOTIFY_MCP_USER_DATA_DIR")
+    or Path(Path.home(), ".spotify_mcp_users")
+)
+# Most user sessions kept in memory; the least recently used are evicted.
+MAX_SESSIONS = _env_int("SPOTIFY_MCP_MAX_SESSIONS", 256)
+# Seconds without requests after which a user's session is evicted.
+SESSION_IDLE_TIMEOUT = _env_float("SPOTIFY_MCP_SESSION_IDLE_TIMEOUT", 1800.0)
+# Seconds playback commands wait for more commands to coalesce them with.
+COMMAND_WINDOW = _env_float("SPOTIFY_MCP_COMMAND_WINDOW", 0.05)
+# Bearer token network clients must send; unset accepts every request.
+SERVER_API_KEY = os.environ.get("SPOTIFY_MCP_SERVER_API_KEY")
+# Request header naming the Spotify user a network client acts for.
+USER_HEADER = os.environ.get("SPOTIFY_MCP_USER_HEADER") or "X-Spotify-User"
+# Seconds open connections get to finish when a network server shuts down.
+SHUTDOWN_TIMEOUT = _env_int("SPOTIFY_MCP_SHUTDOWN_TIMEOUT", 10)
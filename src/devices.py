@@ -0,0 +1,164 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from auth import client
+from config import DEVICE_CACHE_TTL
+from metrics import metrics
+from models import Device
+from name_index import NameIndex
+from playback import playback_state
+from sessions import per_user, totals
+from spotify import SpotifyError
+from utils import logger
+
+T = TypeVar("T")
+
+
+class DeviceRegistry:
+    """
+    Cached view of the user's Spotify Connect devices.
+
+    Playback commands are sent to the pinned device or the cached active
+    device, or with no device at all so Spotify uses whichever is active.
+    The device list is only fetched when a command fails with 404 (no active
+    device), after which the command is retried once on the chosen device.
+    """
+
+    def __init__(self, ttl: float = DEVICE_CACHE_TTL):
+        self.ttl = ttl
+        self._devices: list[Device] | None = None
+        self._fetched_at = 0.0
+        self._pinned_id: str | None = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._devices is not None and time.monotonic() - self._fetched_at < self.ttl
+        )
+
+    async def devices(self) -> list[Device]:
+        """
+        Get the user's available devices, fetching them when the cached list
+        is missing or stale.
+
+        Returns:
+            list[Device]: The available devices.
+        """
+        if self._is_fresh():
+            self.hits += 1
+        else:
+            self.misses += 1
+            async with self._lock:
+                if not self._is_fresh():
+                    response = await client.sp.devices()
+                    self._devices = [
+                        Device.from_api(d) for d in (response or {}).get("devices", [])
+                    ]
+                    self._fetched_at = time.monotonic()
+        return self._devices or []
+
+    def invalidate(self) -> None:
+        self._devices = None
+
+    def _choose(self, devices: list[Device]) -> str | None:
+        """
+        Pick the pinned device if available, then the active one, then the
+        first listed.
+        """
+        ids = [d.id for d in devices]
+        if self._pinned_id in ids:
+            return self._pinned_id
+        active = next((d.id for d in devices if d.is_active), None)
+        return active or (ids[0] if ids else None)
+
+    def _cached_device_id(self) -> str | None:
+        """
+        The device to target without a devices round-trip, if one is known.
+        """
+        if self._pinned_id is not None:
+            return self._pinned_id
+        if self._is_fresh():
+            return next((d.id for d in self._devices or [] if d.is_active), None)
+        return None
+
+    async def device_id(self) -> str:
+        """
+        Resolve the device playback commands should target.
+
+        Returns:
+            str: The ID of the pinned, active or first available device.
+
+        Raises:
+            Exception: If no devices are available.
+        """
+        device_id = self._choose(await self.devices())
+        if device_id is None:
+            raise Exception("No active devices found. Please open Spotify on a device.")
+        return device_id
+
+    async def pin(self, device_name: str | None) -> Device | None:
+        """
+        Pin playback commands to the device whose name best matches
+        ``device_name``, or clear the pin when it is None.
+
+        Returns:
+            Device | None: The pinned device, or None if the pin was cleared.
+
+        Raises:
+            Exception: If no device matches the given name.
+        """
+        if device_name is None:
+            self._pinned_id = None
+            return None
+        self.invalidate()
+        devices = await self.devices()
+        matches = NameIndex((d.id, d.name) for d in devices).search(
+            device_name, k=1, cutoff=0.5
+        )
+        if not matches:
+            raise Exception(f"No device found matching '{device_name}'.")
+        self._pinned_id = matches[0].id
+        return next(d for d in devices if d.id == self._pinned_id)
+
+    async def run(self, command: Callable[[str | None], Awaitable[T]]) -> T:
+        """
+        Run a playback command against the resolved device.
+
+        The command first goes to the pinned or cached active device, or to no
+        specific device, so the common case costs no devices request. If
+        Spotify answers 404 (no active device) the device list is re-fetched
+        and the command retried once on the chosen device.
+
+        Args:
+            command (Callable[[str | None], Awaitable[T]]): Sends the command
+                given a device ID, or None for the active device.
+
+        Returns:
+            T: The command's result.
+        """
+        try:
+            return await command(self._cached_device_id())
+        except SpotifyError as e:
+            if e.http_status != 404:
+                raise
+            logger.info("No active device, refreshing device list and retrying")
+            self.invalidate()
+            return await command(await self.device_id())
+        finally:
+            # Whatever the outcome, the cached playback state may be out of date.
+            playback_state.poke()
+
+    async def describe(self) -> list[dict]:
+        """
+        Describe the known devices for display, marking the active and pinned
+        ones.
+        """
+        devices = await self.devices()
+        return [d.to_dict() | {"is_pinned": d.id == self._pinned_id} for d in devices]
+
+
+device_registry = per_user(lambda user: DeviceRegistry())
+metrics.register_cache("devices", totals(device_registry, lambda d: (d.hits, d.misses)))
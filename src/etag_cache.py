@@ -0,0 +1,215 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from config import DB_PATH, ETAG_CACHE_DISK_BYTES, ETAG_CACHE_MEMORY_BYTES
+from db import connect
+from metrics import metrics
+from sessions import per_user, totals, user_path
+
+
+class CachedResponse(NamedTuple):
+    etag: str
+    body: bytes
+
+    def parsed(self) -> Any:
+        return json.loads(self.body)
+
+
+class ResponseMemory:
+    """
+    The in-memory tier of every user's ETag cache.
+
+    Bodies are held in one LRU, keyed by the owning cache and the request,
+    within one byte budget, so memory use stays bounded however many users
+    have a session. The least recently used bodies, whoever they belong to,
+    spill to their own user's database.
+    """
+
+    def __init__(self, max_bytes: int = ETAG_CACHE_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[ETagCache, str], CachedResponse] = (
+            OrderedDict()
+        )
+        self.size = 0
+
+    def get(self, cache: "ETagCache", key: str) -> CachedResponse | None:
+        entry = self._entries.get((cache, key))
+        if entry is not None:
+            self._entries.move_to_end((cache, key))
+        return entry
+
+    def pop(self, cache: "ETagCache", key: str) -> CachedResponse | None:
+        entry = self._entries.pop((cache, key), None)
+        if entry is not None:
+            self.size -= len(entry.body)
+        return entry
+
+    def put(self, cache: "ETagCache", key: str, entry: CachedResponse) -> None:
+        """
+        Hold a body, spilling the least recently used ones over the budget.
+        """
+        self.pop(cache, key)
+        self._entries[(cache, key)] = entry
+        self.size += len(entry.body)
+        spilled: dict[ETagCache, list[tuple[str, CachedResponse]]] = {}
+        while self.size > self.max_bytes and self._entries:
+            (owner, old_key), old = self._entries.popitem(last=False)
+            self.size -= len(old.body)
+            spilled.setdefault(owner, []).append((old_key, old))
+        for owner, entries in spilled.items():
+            owner._spill(entries)
+
+    def keys(self, cache: "ETagCache") -> list[str]:
+        """
+        Get a cache's keys held in memory, least recently used first.
+        """
+        return [key for owner, key in self._entries if owner is cache]
+
+    def release(self, cache: "ETagCache") -> None:
+        """
+        Spill all of a cache's bodies, e.g. when its user's session ends.
+        """
+        entries = [(key, self._entries[(cache, key)]) for key in self.keys(cache)]
+        for key, _ in entries:
+            self.pop(cache, key)
+        cache._spill(entries)
+
+
+class ETagCache:
+    """
+    Response bodies of Spotify reads, stored with their ETags for
+    revalidation.
+
+    A cached read is sent with ``If-None-Match``; when Spotify answers 304
+    Not Modified the stored body is used, so an unchanged playlist or library
+    page costs a round trip with no body to download. The most recently used
+    bodies are held in ``memory``, whose byte budget all users share; older
+    ones spill to a SQLite table bounded by ``disk_bytes``, and move back to
+    memory when they are used again. Bodies are kept as raw JSON, so every
+    caller gets its own parsed copy. Each user has their own cache, spilling
+    to their own database, since each user sees their own private data behind
+    the same URL.
+    """
+
+    def __init__(
+        self,
+        path: Path = DB_PATH,
+        memory: ResponseMemory | None = None,
+        disk_bytes: int = ETAG_CACHE_DISK_BYTES,
+    ):
+        self.path = path
+        self.memory = response_memory if memory is None else memory
+        self.disk_bytes = disk_bytes
+        # Set from the table when the connection opens.
+        self._disk_size = 0
+        self._conn: sqlite3.Connection | None = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    key TEXT PRIMARY KEY,
+                    etag TEXT NOT NULL,
+                    body BLOB NOT NULL,
+                    used_at REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._disk_size = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(body)), 0) FROM http_cache"
+            ).fetchone()[0]
+        return self._conn
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.max_bytes > 0 or self.disk_bytes > 0
+
+    def get(self, key: str) -> CachedResponse | None:
+        """
+        Get the stored response for a read, to revalidate it.
+        """
+        entry = self.memory.get(self, key)
+        if entry is not None:
+            return entry
+        if self.disk_bytes <= 0:
+            return None
+        row = self.conn.execute(
+            "SELECT etag, body FROM http_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = CachedResponse(row[0], row[1])
+        with self.conn:
+            self.conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+        self._disk_size -= len(entry.body)
+        self.memory.put(self, key, entry)
+        return entry
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        """
+        Store a read's response, replacing any older one.
+        """
+        self.misses += 1
+        self.memory.put(self, key, CachedResponse(etag, body))
+
+    def revalidated(self) -> None:
+        """
+        Count a read answered 304 Not Modified.
+        """
+        self.hits += 1
+
+    def discard(self, key: str) -> None:
+        self.memory.pop(self, key)
+
+    def _spill(self, entries: list[tuple[str, CachedResponse]]) -> None:
+        entries = [(k, e) for k, e in entries if len(e.body) <= self.disk_bytes]
+        if not entries:
+            return
+        conn = self.conn
+        now = time.time()
+        with conn:
+            for key, entry in entries:
+                previous = conn.execute(
+                    "SELECT LENGTH(body) FROM http_cache WHERE key = ?", (key,)
+                ).fetchone()
+                self._disk_size -= previous[0] if previous else 0
+                conn.execute(
+                    "INSERT OR REPLACE INTO http_cache VALUES (?, ?, ?, ?)",
+                    (key, entry.etag, entry.body, now),
+                )
+                self._disk_size += len(entry.body)
+            if self._disk_size > self.disk_bytes:
+                self._trim()
+
+    def _trim(self) -> None:
+        """
+        Drop the least recently spilled bodies until the table fits.
+        """
+        rows = self.conn.execute(
+            "SELECT key, LENGTH(body) FROM http_cache ORDER BY used_at"
+        ).fetchall()
+        expired = []
+        for key, size in rows:
+            if self._disk_size <= self.disk_bytes:
+                break
+            expired.append((key,))
+            self._disk_size -= size
+        self.conn.executemany("DELETE FROM http_cache WHERE key = ?", expired)
+
+    async def aclose(self) -> None:
+        # Keep the bodies on disk for the user's next session.
+        self.memory.release(self)
+
+
+response_memory = ResponseMemory()
+etag_cache = per_user(lambda user: ETagCache(user_path(DB_PATH, user)))
+metrics.register_cache("etag", totals(etag_cache, lambda c: (c.hits, c.misses)))
@@ -0,0 +1,347 @@
+import asyncio
+import contextvars
+import sqlite3
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+from auth import client
+from config import DB_PATH, HISTORY_POLL_INTERVAL
+from db import connect
+from metadata import metadata_store
+from models import Track
+from scheduler import Priority, priority
+from sessions import background, current_user, per_user, user_path
+from utils import logger
+
+# Spotify's maximum page size for recently played tracks.
+_RECENTLY_PLAYED_LIMIT = 50
+# Seconds after a collection during which reads use the store as is.
+_FRESH_FOR = 60.0
+# Seconds the first background collection waits, to stay off the path of the
+# call that started it.
+_STARTUP_DELAY = 5.0
+_DAY_MS = 86_400_000
+# Columns holding epoch milliseconds, returned as ISO 8601 UTC timestamps.
+_TIMESTAMP_COLUMNS = {"played_at", "first_played", "last_played", "first_heard"}
+
+
+def _played_at_ms(played_at: str) -> int:
+    return int(datetime.fromisoformat(played_at).timestamp() * 1000)
+
+
+def _isoformat(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ListeningHistory:
+    """
+    Local SQLite store of the user's plays, and analytics over them.
+
+    Spotify only returns the last 50 plays, so a background task collects new
+    plays every ``interval`` seconds with an ``after`` cursor set to the
+    newest stored play, and keeps them indefinitely. ``played_at`` is the
+    primary key, so a play is stored once however often it is fetched.
+    Windowed analytics are aggregate queries over a ``played_at`` range, and
+    all-time ones read per-track totals maintained as plays are stored, so
+    they run locally in milliseconds over months of plays.
+    """
+
+    def __init__(self, path: Path = DB_PATH, interval: float = HISTORY_POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._conn: sqlite3.Connection | None = None
+        self._collected_at = 0.0
+        self._lock = asyncio.Lock()
+        self._collector: asyncio.Task | None = None
+        self.collections = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS plays (
+                    played_at INTEGER PRIMARY KEY,
+                    uri TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    artist_id TEXT,
+                    duration_ms INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS plays_uri ON plays (uri, played_at)"
+            )
+            # Per-track totals, kept up to date as plays are stored, so that
+            # all-time questions do not scan every play.
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS track_stats (
+                    uri TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    plays INTEGER NOT NULL,
+                    first_heard INTEGER NOT NULL,
+                    last_played INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS track_stats_first_heard "
+                "ON track_stats (first_heard)"
+            )
+        return self._conn
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM plays").fetchone()[0]
+
+    def _insert(self, items: list[dict]) -> int:
+        rows = []
+        tracks: dict[str, Track] = {}
+        for item in items:
+            track = Track.from_api(item.get("track"))
+            if track is not None:
+                tracks[track.uri] = track
+                rows.append(
+                    (
+                        _played_at_ms(item["played_at"]),
+                        track.uri,
+                        track.name,
+                        track.artist,
+                        track.artist_id,
+                        track.duration_ms,
+                    )
+                )
+        added = 0
+        with self.conn:
+            for row in rows:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO plays VALUES (?, ?, ?, ?, ?, ?)", row
+                )
+                if cursor.rowcount == 0:
+                    continue
+                added += 1
+                played_at, uri, name, artist = row[:4]
+                self.conn.execute(
+                    """
+                    INSERT INTO track_stats VALUES (?, ?, ?, 1, ?, ?)
+                    ON CONFLICT (uri) DO UPDATE SET
+                        plays = plays + 1,
+                        first_heard = MIN(first_heard, excluded.first_heard),
+                        last_played = MAX(last_played, excluded.last_played)
+                    """,
+                    (uri, name, artist, played_at, played_at),
+                )
+        # Plays carry full track objects; keep them for the similarity engine.
+        metadata_store.put_tracks(list(tracks.values()))
+        return added
+
+    async def collect(self, force: bool = False) -> int:
+        """
+        Store the plays made since the newest stored play.
+
+        Args:
+            force (bool, optional): Collect even if the last collection was
+                within the last minute. Defaults to False.
+
+        Returns:
+            int: The number of new plays stored.
+        """
+        async with self._lock:
+            if not force and time.monotonic() - self._collected_at < _FRESH_FOR:
+                return 0
+            cursor = self.conn.execute("SELECT MAX(played_at) FROM plays").fetchone()[0]
+            added = 0
+            while True:
+                page = await client.sp.current_user_recently_played(
+                    limit=_RECENTLY_PLAYED_LIMIT, after=cursor
+                )
+                if not page or not page["items"]:
+                    break
+                added += self._insert(page["items"])
+                following = (page.get("cursors") or {}).get("after")
+                if (
+                    len(page["items"]) < _RECENTLY_PLAYED_LIMIT
+                    or following is None
+                    or int(following) == cursor
+                ):
+                    break
+                cursor = int(following)
+            self._collected_at = time.monotonic()
+            self.collections += 1
+            if added:
+                logger.info(f"Stored {added} new plays")
+            return added
+
+    def start(self) -> None:
+        """
+        Start collecting plays in the background.
+        """
+        if self._collector is None or self._collector.done():
+            # A fresh context holding only the user, so that the collector's
+            # requests are not counted as the starting handler's.
+            context = contextvars.Context()
+            context.run(current_user.set, current_user.get())
+            self._collector = asyncio.create_task(
+                self._collect_forever(), context=context
+            )
+
+    def stop(self) -> None:
+        """
+        Stop collecting plays in the background.
+        """
+        if self._collector is not None:
+            self._collector.cancel()
+            self._collector = None
+
+    async def _collect_forever(self) -> None:
+        await asyncio.sleep(_STARTUP_DELAY)
+        # Collections alone must not keep the user's session from idling out.
+        with background():
+            while True:
+                try:
+                    with priority(Priority.BULK):
+                        await self.collect(force=True)
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to collect recently played tracks: {str(e)}"
+                    )
+                await asyncio.sleep(self.interval)
+
+    async def aclose(self) -> None:
+        self.stop()
+
+    def _rows(self, query: str, params: tuple | dict) -> list[dict]:
+        cursor = self.conn.execute(query, params)
+        columns = [c[0] for c in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            for column in _TIMESTAMP_COLUMNS & row.keys():
+                row[column] = _isoformat(row[column])
+        return rows
+
+    def uris(self) -> list[str]:
+        """
+        Get every track ever played, most played first.
+        """
+        rows = self.conn.execute(
+            "SELECT uri FROM track_stats ORDER BY plays DESC"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def recent(self, limit: int = 10) -> list[dict]:
+        """
+        Get the most recent plays, newest first.
+        """
+        return self._rows(
+            "SELECT uri, name, artist, played_at FROM plays "
+            "ORDER BY played_at DESC LIMIT ?",
+            (limit,),
+        )
+
+    def play_counts(self, days: float | None = 30, limit: int = 50) -> list[dict]:
+        """
+        Count plays of each track over a time window.
+
+        Args:
+            days (float | None, optional): The window, ending now. Defaults to
+                30; None counts all stored plays.
+            limit (int, optional): The number of tracks returned. Defaults to
+                50.
+
+        Returns:
+            list[dict]: The most played tracks with their play count, first
+                and last play in the window, most played first.
+        """
+        if days is None:
+            return self._rows(
+                """
+                SELECT uri, name, artist, plays,
+                       first_heard AS first_played, last_played
+                FROM track_stats ORDER BY plays DESC, last_played DESC LIMIT ?
+                """,
+                (limit,),
+            )
+        since = int(time.time() * 1000 - days * _DAY_MS)
+        return self._rows(
+            """
+            SELECT uri, name, artist, COUNT(*) AS plays,
+                   MIN(played_at) AS first_played, MAX(played_at) AS last_played
+            FROM plays WHERE played_at >= ?
+            GROUP BY uri ORDER BY plays DESC, last_played DESC LIMIT ?
+            """,
+            (since, limit),
+        )
+
+    def discoveries(
+        self, days: float = 30, min_plays: int = 2, limit: int = 50
+    ) -> list[dict]:
+        """
+        Find tracks first heard within a window and played repeatedly since.
+
+        Args:
+            days (float, optional): How recently the track must have been
+                first heard. Defaults to 30.
+            min_plays (int, optional): The fewest plays counted as a
+                favourite. Defaults to 2.
+            limit (int, optional): The number of tracks returned. Defaults to
+                50.
+
+        Returns:
+            list[dict]: The tracks with their play count and first play, most
+                played first.
+        """
+        since = int(time.time() * 1000 - days * _DAY_MS)
+        return self._rows(
+            """
+            SELECT uri, name, artist, plays, first_heard, last_played
+            FROM track_stats WHERE first_heard >= ? AND plays >= ?
+            ORDER BY plays DESC, last_played DESC LIMIT ?
+            """,
+            (since, min_plays, limit),
+        )
+
+    def trending(
+        self, days: float = 7, baseline_days: float = 28, limit: int = 50
+    ) -> list[dict]:
+        """
+        Rank tracks by how much more they were played recently than before.
+
+        The score is the number of plays in the last ``days`` divided by the
+        number expected from the preceding ``baseline_days`` at the same rate,
+        plus one so that new tracks do not divide by zero.
+
+        Returns:
+            list[dict]: The tracks with their recent plays, baseline plays and
+                score, highest score first.
+        """
+        now = int(time.time() * 1000)
+        recent_since = now - int(days * _DAY_MS)
+        baseline_since = recent_since - int(baseline_days * _DAY_MS)
+        return self._rows(
+            """
+            SELECT uri, name, artist,
+                   SUM(played_at >= :recent) AS recent_plays,
+                   SUM(played_at < :recent) AS baseline_plays,
+                   ROUND(
+                       SUM(played_at >= :recent)
+                       / (SUM(played_at < :recent) * :ratio + 1.0),
+                       3
+                   ) AS score
+            FROM plays WHERE played_at >= :baseline
+            GROUP BY uri HAVING recent_plays > 0
+            ORDER BY score DESC, recent_plays DESC LIMIT :limit
+            """,
+            {
+                "recent": recent_since,
+                "baseline": baseline_since,
+                "ratio": days / baseline_days,
+                "limit": limit,
+            },
+        )
+
+
+listening_history = per_user(lambda user: ListeningHistory(user_path(DB_PATH, user)))
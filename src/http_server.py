@@ -0,0 +1,161 @@
+import hmac
+import ipaddress
+import multiprocessing
+import os
+import signal
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.datastructures import Headers, QueryParams
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import SERVER_API_KEY, SHUTDOWN_TIMEOUT, USER_HEADER
+from server import mcp, serving
+from sessions import as_user, sessions
+from utils import logger
+
+
+class UserMiddleware:
+    """
+    Runs each request as the Spotify user it names, in the ``USER_HEADER``
+    header or the ``user`` query parameter, and rejects requests without the
+    API key when one is configured.
+
+    An MCP session acts for the user named by its SSE connection request.
+    The user is not authenticated beyond the API key, so a server reachable
+    by untrusted clients must sit behind a proxy that sets the header.
+    """
+
+    def __init__(self, app: ASGIApp, api_key: str | None = SERVER_API_KEY):
+        self.app = app
+        self.api_key = api_key
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if self.api_key and not hmac.compare_digest(
+            headers.get("authorization", ""), f"Bearer {self.api_key}"
+        ):
+            await PlainTextResponse("Unauthorized", status_code=401)(
+                scope, receive, send
+            )
+            return
+        user = headers.get(USER_HEADER) or QueryParams(scope["query_string"]).get(
+            "user"
+        )
+        with as_user(user or None):
+            await self.app(scope, receive, send)
+
+
+async def _health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok", "sessions": len(sessions)})
+
+
+@asynccontextmanager
+async def _lifespan(app: Starlette) -> AsyncIterator[None]:
+    # Held for the server's lifetime, so the state outlives MCP sessions.
+    async with serving():
+        yield
+    logger.info("Server stopped")
+
+
+def create_app() -> ASGIApp:
+    """
+    Build the ASGI app serving the MCP server over SSE.
+
+    Clients connect to ``/sse``; ``/health`` reports liveness and the number
+    of user sessions held.
+    """
+    app = Starlette(
+        routes=[Route("/health", _health), Mount("/", app=mcp.sse_app())],
+        lifespan=_lifespan,
+    )
+    return UserMiddleware(app)
+
+
+def _serve(host: str, port: int) -> None:
+    config = uvicorn.Config(
+        create_app(),
+        host=host,
+        port=port,
+        log_level=mcp.settings.log_level.lower(),
+        timeout_graceful_shutdown=SHUTDOWN_TIMEOUT,
+    )
+    logger.info(f"Serving MCP over SSE on http://{host}:{port}/sse")
+    try:
+        uvicorn.Server(config).run()
+    except KeyboardInterrupt:
+        # uvicorn re-raises SIGINT once it has shut down gracefully.
+        pass
+
+
+def _worker(host: str, port: int) -> None:
+    # Leave the terminal's process group, so that Ctrl-C reaches only the
+    # parent, which then stops each worker exactly once.
+    os.setpgrp()
+    _serve(host, port)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(host: str, port: int, workers: int = 1) -> None:
+    """
+    Serve the MCP server over SSE until interrupted.
+
+    Each worker is a separate process with its own caches, listening on its
+    own port from ``port`` upwards. An SSE session's messages must reach the
+    process holding its stream, so workers cannot share a port; balance
+    clients across the ports with sticky routing.
+
+    On SIGINT or SIGTERM, workers stop accepting connections, give open ones
+    ``SHUTDOWN_TIMEOUT`` seconds to finish, then close every user session.
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The first worker's port.
+        workers (int, optional): The number of worker processes. Defaults
+            to 1, which serves from this process.
+
+    Raises:
+        Exception: If ``host`` is not a loopback address and no API key is
+            set, since clients choose which user they act for.
+    """
+    if not _is_loopback(host) and not SERVER_API_KEY:
+        raise Exception(
+            f"Refusing to serve on {host} without an API key; set "
+            "SPOTIFY_MCP_SERVER_API_KEY or listen on 127.0.0.1."
+        )
+    if workers == 1:
+        _serve(host, port)
+        return
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker, args=(host, port + n), daemon=True)
+        for n in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(signum: int, frame: object) -> None:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for process in processes:
+        process.join()
@@ -0,0 +1,154 @@
+import asyncio
+import sqlite3
+import time
+from pathlib import Path
+
+from auth import client
+from config import DB_PATH, LIBRARY_SYNC_INTERVAL
+from db import connect
+from metadata import metadata_store
+from models import Track
+from pagination import paginate
+from scheduler import Priority, priority
+from sessions import per_user, user_path
+from utils import logger
+
+
+def _saved_track(item: dict) -> tuple[str, Track] | None:
+    track = Track.from_api(item.get("track"))
+    return None if track is None else (item["added_at"], track)
+
+
+class SavedTracksMirror:
+    """
+    Local SQLite mirror of the user's liked songs.
+
+    The first sync imports the whole library. Later syncs read the newest
+    page of saved tracks and stop as soon as they reach an ``added_at`` the
+    mirror already has, so keeping an imported library current usually costs
+    a single request. If the local count then disagrees with Spotify's total
+    (for example because tracks were removed), the mirror is re-imported.
+    """
+
+    def __init__(
+        self, path: Path = DB_PATH, sync_interval: float = LIBRARY_SYNC_INTERVAL
+    ):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._conn: sqlite3.Connection | None = None
+        self._synced_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS saved_tracks (
+                    uri TEXT PRIMARY KEY,
+                    added_at TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    artist TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS saved_tracks_added_at "
+                "ON saved_tracks (added_at)"
+            )
+        return self._conn
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM saved_tracks").fetchone()[0]
+
+    def uris(self) -> list[str]:
+        """
+        Get the mirrored liked songs, most recently added first.
+        """
+        rows = self.conn.execute(
+            "SELECT uri FROM saved_tracks ORDER BY added_at DESC, rowid"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _insert(self, items: list[tuple[str, Track]], replace: bool = False) -> None:
+        rows = [
+            (track.uri, added_at, track.name, track.artist) for added_at, track in items
+        ]
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM saved_tracks")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO saved_tracks VALUES (?, ?, ?, ?)", rows
+            )
+        # The pages carry full track objects, so the similarity engine only
+        # has to fetch the artists' genres for liked songs.
+        metadata_store.put_tracks([track for _, track in items])
+
+    async def _import_all(self) -> None:
+        items = await paginate(
+            client.sp.current_user_saved_tracks,
+            limit=50,
+            market="from_token",
+            project=_saved_track,
+        )
+        self._insert(items, replace=True)
+        logger.info(f"Imported {len(items)} liked songs")
+
+    async def _sync_new(self, latest: str) -> int | None:
+        """
+        Page through the newest saved tracks until reaching ``latest``.
+
+        Returns:
+            int | None: Spotify's total number of saved tracks.
+        """
+        new: list[tuple[str, Track]] = []
+        offset = 0
+        total = None
+        with priority(Priority.BULK):
+            while True:
+                page = await client.sp.current_user_saved_tracks(
+                    limit=50, offset=offset, market="from_token"
+                )
+                if not page:
+                    break
+                total = page["total"]
+                items = [i for i in map(_saved_track, page["items"]) if i]
+                # Tracks added in the same second as ``latest`` may not all be
+                # mirrored yet, so keep those; known tracks are replaced on insert.
+                new.extend(i for i in items if i[0] >= latest)
+                if any(i[0] < latest for i in items) or not page["next"]:
+                    break
+                offset += len(page["items"])
+        self._insert(new)
+        return total
+
+    async def sync(self, force: bool = False) -> int:
+        """
+        Bring the mirror up to date with the user's liked songs.
+
+        Args:
+            force (bool, optional): Sync even if the last sync was within
+                ``sync_interval`` seconds. Defaults to False.
+
+        Returns:
+            int: The number of mirrored liked songs.
+        """
+        async with self._lock:
+            if not force and time.monotonic() - self._synced_at < self.sync_interval:
+                return self.count()
+            latest = self.conn.execute(
+                "SELECT MAX(added_at) FROM saved_tracks"
+            ).fetchone()[0]
+            if latest is None:
+                await self._import_all()
+            else:
+                total = await self._sync_new(latest)
+                if total is not None and total != self.count():
+                    logger.info("Liked songs mirror out of step, re-importing")
+                    await self._import_all()
+            self._synced_at = time.monotonic()
+            return self.count()
+
+
+saved_tracks = per_user(lambda user: SavedTracksMirror(user_path(DB_PATH, user)))
@@ -1,7 +1,34 @@
+import argparse
+
 import resources  # noqa
 import tools  # noqa
 from server import mcp
 
 # Entry point to run the server
 if __name__ == "__main__":
-    mcp.run()
+    parser = argparse.ArgumentParser(description="Spotify MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "sse"],
+        default="stdio",
+        help="stdio for a single host process, sse to serve many clients over HTTP",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="interface to listen on; any but loopback requires an API key",
+    )
+    parser.add_argument("--port", type=int, default=mcp.settings.port)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes, on consecutive ports from --port",
+    )
+    args = parser.parse_args()
+    if args.transport == "sse":
+        from http_server import serve
+
+        serve(args.host, args.port, args.workers)
+    else:
+        mcp.run()
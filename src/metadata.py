@@ -0,0 +1,97 @@
+import json
+import sqlite3
+from pathlib import Path
+
+from config import DB_PATH
+from db import connect
+from models import Track
+
+
+class MetadataStore:
+    """
+    SQLite store of track metadata and artist genres, so candidates are only
+    fetched from Spotify the first time they are seen.
+    """
+
+    def __init__(self, path: Path = DB_PATH):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS track_metadata (
+                    uri TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    artist_id TEXT,
+                    album TEXT,
+                    release_year INTEGER,
+                    duration_ms INTEGER,
+                    popularity INTEGER
+                )
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS artist_genres (
+                    artist_id TEXT PRIMARY KEY,
+                    genres TEXT NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    def put_tracks(self, tracks: list[Track]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO track_metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        t.uri,
+                        t.name,
+                        t.artist,
+                        t.artist_id,
+                        t.album,
+                        t.release_year,
+                        t.duration_ms,
+                        t.popularity,
+                    )
+                    for t in tracks
+                ],
+            )
+
+    def put_genres(self, genres: dict[str, list[str]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO artist_genres VALUES (?, ?)",
+                [(artist_id, json.dumps(g)) for artist_id, g in genres.items()],
+            )
+
+    def tracks(self, uris: list[str] | None = None) -> dict[str, Track]:
+        """
+        Get stored tracks by URI: those given, or all of them.
+        """
+        if uris is None:
+            rows = self.conn.execute("SELECT * FROM track_metadata").fetchall()
+        else:
+            rows = []
+            for i in range(0, len(uris), 500):
+                chunk = uris[i : i + 500]
+                rows += self.conn.execute(
+                    "SELECT * FROM track_metadata WHERE uri IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+        return {row[0]: Track(*row) for row in rows}
+
+    def genres(self) -> dict[str, list[str]]:
+        rows = self.conn.execute("SELECT artist_id, genres FROM artist_genres")
+        return {artist_id: json.loads(g) for artist_id, g in rows}
+
+
+# Track metadata and genres are the same for every user, so they are shared.
+metadata_store = MetadataStore()
@@ -0,0 +1,300 @@
+import bisect
+import functools
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the upstream-calls-per-invocation histogram buckets.
+CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Spotify IDs are 22 base-62 characters; they are folded out of endpoint
+# labels so that metrics stay bounded.
+_SPOTIFY_ID = re.compile(r"(?<=/)[0-9A-Za-z]{22}(?=/|$)")
+
+_upstream_calls: ContextVar[list[int] | None] = ContextVar(
+    "upstream_calls", default=None
+)
+
+
+class Histogram:
+    """
+    A fixed-bucket histogram, as exposed by Prometheus.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by interpolating within its bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = (
+                    min(self.buckets[i], self.max)
+                    if i < len(self.buckets)
+                    else self.max
+                )
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+def endpoint(path: str) -> str:
+    """
+    Reduce a Web API path or URL to a low-cardinality endpoint label, e.g.
+    ``playlists/{id}/tracks``.
+    """
+    path = path.split("?", 1)[0]
+    if "://" in path:
+        path = path.split("/v1/", 1)[-1]
+    return _SPOTIFY_ID.sub("{id}", "/" + path.strip("/"))[1:]
+
+
+class Metrics:
+    """
+    In-process metrics for MCP handlers and the Spotify requests they make.
+
+    Handlers registered through ``instrument`` record their latency, their
+    errors and how many upstream requests each invocation made, counted
+    through a context variable so that requests made by concurrent child
+    tasks are attributed to the invocation that started them. Caches
+    register a callable reporting their hit and miss counts.
+    """
+
+    def __init__(self):
+        self.handlers: dict[tuple[str, str], Histogram] = {}
+        self.handler_calls: dict[tuple[str, str], Histogram] = {}
+        self.handler_errors: Counter[tuple[str, str, str]] = Counter()
+        self.upstream: dict[tuple[str, str], Histogram] = {}
+        self.upstream_status: Counter[tuple[str, str, str]] = Counter()
+        self._caches: dict[str, Callable[[], tuple[int, int]]] = {}
+
+    def instrument(
+        self, kind: str, name: str, fn: Callable[..., Awaitable[Any]]
+    ) -> Callable[..., Awaitable[Any]]:
+        """
+        Wrap an async MCP handler so that each invocation is recorded.
+
+        Args:
+            kind (str): The handler kind, "tool" or "resource".
+            name (str): The tool name or resource URI.
+            fn (Callable[..., Awaitable[Any]]): The handler.
+
+        Returns:
+            Callable[..., Awaitable[Any]]: The wrapped handler.
+        """
+        key = (kind, name)
+        latency = self.handlers.setdefault(key, Histogram())
+        calls = self.handler_calls.setdefault(key, Histogram(CALL_BUCKETS))
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            counter = [0]
+            token = _upstream_calls.set(counter)
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                status = getattr(e, "http_status", None)
+                self.handler_errors[(kind, name, str(status or type(e).__name__))] += 1
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+                calls.observe(counter[0])
+                _upstream_calls.reset(token)
+
+        return wrapper
+
+    def upstream_calls(self) -> int:
+        """
+        The number of Spotify requests the running handler invocation has made
+        so far, or 0 outside of one.
+        """
+        counter = _upstream_calls.get()
+        return 0 if counter is None else counter[0]
+
+    def record_upstream(
+        self, method: str, path: str, status: int | str, seconds: float
+    ) -> None:
+        """
+        Record one Spotify request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path or URL.
+            status (int | str): The response status, or the name of the error
+                raised before a response arrived.
+            seconds (float): The request latency.
+        """
+        label = endpoint(path)
+        self.upstream.setdefault((method, label), Histogram()).observe(seconds)
+        self.upstream_status[(method, label, str(status))] += 1
+        counter = _upstream_calls.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def register_cache(self, name: str, stats: Callable[[], tuple[int, int]]) -> None:
+        """
+        Report a cache's hit rate.
+
+        Args:
+            name (str): The cache name.
+            stats (Callable[[], tuple[int, int]]): Returns the cache's hit and
+                miss counts.
+        """
+        self._caches[name] = stats
+
+    def caches(self) -> dict[str, dict]:
+        result = {}
+        for name, stats in self._caches.items():
+            hits, misses = stats()
+            lookups = hits + misses
+            result[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+        return result
+
+    def summary(self) -> dict:
+        """
+        All metrics as a JSON-serializable dictionary.
+        """
+        handlers = {}
+        for (kind, name), latency in self.handlers.items():
+            if not latency.count:
+                continue
+            calls = self.handler_calls[(kind, name)]
+            handlers[f"{kind}:{name}"] = {
+                "latency_seconds": latency.summary(),
+                "upstream_calls": {
+                    "total": int(calls.sum),
+                    "mean": calls.sum / calls.count,
+                    "max": int(calls.max),
+                },
+                "errors": {
+                    error: count
+                    for (k, n, error), count in self.handler_errors.items()
+                    if (k, n) == (kind, name)
+                },
+            }
+        upstream = {}
+        for (method, label), latency in self.upstream.items():
+            upstream[f"{method} {label}"] = {
+                "latency_seconds": latency.summary(),
+                "status": {
+                    status: count
+                    for (m, lbl, status), count in self.upstream_status.items()
+                    if (m, lbl) == (method, label)
+                },
+            }
+        return {"handlers": handlers, "upstream": upstream, "caches": self.caches()}
+
+    def prometheus(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines: list[str] = []
+        _histogram(
+            lines,
+            "spotify_mcp_handler_seconds",
+            "MCP handler latency.",
+            {
+                f'kind="{k}",name="{_escape(n)}"': h
+                for (k, n), h in self.handlers.items()
+            },
+        )
+        _histogram(
+            lines,
+            "spotify_mcp_handler_upstream_calls",
+            "Spotify requests made per MCP handler invocation.",
+            {
+                f'kind="{k}",name="{_escape(n)}"': h
+                for (k, n), h in self.handler_calls.items()
+            },
+        )
+        lines.append("# HELP spotify_mcp_handler_errors_total MCP handler errors.")
+        lines.append("# TYPE spotify_mcp_handler_errors_total counter")
+        for (kind, name, error), count in self.handler_errors.items():
+            lines.append(
+                f'spotify_mcp_handler_errors_total{{kind="{kind}",'
+                f'name="{_escape(name)}",error="{error}"}} {count}'
+            )
+        _histogram(
+            lines,
+            "spotify_mcp_upstream_seconds",
+            "Spotify Web API request latency.",
+            {f'method="{m}",endpoint="{e}"': h for (m, e), h in self.upstream.items()},
+        )
+        lines.append(
+            "# HELP spotify_mcp_upstream_requests_total Spotify Web API requests."
+        )
+        lines.append("# TYPE spotify_mcp_upstream_requests_total counter")
+        for (method, label, status), count in self.upstream_status.items():
+            lines.append(
+                f'spotify_mcp_upstream_requests_total{{method="{method}",'
+                f'endpoint="{label}",status="{status}"}} {count}'
+            )
+        caches = self.caches()
+        for result, help_text in (("hits", "Cache hits."), ("misses", "Cache misses.")):
+            lines.append(f"# HELP spotify_mcp_cache_{result}_total {help_text}")
+            lines.append(f"# TYPE spotify_mcp_cache_{result}_total counter")
+            for name, stats in caches.items():
+                lines.append(
+                    f'spotify_mcp_cache_{result}_total{{cache="{name}"}} {stats[result]}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _histogram(
+    lines: list[str], name: str, help_text: str, series: dict[str, Histogram]
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series.items():
+        if not histogram.count:
+            continue
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+metrics = Metrics()
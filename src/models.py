@@ -0,0 +1,113 @@
+from dataclasses import asdict, dataclass
+from typing import Any
+
+
+@dataclass(frozen=True, slots=True)
+class Track:
+    """
+    The parts of a Spotify track object the server uses.
+    """
+
+    uri: str
+    name: str
+    artist: str
+    artist_id: str | None = None
+    album: str | None = None
+    release_year: int | None = None
+    duration_ms: int | None = None
+    popularity: int | None = None
+
+    @classmethod
+    def from_api(cls, track: dict | None) -> "Track | None":
+        """
+        Project a track object from the Web API.
+
+        Args:
+            track (dict | None): The track object, as found in search results,
+                top items, or the ``track`` of saved and playlist items.
+
+        Returns:
+            Track | None: The track, or None for removed items and local files,
+                which cannot be played by URI.
+        """
+        if not track or not track.get("uri") or track.get("is_local"):
+            return None
+        artists = track.get("artists") or [{}]
+        album = track.get("album") or {}
+        release_date = album.get("release_date") or ""
+        return cls(
+            uri=track["uri"],
+            name=track["name"],
+            artist=artists[0].get("name", ""),
+            artist_id=artists[0].get("id"),
+            album=album.get("name"),
+            release_year=int(release_date[:4]) if release_date[:4].isdigit() else None,
+            duration_ms=track.get("duration_ms"),
+            popularity=track.get("popularity"),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class Playlist:
+    """
+    The parts of a Spotify playlist object the server uses.
+    """
+
+    id: str
+    uri: str
+    name: str
+    snapshot_id: str
+    owner_id: str | None = None
+    tracks_total: int | None = None
+
+    @classmethod
+    def from_api(cls, playlist: dict | None) -> "Playlist | None":
+        """
+        Project a simplified playlist object from the Web API.
+
+        Returns:
+            Playlist | None: The playlist, or None for the null entries Spotify
+                returns in place of unavailable playlists.
+        """
+        if not playlist:
+            return None
+        return cls(
+            id=playlist["id"],
+            uri=playlist["uri"],
+            name=playlist["name"],
+            snapshot_id=playlist["snapshot_id"],
+            owner_id=(playlist.get("owner") or {}).get("id"),
+            tracks_total=(playlist.get("tracks") or {}).get("total"),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class Device:
+    """
+    The parts of a Spotify device object the server uses.
+    """
+
+    id: str
+    name: str
+    type: str | None = None
+    is_active: bool = False
+    volume_percent: int | None = None
+
+    @classmethod
+    def from_api(cls, device: dict) -> "Device":
+        return cls(
+            id=device["id"],
+            name=device["name"],
+            type=device.get("type"),
+            is_active=device.get("is_active", False),
+            volume_percent=device.get("volume_percent"),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
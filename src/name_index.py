@@ -0,0 +1,162 @@
+from collections import Counter
+from typing import Iterable, NamedTuple
+
+from utils import normalize_name
+
+# Trigrams shared by more than this fraction of names carry little signal and
+# are skipped when gathering candidates.
+_COMMON_GRAM_FRACTION = 0.25
+# Number of candidates from the n-gram filter that get a full similarity score.
+_MAX_CANDIDATES = 64
+
+
+class NameMatch(NamedTuple):
+    id: str
+    name: str
+    score: float
+
+
+def _trigrams(normalized: str) -> set[str]:
+    padded = f" {normalized} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _similarity(
+    query_grams: set[str],
+    query_tokens: frozenset[str],
+    grams: set[str],
+    tokens: frozenset[str],
+) -> float:
+    # Dice coefficient over character trigrams.
+    score = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+    if query_tokens and query_tokens <= tokens:
+        # Every word of the query appears in the name, e.g. "chill" for
+        # "Chill Vibes"; credit the fraction of the name's words covered.
+        score = max(score, len(query_tokens) / len(tokens))
+    return score
+
+
+def similarity(query: str, name: str) -> float:
+    """
+    Score how well ``name`` matches ``query``, as ``NameIndex.search`` does.
+
+    Returns:
+        float: The similarity, from 0 to 1.
+    """
+    query, name = normalize_name(query), normalize_name(name)
+    if not query or not name:
+        return 0.0
+    if query == name:
+        return 1.0
+    return _similarity(
+        _trigrams(query),
+        frozenset(query.split()),
+        _trigrams(name),
+        frozenset(name.split()),
+    )
+
+
+class NameIndex:
+    """
+    A precomputed fuzzy-match index mapping names to IDs.
+
+    Names are normalized and tokenized once at build time and an inverted
+    trigram index is used to narrow each query down to a handful of
+    candidates before they are scored. Entries are keyed by ID, so two
+    entries with the same name are both returned rather than one shadowing
+    the other.
+    """
+
+    def __init__(self, entries: Iterable[tuple[str, str]]):
+        """
+        Args:
+            entries (Iterable[tuple[str, str]]): (id, name) pairs to index.
+        """
+        self._ids: list[str] = []
+        self._names: list[str] = []
+        self._normalized: list[str] = []
+        self._tokens: list[frozenset[str]] = []
+        self._grams: list[set[str]] = []
+        self._exact: dict[str, list[int]] = {}
+        self._postings: dict[str, list[int]] = {}
+
+        for position, (entry_id, name) in enumerate(entries):
+            normalized = normalize_name(name)
+            grams = _trigrams(normalized)
+            self._ids.append(entry_id)
+            self._names.append(name)
+            self._normalized.append(normalized)
+            self._tokens.append(frozenset(normalized.split()))
+            self._grams.append(grams)
+            self._exact.setdefault(normalized, []).append(position)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(position)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _candidates(self, grams: set[str]) -> list[tuple[int, int]]:
+        """
+        Return (position, shared selective trigram count) for the most
+        promising names.
+        """
+        limit = max(1, int(len(self._ids) * _COMMON_GRAM_FRACTION))
+        postings = [self._postings[g] for g in grams if g in self._postings]
+        selective = [p for p in postings if len(p) <= limit]
+        shared: Counter[int] = Counter()
+        for posting in selective or postings:
+            shared.update(posting)
+        return shared.most_common(_MAX_CANDIDATES)
+
+    def _score(
+        self, query_grams: set[str], query_tokens: frozenset[str], position: int
+    ) -> float:
+        return _similarity(
+            query_grams, query_tokens, self._grams[position], self._tokens[position]
+        )
+
+    def exact(self, name: str) -> list[NameMatch]:
+        """
+        Find the indexed names equal to ``name`` once normalized.
+
+        Returns:
+            list[NameMatch]: Every such entry, in the order indexed.
+        """
+        return [
+            NameMatch(self._ids[p], self._names[p], 1.0)
+            for p in self._exact.get(normalize_name(name), [])
+        ]
+
+    def search(self, name: str, k: int = 5, cutoff: float = 0.0) -> list[NameMatch]:
+        """
+        Find the indexed names most similar to ``name``.
+
+        Args:
+            name (str): The name to look up.
+            k (int, optional): The maximum number of matches to return.
+                Defaults to 5.
+            cutoff (float, optional): The minimum similarity score, between 0
+                and 1, for a match to be returned. Defaults to 0.0.
+
+        Returns:
+            list[NameMatch]: Up to ``k`` (id, name, score) matches, best first.
+                Ties keep the order the entries were indexed in.
+        """
+        query = normalize_name(name)
+        if not query or not self._ids:
+            return []
+
+        scored: dict[int, float] = {p: 1.0 for p in self._exact.get(query, [])}
+        if len(scored) < k:
+            query_grams = _trigrams(query)
+            query_tokens = frozenset(query.split())
+            for position, _ in self._candidates(query_grams):
+                if position not in scored:
+                    scored[position] = self._score(query_grams, query_tokens, position)
+
+        ranked = sorted(scored.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            NameMatch(self._ids[p], self._names[p], round(score, 3))
+            for p, score in ranked[:k]
+            if score >= cutoff
+        ]
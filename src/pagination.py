@@ -0,0 +1,61 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from config import PAGINATION_CONCURRENCY
+from scheduler import Priority, priority
+
+
+async def paginate(
+    fetch_page: Callable[..., Awaitable[dict]],
+    *args: Any,
+    limit: int = 50,
+    max_concurrency: int = PAGINATION_CONCURRENCY,
+    project: Callable[[Any], Any] | None = None,
+    **kwargs: Any,
+) -> list:
+    """
+    Fetch every item of an offset-paged Spotify collection.
+
+    The first page is fetched on its own to learn the collection's ``total``;
+    the remaining offsets are then requested concurrently, with at most
+    ``max_concurrency`` requests in flight, and reassembled in order. Page
+    requests run at bulk priority so they never hold up playback commands.
+
+    Args:
+        fetch_page (Callable[..., Awaitable[dict]]): A client method accepting
+            ``limit`` and ``offset`` keyword arguments, e.g.
+            ``client.sp.current_user_playlists``.
+        *args: Positional arguments passed to every ``fetch_page`` call.
+        limit (int, optional): The page size. Defaults to 50.
+        max_concurrency (int, optional): The maximum number of page requests
+            in flight.
+        project (Callable[[Any], Any] | None, optional): Converts each item as
+            its page arrives, so raw pages are not kept; items it maps to None
+            are dropped. Defaults to None, which keeps the raw items.
+        **kwargs: Keyword arguments passed to every ``fetch_page`` call.
+
+    Returns:
+        list: The items of every page, in collection order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(offset: int) -> tuple[list, int]:
+        async with semaphore:
+            page = await fetch_page(*args, limit=limit, offset=offset, **kwargs)
+        if not page:
+            return [], 0
+        items = page["items"]
+        if project is not None:
+            items = [p for p in map(project, items) if p is not None]
+        return items, page.get("total") or 0
+
+    with priority(Priority.BULK):
+        items, total = await fetch(0)
+        if total <= limit:
+            return items
+        pages = await asyncio.gather(
+            *(fetch(offset) for offset in range(limit, total, limit))
+        )
+    for page_items, _ in pages:
+        items.extend(page_items)
+    return items
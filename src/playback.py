@@ -0,0 +1,193 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from auth import client
+from config import (
+    PLAYBACK_IDLE_POLL_INTERVAL,
+    PLAYBACK_POLL_INTERVAL,
+    PLAYBACK_POLL_TIMEOUT,
+)
+from metrics import metrics
+from scheduler import Priority, priority
+from sessions import per_user, totals
+from utils import logger
+
+# Seconds to let Spotify apply a playback command before polling its effect.
+_COMMAND_SETTLE = 0.5
+# Shortest wait between polls, also used when a track is about to end.
+_MIN_INTERVAL = 0.5
+
+
+class PlaybackState:
+    """
+    Snapshot of the user's playback state, kept current by adaptive polling.
+
+    A background task polls ``/me/player`` every ``interval`` seconds while
+    a track plays (sooner if the track is about to end) and backs off to
+    ``idle_interval`` while paused or idle. Reads are served from the latest
+    snapshot, so upstream load does not grow with the number of callers.
+    Listeners are notified when the track or the playback state changes.
+    Polling stops after ``timeout`` seconds without reads or subscribers and
+    restarts on the next read.
+    """
+
+    def __init__(
+        self,
+        interval: float = PLAYBACK_POLL_INTERVAL,
+        idle_interval: float = PLAYBACK_IDLE_POLL_INTERVAL,
+        timeout: float = PLAYBACK_POLL_TIMEOUT,
+    ):
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.timeout = timeout
+        self._snapshot: dict | None = None
+        self._fetched_at = 0.0
+        self._read_at = 0.0
+        self._delay = interval
+        self._stale = True
+        self._wake = asyncio.Event()
+        self._poller: asyncio.Task | None = None
+        self._listeners: list[Callable[[dict | None], Awaitable[None]]] = []
+        self.polls = 0
+        self.hits = 0
+        self.misses = 0
+        # Replaced by the server to report whether anyone is subscribed.
+        self.subscribed: Callable[[], bool] = lambda: False
+
+    def add_listener(self, listener: Callable[[dict | None], Awaitable[None]]) -> None:
+        """
+        Call ``listener`` with the new snapshot whenever playback changes.
+        """
+        self._listeners.append(listener)
+
+    @staticmethod
+    def _compact(playback: dict | None) -> dict | None:
+        if not playback:
+            return None
+        item = playback.get("item") or {}
+        device = playback.get("device") or {}
+        return {
+            "is_playing": playback.get("is_playing", False),
+            "track": {
+                "uri": item["uri"],
+                "name": item["name"],
+                "artist": item["artists"][0]["name"] if item.get("artists") else None,
+                "duration_ms": item.get("duration_ms"),
+            }
+            if item
+            else None,
+            "progress_ms": playback.get("progress_ms"),
+            "shuffle_state": playback.get("shuffle_state"),
+            "repeat_state": playback.get("repeat_state"),
+            "device": device.get("name"),
+            "updated_at": time.time(),
+        }
+
+    @staticmethod
+    def _key(snapshot: dict | None) -> tuple | None:
+        # Progress moves on every poll; only these changes are notified.
+        if snapshot is None:
+            return None
+        track = snapshot["track"] or {}
+        return (
+            snapshot["is_playing"],
+            track.get("uri"),
+            snapshot["shuffle_state"],
+            snapshot["repeat_state"],
+            snapshot["device"],
+        )
+
+    async def refresh(self) -> dict | None:
+        """
+        Fetch the playback state now and notify listeners if it changed.
+
+        Returns:
+            dict | None: The new snapshot, or None when nothing is playing on
+                any device.
+        """
+        snapshot = self._compact(await client.sp.current_playback())
+        self.polls += 1
+        changed = self._key(snapshot) != self._key(self._snapshot)
+        self._snapshot = snapshot
+        self._fetched_at = time.monotonic()
+        self._stale = False
+        if changed:
+            for listener in self._listeners:
+                try:
+                    await listener(snapshot)
+                except Exception as e:
+                    logger.warning(f"Playback listener failed: {str(e)}")
+        return snapshot
+
+    async def snapshot(self) -> dict | None:
+        """
+        Get the latest playback state, fetching it only if no recent poll has.
+
+        Returns:
+            dict | None: The playback snapshot, or None when nothing is
+                playing on any device.
+        """
+        self.watch()
+        age = time.monotonic() - self._fetched_at
+        if self._stale or age > self._delay + _MIN_INTERVAL:
+            self.misses += 1
+            return await self.refresh()
+        self.hits += 1
+        return self._snapshot
+
+    def watch(self) -> None:
+        """
+        Start polling without reading, e.g. when a client subscribes.
+        """
+        self._read_at = time.monotonic()
+        self._start()
+
+    def poke(self) -> None:
+        """
+        Note that a playback command was sent, so the snapshot is out of date.
+        """
+        self._stale = True
+        self._delay = self.interval
+        self._wake.set()
+
+    def _start(self) -> None:
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+
+    def _next_delay(self) -> float:
+        snapshot = self._snapshot
+        if snapshot and snapshot["is_playing"]:
+            track = snapshot["track"] or {}
+            if track.get("duration_ms") and snapshot["progress_ms"] is not None:
+                remaining = (track["duration_ms"] - snapshot["progress_ms"]) / 1000
+                return max(_MIN_INTERVAL, min(self.interval, remaining))
+            return self.interval
+        return min(self.idle_interval, self._delay * 2)
+
+    async def _poll(self) -> None:
+        while self.subscribed() or time.monotonic() - self._read_at < self.timeout:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._delay)
+                self._wake.clear()
+                await asyncio.sleep(_COMMAND_SETTLE)
+            except TimeoutError:
+                pass
+            try:
+                # Background polls must not delay the user's own requests.
+                with priority(Priority.BULK):
+                    await self.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to poll playback state: {str(e)}")
+            self._delay = self._next_delay()
+
+    async def aclose(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+
+playback_state = per_user(lambda user: PlaybackState())
+metrics.register_cache(
+    "playback_state", totals(playback_state, lambda p: (p.hits, p.misses))
+)
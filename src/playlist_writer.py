@@ -0,0 +1,282 @@
+import json
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from auth import client
+from catalog import catalog
+from config import DB_PATH, PLAYLIST_WRITE_CHUNK
+from db import connect
+from models import Playlist
+from sessions import per_user, user_path
+from utils import logger
+
+
+@dataclass
+class PlaylistJob:
+    """
+    A bulk write to a playlist and how far it got.
+
+    ``written`` counts the leading URIs Spotify has confirmed, and
+    ``expected_total`` is the playlist length after the last confirmed
+    request, which tells a resumed job whether the request that failed was
+    applied anyway.
+    """
+
+    id: str
+    playlist_id: str
+    mode: str
+    uris: list[str]
+    written: int = 0
+    expected_total: int | None = None
+    snapshot_id: str | None = None
+    error: str | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.error is None and self.written >= len(self.uris)
+
+    def summary(self) -> dict:
+        return {
+            "job_id": self.id,
+            "playlist_id": self.playlist_id,
+            "mode": self.mode,
+            "written": self.written,
+            "total": len(self.uris),
+            "snapshot_id": self.snapshot_id,
+            "status": "done" if self.done else "failed",
+            "error": self.error,
+        }
+
+
+class PlaylistWriter:
+    """
+    Writes large track lists to playlists in Spotify's 100-URI chunks.
+
+    Spotify applies additions in arrival order and rejects positions past
+    the end of a playlist, so chunks cannot be sent concurrently without
+    scrambling the order. They are instead sent back to back over the pooled
+    keep-alive connection, each as soon as the previous one is confirmed,
+    and the returned ``snapshot_id`` is recorded after every chunk. Jobs are
+    persisted in SQLite until they finish, so a write that failed part way
+    (or a server that restarted) can be resumed without duplicating the
+    chunks already applied.
+    """
+
+    def __init__(self, path: Path = DB_PATH, chunk_size: int = PLAYLIST_WRITE_CHUNK):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._conn: sqlite3.Connection | None = None
+        self._user_id: str | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS playlist_jobs (
+                    id TEXT PRIMARY KEY,
+                    playlist_id TEXT NOT NULL,
+                    mode TEXT NOT NULL,
+                    uris TEXT NOT NULL,
+                    written INTEGER NOT NULL,
+                    expected_total INTEGER,
+                    snapshot_id TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+        return self._conn
+
+    def _save(self, job: PlaylistJob) -> None:
+        with self.conn:
+            if job.done:
+                self.conn.execute("DELETE FROM playlist_jobs WHERE id = ?", (job.id,))
+                return
+            self.conn.execute(
+                "INSERT OR REPLACE INTO playlist_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.playlist_id,
+                    job.mode,
+                    json.dumps(job.uris),
+                    job.written,
+                    job.expected_total,
+                    job.snapshot_id,
+                    job.error,
+                    time.time(),
+                ),
+            )
+
+    def job(self, job_id: str) -> PlaylistJob | None:
+        row = self.conn.execute(
+            "SELECT id, playlist_id, mode, uris, written, expected_total, "
+            "snapshot_id, error FROM playlist_jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        return PlaylistJob(
+            id=row[0],
+            playlist_id=row[1],
+            mode=row[2],
+            uris=json.loads(row[3]),
+            written=row[4],
+            expected_total=row[5],
+            snapshot_id=row[6],
+            error=row[7],
+        )
+
+    def pending(self) -> list[dict]:
+        """
+        Summaries of the unfinished jobs, most recently updated first.
+        """
+        rows = self.conn.execute(
+            "SELECT id FROM playlist_jobs ORDER BY updated_at DESC"
+        ).fetchall()
+        # A job may finish, and be deleted, between the two queries.
+        jobs = [self.job(row[0]) for row in rows]
+        return [job.summary() for job in jobs if job is not None]
+
+    async def create(
+        self, name: str, public: bool = False, description: str = ""
+    ) -> Playlist:
+        """
+        Create an empty playlist owned by the current user.
+
+        Raises:
+            Exception: If Spotify's response has no playlist.
+        """
+        user_id = self._user_id
+        if user_id is None:
+            user_id = self._user_id = (await client.sp.current_user())["id"]
+        playlist = await client.sp.user_playlist_create(
+            user_id, name, public=public, description=description
+        )
+        catalog.invalidate(playlist["id"])
+        created = Playlist.from_api(playlist)
+        if created is None:
+            raise Exception(f"Spotify returned no playlist for '{name}'.")
+        return created
+
+    async def write(
+        self,
+        playlist_id: str,
+        uris: list[str],
+        replace: bool = False,
+        skip_duplicates: bool = False,
+    ) -> PlaylistJob:
+        """
+        Add tracks to a playlist, or replace its tracks.
+
+        Args:
+            playlist_id (str): The ID of the playlist.
+            uris (list[str]): Track URIs, in the order they should appear.
+            replace (bool, optional): Replace the playlist's tracks instead of
+                appending. Defaults to False.
+            skip_duplicates (bool, optional): Drop repeated URIs, and when
+                appending, URIs the playlist already contains. Defaults to
+                False.
+
+        Returns:
+            PlaylistJob: The finished job, or the failed job to resume.
+        """
+        if skip_duplicates:
+            existing = (
+                set()
+                if replace
+                else {t.uri for t in await catalog.playlist_tracks(playlist_id)}
+            )
+            uris = [u for u in dict.fromkeys(uris) if u not in existing]
+        job = PlaylistJob(
+            id=uuid.uuid4().hex[:12],
+            playlist_id=playlist_id,
+            mode="replace" if replace else "add",
+            uris=uris,
+        )
+        if not replace:
+            playlist = await client.sp.playlist(
+                playlist_id, fields="snapshot_id,tracks.total"
+            )
+            job.expected_total = playlist["tracks"]["total"]
+            job.snapshot_id = playlist["snapshot_id"]
+        return await self._run(job)
+
+    async def resume(self, job_id: str) -> PlaylistJob:
+        """
+        Continue a job that failed part way.
+
+        Raises:
+            Exception: If there is no unfinished job with this ID.
+        """
+        job = self.job(job_id)
+        if job is None:
+            raise Exception(f"No unfinished playlist job '{job_id}'.")
+        if job.expected_total is not None:
+            await self._skip_applied_chunk(job)
+        return await self._run(job)
+
+    async def _skip_applied_chunk(self, job: PlaylistJob) -> None:
+        """
+        Count the chunk that was in flight when the job failed as written if
+        Spotify applied it after all, e.g. when only the response was lost.
+        """
+        playlist = await client.sp.playlist(
+            job.playlist_id, fields="snapshot_id,tracks.total"
+        )
+        if playlist["snapshot_id"] == job.snapshot_id:
+            return
+        if job.expected_total is None:
+            raise Exception(f"Playlist job {job.id} has no expected track count.")
+        chunk = len(job.uris[job.written : job.written + self.chunk_size])
+        if playlist["tracks"]["total"] == job.expected_total + chunk:
+            job.written += chunk
+            job.expected_total += chunk
+        else:
+            logger.warning(
+                f"Playlist {job.playlist_id} changed while job {job.id} was "
+                "paused, resuming after the last confirmed chunk"
+            )
+        job.snapshot_id = playlist["snapshot_id"]
+
+    async def _run(self, job: PlaylistJob) -> PlaylistJob:
+        sp = client.sp
+        job.error = None
+        self._save(job)
+        try:
+            if job.mode == "replace" and job.written == 0:
+                # The first request replaces the playlist, even with no URIs.
+                chunk = job.uris[: self.chunk_size]
+                response = await sp.playlist_replace_items(job.playlist_id, chunk)
+                job.written = len(chunk)
+                job.expected_total = len(chunk)
+                job.snapshot_id = response["snapshot_id"]
+                self._save(job)
+            while job.written < len(job.uris):
+                if job.expected_total is None:
+                    raise Exception(
+                        f"Playlist job {job.id} has no expected track count."
+                    )
+                chunk = job.uris[job.written : job.written + self.chunk_size]
+                response = await sp.playlist_add_items(job.playlist_id, chunk)
+                job.written += len(chunk)
+                job.expected_total += len(chunk)
+                job.snapshot_id = response["snapshot_id"]
+                self._save(job)
+        except Exception as e:
+            job.error = str(e)
+            self._save(job)
+            logger.error(
+                f"Playlist job {job.id} failed after {job.written} of "
+                f"{len(job.uris)} tracks: {str(e)}"
+            )
+        finally:
+            catalog.invalidate(job.playlist_id)
+        return job
+
+
+playlist_writer = per_user(lambda user: PlaylistWriter(user_path(DB_PATH, user)))
@@ -0,0 +1,118 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from config import DB_PATH, RESOLUTION_CACHE_NEGATIVE_TTL, RESOLUTION_CACHE_TTL
+from db import connect
+from metrics import metrics
+from utils import normalize_name
+
+
+class ResolutionCache:
+    """
+    Persistent SQLite cache of artist/song -> track URI resolutions.
+
+    Keys are normalized so that case, accents and spacing differences share
+    an entry. Searches that found nothing are cached too, for a shorter
+    ``negative_ttl``, so repeated misses do not go back to the network.
+    """
+
+    def __init__(
+        self,
+        path: Path = DB_PATH,
+        ttl: float = RESOLUTION_CACHE_TTL,
+        negative_ttl: float = RESOLUTION_CACHE_NEGATIVE_TTL,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS track_resolutions (
+                    artist TEXT NOT NULL,
+                    song TEXT NOT NULL,
+                    uri TEXT,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (artist, song)
+                ) WITHOUT ROWID
+                """
+            )
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM track_resolutions WHERE expires_at <= ?",
+                    (time.time(),),
+                )
+        return self._conn
+
+    def lookup(self, artist: str, song: str) -> tuple[bool, str | None]:
+        """
+        Look up a cached resolution.
+
+        Args:
+            artist (str): The artist name.
+            song (str): The song name.
+
+        Returns:
+            tuple[bool, str | None]: Whether a live entry was found, and the
+                cached URI, which is None for a cached miss.
+        """
+        row = self.conn.execute(
+            "SELECT uri, expires_at FROM track_resolutions WHERE artist = ? AND song = ?",
+            (normalize_name(artist), normalize_name(song)),
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            return False, None
+        if row[0] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, row[0]
+
+    def store(self, artist: str, song: str, uri: str | None) -> None:
+        """
+        Cache a resolution; a None ``uri`` records that nothing was found.
+        """
+        ttl = self.ttl if uri is not None else self.negative_ttl
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO track_resolutions VALUES (?, ?, ?, ?)",
+                (normalize_name(artist), normalize_name(song), uri, time.time() + ttl),
+            )
+
+    def clear(self) -> None:
+        with self.conn:
+            self.conn.execute("DELETE FROM track_resolutions")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": self.conn.execute(
+                "SELECT COUNT(*) FROM track_resolutions"
+            ).fetchone()[0],
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (
+                (self.hits + self.negative_hits) / lookups if lookups else 0.0
+            ),
+        }
+
+
+resolution_cache = ResolutionCache()
+metrics.register_cache(
+    "track_resolutions",
+    lambda: (
+        resolution_cache.hits + resolution_cache.negative_hits,
+        resolution_cache.misses,
+    ),
+)
@@ -1,62 +1,92 @@
-import difflib
-
-from auth import client
+import asyncio
+
+from catalog import catalog
+from config import SEARCH_CONCURRENCY
+from devices import device_registry
+from history import listening_history
+from metrics import metrics
+from playback import PlaybackState, playback_state
+from resolution_cache import resolution_cache
+from search import search_engine
+from singleflight import singleflight
 from server import mcp
+from sessions import on_create
+from top_tracks import top_tracks
 from utils import logger
 
+# Lowest search score accepted when resolving a song to a single track.
+_MIN_MATCH_SCORE = 0.3
+
 
 @mcp.resource(
     "play://{artist}_{song}",
     name="get_uri_from_artist_song",
     description="get unique spotify uri from artist and song",
 )
-def _get_uri_from_artist_song(artist: str, song: str) -> str | None:
+async def _get_uri_from_artist_song(artist: str, song: str) -> str | None:
     """
     Get a unique Spotify URI for a song given its artist and song name.
 
+    The best of several concurrent search strategies is used (see
+    ``SearchEngine.tracks``). Resolutions, including searches that found
+    nothing, are cached on disk so repeated requests for the same song do not
+    search again.
+
     Args:
         artist (str): The name of the artist of the song to search for.
         song (str): The name of the song to search for.
 
     Returns:
-        str | None: The URI of the first matching track, or None if no results were returned.
+        str | None: The URI of the best matching track, or None if no track
+            matched well enough.
     """
     try:
-        sp = client.sp
-        query = f"artist:{artist} track:{song}"
-        results = sp.search(q=query, type="track", limit=1)
-        if results is None:
-            return None
-        tracks = results["tracks"]["items"]
-        if tracks:
-            return tracks[0]["uri"]
-        else:
-            return None
+        found, uri = resolution_cache.lookup(artist, song)
+        if found:
+            return uri
+
+        hits = await search_engine.tracks(artist, song, k=1, cutoff=_MIN_MATCH_SCORE)
+        uri = hits[0].uri if hits else None
+        resolution_cache.store(artist, song, uri)
+        return uri
     except Exception as e:
         logger.error(f"Failed to get uri from artist and song: {str(e)}")
         raise
 
 
-def get_all_user_playlists():
+async def _get_uris_from_artist_songs(
+    songs: list[tuple[str, str]],
+) -> list[str | None]:
     """
-    Get a list of all user playlists.
+    Resolve many artist/song pairs to Spotify URIs concurrently.
+
+    Args:
+        songs (list[tuple[str, str]]): (artist, song) pairs to resolve.
 
     Returns:
-        list[dict]: A list of playlist dictionaries.
+        list[str | None]: The URI for each pair, in the same order, or None
+            where no track was found.
     """
-    all_playlists = []
-    sp = client.sp
-    results = sp.current_user_playlists(limit=50)
-    while results:
-        all_playlists.extend(results["items"])
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            break
-    return all_playlists
+    semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+    async def resolve(artist: str, song: str) -> str | None:
+        async with semaphore:
+            return await _get_uri_from_artist_song(artist, song)
 
+    return await asyncio.gather(*(resolve(artist, song) for artist, song in songs))
 
-def _get_user_playlists() -> list[str]:
+
+async def get_all_user_playlists():
+    """
+    Get a list of all user playlists, served from the playlist catalog.
+
+    Returns:
+        list[Playlist]: The user's playlists.
+    """
+    return await catalog.playlists()
+
+
+async def _get_user_playlists() -> list[str]:
     """
     Retrieve the names of all playlists for the current user.
 
@@ -66,17 +96,17 @@ def _get_user_playlists() -> list[str]:
     """
 
     try:
-        playlists = get_all_user_playlists()
+        playlists = await get_all_user_playlists()
         if playlists is None:
             return []
-        return [x["name"] for x in playlists]
+        return [x.name for x in playlists]
 
     except Exception as e:
         logger.error(f"Failed to get user playlists: {str(e)}")
         raise
 
 
-def _get_user_playlist_id(
+async def _get_user_playlist_id(
     playlist_name: str, similarity_threshold: float = 0.6
 ) -> str | None:
     """
@@ -92,30 +122,157 @@ def _get_user_playlist_id(
             was found.
     """
 
-    sp = client.sp
-
-    all_playlists = []
-    results = sp.current_user_playlists()
-    while results:
-        all_playlists.extend(results["items"])
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            break
-
-    playlist_names = [p["name"] for p in all_playlists]
-
-    matches = difflib.get_close_matches(
-        playlist_name, playlist_names, n=1, cutoff=similarity_threshold
+    matches = (await catalog.name_index()).search(
+        playlist_name, k=2, cutoff=similarity_threshold
     )
 
-    if matches:
-        best_match = matches[0]
-        playlist = next(p for p in all_playlists if p["name"] == best_match)
-        return playlist["id"]
-    else:
+    if not matches:
         logger.error("Playlist ID not found.")
         return None
+    best_match = matches[0]
+    if len(matches) > 1 and matches[1].score == best_match.score:
+        logger.warning(
+            f"Playlist name '{playlist_name}' is ambiguous, "
+            f"using {best_match.name} ({best_match.id})"
+        )
+    return best_match.id
+
+
+async def _find_user_playlists(playlist_name: str, limit: int = 5) -> list[dict]:
+    """
+    Find the user's playlists whose names best match a given name.
+
+    Args:
+        playlist_name (str): The name to search for.
+        limit (int, optional): The maximum number of matches. Defaults to 5.
+
+    Returns:
+        list[dict]: Matches with the playlist id, name and similarity score,
+            best match first.
+    """
+    matches = (await catalog.name_index()).search(playlist_name, k=limit)
+    return [match._asdict() for match in matches]
+
+
+@mcp.resource(
+    "read://devices",
+    name="get_devices",
+    description="get the user's available devices, marking the active and pinned one",
+)
+async def _get_devices() -> list[dict]:
+    """
+    Retrieve the user's available Spotify Connect devices.
+
+    Returns:
+        list[dict]: The devices with their id, name, type and whether each is
+            active or pinned for playback.
+    """
+    try:
+        return await device_registry.describe()
+    except Exception as e:
+        logger.error(f"Failed to get devices: {str(e)}")
+        raise
+
+
+@mcp.resource(
+    "read://resolution_cache",
+    name="get_resolution_cache_stats",
+    description="get hit/miss statistics of the artist/song resolution cache",
+)
+async def _get_resolution_cache_stats() -> dict:
+    """
+    Retrieve the artist/song resolution cache's size and hit/miss counters.
+
+    Returns:
+        dict: The entry count, hits, negative hits, misses and hit rate.
+    """
+    return resolution_cache.stats()
+
+
+@mcp.resource(
+    "read://coalesced_requests",
+    name="get_coalesced_request_stats",
+    description="get how many Spotify reads were shared with an identical "
+    "in-flight request",
+)
+async def _get_coalesced_request_stats() -> dict:
+    """
+    Retrieve single-flight statistics for Spotify reads.
+
+    Returns:
+        dict: The total number of requests saved, and per-request call and
+            shared counts.
+    """
+    return {"saved": singleflight.saved(), "requests": singleflight.stats()}
+
+
+@mcp.resource(
+    "metrics://summary",
+    name="get_metrics",
+    description="get per-tool latency, error and Spotify call metrics, and "
+    "cache hit rates",
+    mime_type="application/json",
+)
+async def _get_metrics() -> dict:
+    """
+    Retrieve the server's metrics.
+
+    Returns:
+        dict: Latency summaries, upstream call counts and errors per tool and
+            resource, latency and status counts per Spotify endpoint, and
+            cache hit rates.
+    """
+    return metrics.summary()
+
+
+@mcp.resource(
+    "metrics://prometheus",
+    name="get_metrics_prometheus",
+    description="get the server's metrics in Prometheus text format",
+    mime_type="text/plain",
+)
+async def _get_metrics_prometheus() -> str:
+    """
+    Retrieve the server's metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: The metrics text.
+    """
+    return metrics.prometheus()
+
+
+@mcp.resource(
+    "playback://state",
+    name="get_playback_state",
+    description="get the current playback state: track, whether it is playing, "
+    "progress, shuffle and device. Subscribe to be notified when it changes",
+    mime_type="application/json",
+)
+async def _get_playback_state() -> dict:
+    """
+    Retrieve the latest playback state snapshot.
+
+    Returns:
+        dict: The current track, playing flag, progress, shuffle and repeat
+            state and device, or ``{"is_playing": False, "track": None}`` when
+            nothing is playing on any device.
+    """
+    return await playback_state.snapshot() or {"is_playing": False, "track": None}
+
+
+async def _notify_playback_changed(snapshot: dict | None) -> None:
+    await mcp.notify_resource_updated("playback://state")
+
+
+def _setup_playback_state(state: PlaybackState) -> None:
+    # The poller runs as the state's user, so it only sees, and notifies, that
+    # user's subscriptions.
+    state.add_listener(_notify_playback_changed)
+    state.subscribed = lambda: mcp.has_subscribers("playback://state")
+
+
+on_create(playback_state, _setup_playback_state)
+mcp.on_subscribe("playback://state", lambda: playback_state.watch())
 
 
 @mcp.resource(
@@ -123,59 +280,36 @@ def _get_user_playlist_id(
     name="get_recent_tracks",
     description="get user's recently played tracks",
 )
-def _get_recent_tracks() -> dict[str, str]:
+async def _get_recent_tracks() -> dict[str, str]:
     """
     Retrieve the user's recently played tracks.
 
-    Returns:
-        list[str]: A list of URIs for the user's recently played tracks.
+    Plays are read from the local listening history after collecting any
+    new ones.
 
-    Raises:
-        Exception: If an error occurs while fetching the recent tracks.
+    Returns:
+        dict[str, str]: The last 10 played tracks, with artist as the key and
+            song as the value.
     """
-
-    recently_played = client.sp.current_user_recently_played(limit=10)
-    if recently_played:
-        track_names = []
-        artists = []
-        for track in recently_played["items"]:
-            track_names.append(track["track"]["name"])
-            artists.append(track["track"]["artists"][0]["name"])
-        return dict(zip(artists, track_names, strict=True))
-    else:
-        logger.error("Failed to get recent tracks")
-        raise
+    await listening_history.collect()
+    recent = listening_history.recent(limit=10)
+    return {play["artist"]: play["name"] for play in recent}
 
 
 @mcp.resource(
     "read://top_tracks_short_term",
     name="get_top_tracks_short_term",
-    description="Retrieve the user's top tracks for the past week.",
+    description="Retrieve the user's top tracks for the past month.",
 )
-def _get_top_tracks_short_term() -> dict[str, str] | bool:
+async def _get_top_tracks_short_term() -> list[dict]:
     """
-    Retrieve the user's top tracks for the past week.
+    Retrieve the user's top tracks for the past month.
 
     Returns:
-        list[str]: A list of URIs for the user's top tracks for the past week.
-
-    Raises:
-        Exception: If an error occurs while fetching the top tracks.
+        list[dict]: Up to 50 tracks, most played first, each with its URI,
+            name, artist, album and popularity.
     """
-    top_tracks = client.sp.current_user_top_tracks(time_range="short_term")
-    try:
-        track_names = []
-        artists = []
-        if top_tracks:
-            for track in top_tracks["items"]:
-                track_names.append(track["name"])
-                artists.append(track["artists"][0]["name"])
-            return dict(zip(artists, track_names, strict=True))
-        logger.error("Failed to get top tracks")
-        return False
-    except Exception as e:
-        logger.error(f"Failed to get top tracks: {str(e)}")
-        raise
+    return [t.to_dict() for t in await top_tracks.tracks("short_term")]
 
 
 @mcp.resource(
@@ -183,30 +317,15 @@ def _get_top_tracks_short_term() -> dict[str, str] | bool:
     name="get_top_tracks_medium_term",
     description="Retrieve the user's top tracks for the past 6 months.",
 )
-def _get_top_tracks_medium_term() -> dict[str, str] | bool:
+async def _get_top_tracks_medium_term() -> list[dict]:
     """
     Retrieve the user's top tracks for the past 6 months.
 
     Returns:
-        list[str]: A list of URIs for the user's top tracks for the past past 6 months.
-
-    Raises:
-        Exception: If an error occurs while fetching the top tracks.
+        list[dict]: Up to 50 tracks, most played first, each with its URI,
+            name, artist, album and popularity.
     """
-    top_tracks = client.sp.current_user_top_tracks(time_range="medium_term")
-    try:
-        track_names = []
-        artists = []
-        if top_tracks:
-            for track in top_tracks["items"]:
-                track_names.append(track["name"])
-                artists.append(track["artists"][0]["name"])
-            return dict(zip(artists, track_names, strict=True))
-        logger.error("Failed to get top tracks")
-        return False
-    except Exception as e:
-        logger.error(f"Failed to get top tracks: {str(e)}")
-        raise
+    return [t.to_dict() for t in await top_tracks.tracks("medium_term")]
 
 
 @mcp.resource(
@@ -214,31 +333,71 @@ def _get_top_tracks_medium_term() -> dict[str, str] | bool:
     name="get_top_tracks_long_term",
     description="Retrieve the user's top tracks for the past year.",
 )
-def _get_top_tracks_long_term() -> dict[str, str] | bool:
+async def _get_top_tracks_long_term() -> list[dict]:
     """
     Retrieve the user's top tracks for the past year.
 
     Returns:
-        list[str]: A list of URIs for the user's top tracks for the past past year.
+        list[dict]: Up to 50 tracks, most played first, each with its URI,
+            name, artist, album and popularity.
+    """
+    return [t.to_dict() for t in await top_tracks.tracks("long_term")]
 
-    Raises:
-        Exception: If an error occurs while fetching the top tracks.
+
+@mcp.resource(
+    "history://play_counts",
+    name="get_play_counts",
+    description="The user's most played tracks over the last 30 days, from the "
+    "local listening history.",
+)
+async def _get_play_counts() -> list[dict]:
     """
-    top_tracks = client.sp.current_user_top_tracks(time_range="long_term")
-    try:
-        track_names = []
-        artists = []
-        if top_tracks:
-            for track in top_tracks["items"]:
-                track_names.append(track["name"])
-                artists.append(track["artists"][0]["name"])
-            return dict(zip(artists, track_names, strict=True))
-        logger.error("Failed to get top tracks")
-        return False
-    except Exception as e:
-        logger.error(f"Failed to get top tracks: {str(e)}")
-        raise
+    Retrieve the most played tracks of the last 30 days.
+
+    Returns:
+        list[dict]: Up to 50 tracks with their play count and first and last
+            play, most played first.
+    """
+    await listening_history.collect()
+    return listening_history.play_counts(days=30)
+
+
+@mcp.resource(
+    "history://recent_discoveries",
+    name="get_recent_discoveries",
+    description="Tracks the user first heard in the last 30 days and has played "
+    "repeatedly since.",
+)
+async def _get_recent_discoveries() -> list[dict]:
+    """
+    Retrieve the tracks first heard in the last 30 days and played at least
+    twice.
+
+    Returns:
+        list[dict]: Up to 50 tracks with their play count, first heard and
+            last played, most played first.
+    """
+    await listening_history.collect()
+    return listening_history.discoveries(days=30)
+
+
+@mcp.resource(
+    "history://trending",
+    name="get_trending_tracks",
+    description="Tracks the user played much more in the last 7 days than in "
+    "the 4 weeks before.",
+)
+async def _get_trending_tracks() -> list[dict]:
+    """
+    Retrieve the tracks trending in the user's listening this week.
+
+    Returns:
+        list[dict]: Up to 50 tracks with their recent plays, baseline plays
+            and trending score, highest score first.
+    """
+    await listening_history.collect()
+    return listening_history.trending(days=7, baseline_days=28)
 
 
 if __name__ == "__main__":
-    print(_get_top_tracks_long_term())
+    print(asyncio.run(_get_top_tracks_long_term()))
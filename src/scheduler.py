@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Iterator
+
+from config import RATE_LIMIT, RATE_LIMIT_BULK_RESERVE, RATE_LIMIT_BURST
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BULK = 2
+
+
+_priority: ContextVar[Priority | None] = ContextVar("request_priority", default=None)
+
+
+@contextmanager
+def priority(level: Priority) -> Iterator[None]:
+    """
+    Run the Spotify requests made inside the block at the given priority,
+    including those made by tasks started within it.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority | None:
+    return _priority.get()
+
+
+class RequestScheduler:
+    """
+    Token-bucket scheduler shared by every Spotify request.
+
+    Requests wait for a token before they are sent. Waiters are served in
+    priority order, and bulk requests may not spend the last ``bulk_reserve``
+    tokens, so background syncs leave headroom for interactive commands.
+    After a 429 the whole bucket is paused until the ``Retry-After`` delay
+    has passed.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT,
+        burst: int = RATE_LIMIT_BURST,
+        bulk_reserve: int = RATE_LIMIT_BULK_RESERVE,
+    ):
+        """
+        Args:
+            rate (float, optional): Tokens added per second.
+            burst (int, optional): The bucket capacity.
+            bulk_reserve (int, optional): Tokens only non-bulk requests may
+                use.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.bulk_reserve = min(bulk_reserve, burst - 1)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold every request for at least ``seconds``.
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self, level: Priority = Priority.DEFAULT) -> None:
+        """
+        Wait until a request at the given priority may be sent.
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (level, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        while self._queue:
+            level, _, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            self._refill()
+            needed = 1 + (self.bulk_reserve if level == Priority.BULK else 0)
+            delay = max(
+                self._paused_until - time.monotonic(),
+                (needed - self._tokens) / self.rate,
+            )
+            if delay > 0:
+                # Sleep in short steps so a higher-priority request that
+                # arrives meanwhile is served first.
+                await asyncio.sleep(min(delay, 0.05))
+                continue
+            heapq.heappop(self._queue)
+            self._tokens -= 1
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "tokens": round(self._tokens, 2),
+            "waiting": len(self._queue),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        }
+
+
+scheduler = RequestScheduler()
@@ -0,0 +1,232 @@
+import asyncio
+from typing import Callable, NamedTuple, TypeVar
+
+from auth import client
+from models import Playlist, Track
+from name_index import similarity
+from utils import logger
+
+# Results requested from each query strategy.
+_RESULTS_PER_QUERY = 10
+# Markets searched: the user's own, where relinked tracks are playable, and
+# none, which finds releases missing from the user's catalogue listing.
+_MARKETS = ("from_token", None)
+
+
+class TrackHit(NamedTuple):
+    uri: str
+    name: str
+    artist: str
+    album: str | None
+    popularity: int | None
+    score: float
+
+
+class PlaylistHit(NamedTuple):
+    uri: str
+    name: str
+    owner_id: str | None
+    tracks_total: int | None
+    score: float
+
+
+Hit = TypeVar("Hit", TrackHit, PlaylistHit)
+
+
+class SearchEngine:
+    """
+    Looks up tracks and public playlists with several search strategies, and
+    ranks the merged results.
+
+    A single strict query misses on punctuation, featured artists and
+    alternative titles, and the first result of a loose one is often a
+    cover or a remix. The strict query in the user's market is sent first;
+    only when fewer than the requested number of candidates clear the
+    cutoff are the fallbacks (a loose query, and no market) sent, together,
+    so most lookups cost one search and a miss costs one more round trip
+    rather than one per strategy. Results are deduplicated by URI, and each
+    candidate is scored by name similarity to the request plus popularity.
+    """
+
+    async def _fan_out(
+        self, queries: list[tuple[str, str | None]], type: str
+    ) -> list[list[dict]]:
+        """
+        Run the searches concurrently.
+
+        Returns:
+            list[list[dict]]: Each search's result items, without the null
+                entries Spotify returns for unavailable items.
+
+        Raises:
+            Exception: If every search failed.
+        """
+        sp = client.sp
+        responses = await asyncio.gather(
+            *(
+                sp.search(q=q, type=type, limit=_RESULTS_PER_QUERY, market=market)
+                for q, market in queries
+            ),
+            return_exceptions=True,
+        )
+        failures = [r for r in responses if isinstance(r, BaseException)]
+        if len(failures) == len(responses):
+            raise failures[0]
+        for failure in failures:
+            logger.warning(f"Search strategy failed: {str(failure)}")
+        return [
+            [item for item in response[f"{type}s"]["items"] if item]
+            for response in responses
+            if response and not isinstance(response, BaseException)
+        ]
+
+    async def _staged(
+        self,
+        stages: list[list[tuple[str, str | None]]],
+        type: str,
+        rank: Callable[[dict[str, tuple[dict, int]]], list[Hit]],
+        k: int,
+        cutoff: float,
+    ) -> list[Hit]:
+        """
+        Run the stages of searches in turn, stopping at the first after which
+        ``k`` ranked candidates clear the cutoff.
+
+        Raises:
+            Exception: If every search failed.
+        """
+        results: list[list[dict]] = []
+        failure: Exception | None = None
+        hits: list[Hit] = []
+        for queries in stages:
+            try:
+                results += await self._fan_out(queries, type)
+            except Exception as e:
+                logger.warning(f"Search strategy failed: {str(e)}")
+                failure = e
+                continue
+            hits = rank(self._merge(results))
+            if sum(hit.score >= cutoff for hit in hits) >= k:
+                break
+        if failure is not None and not results:
+            raise failure
+        return [hit for hit in hits[:k] if hit.score >= cutoff]
+
+    @staticmethod
+    def _merge(results: list[list[dict]]) -> dict[str, tuple[dict, int]]:
+        """
+        Deduplicate results by URI, keeping each item's best rank.
+        """
+        merged: dict[str, tuple[dict, int]] = {}
+        for items in results:
+            for rank, item in enumerate(items):
+                uri = item.get("uri")
+                if uri and (uri not in merged or rank < merged[uri][1]):
+                    merged[uri] = (item, rank)
+        return merged
+
+    async def tracks(
+        self, artist: str, song: str, k: int = 5, cutoff: float = 0.0
+    ) -> list[TrackHit]:
+        """
+        Find the tracks best matching an artist and song name.
+
+        The score weighs the song name's similarity most, then the artist's,
+        then the track's popularity, so the original recording ranks above
+        covers and karaoke versions with the same title.
+
+        Args:
+            artist (str): The artist's name, or "" if unknown.
+            song (str): The song's name.
+            k (int, optional): The number of tracks returned. Defaults to 5.
+            cutoff (float, optional): The lowest score returned, between 0 and
+                1. Defaults to 0.0.
+
+        Returns:
+            list[TrackHit]: The best matches, best first.
+        """
+        strict = f"artist:{artist} track:{song}" if artist else f"track:{song}"
+        loose = f"{artist} {song}".strip()
+        stages: list[list[tuple[str, str | None]]] = [
+            [(strict, _MARKETS[0])],
+            [(strict, _MARKETS[1]), (loose, _MARKETS[0])],
+        ]
+
+        def rank(merged: dict[str, tuple[dict, int]]) -> list[TrackHit]:
+            hits = []
+            for item, _ in merged.values():
+                track = Track.from_api(item)
+                if track is None:
+                    continue
+                popularity = (track.popularity or 0) / 100
+                if artist:
+                    score = (
+                        0.5 * similarity(song, track.name)
+                        + 0.3 * similarity(artist, track.artist)
+                        + 0.2 * popularity
+                    )
+                else:
+                    score = 0.8 * similarity(song, track.name) + 0.2 * popularity
+                hits.append(
+                    TrackHit(
+                        track.uri,
+                        track.name,
+                        track.artist,
+                        track.album,
+                        track.popularity,
+                        round(score, 3),
+                    )
+                )
+            hits.sort(key=lambda hit: -hit.score)
+            return hits
+
+        return await self._staged(stages, "track", rank, k, cutoff)
+
+    async def playlists(
+        self, query: str, k: int = 5, cutoff: float = 0.0
+    ) -> list[PlaylistHit]:
+        """
+        Find the public playlists best matching a name.
+
+        Search results carry no playlist popularity, so Spotify's own
+        ranking, which favours followed playlists, stands in for it.
+
+        Args:
+            query (str): The playlist name.
+            k (int, optional): The number of playlists returned. Defaults to
+                5.
+            cutoff (float, optional): The lowest score returned, between 0 and
+                1. Defaults to 0.0.
+
+        Returns:
+            list[PlaylistHit]: The best matches, best first.
+        """
+        stages: list[list[tuple[str, str | None]]] = [
+            [(query, market)] for market in _MARKETS
+        ]
+
+        def rank(merged: dict[str, tuple[dict, int]]) -> list[PlaylistHit]:
+            hits = []
+            for item, position in merged.values():
+                playlist = Playlist.from_api(item)
+                if playlist is None:
+                    continue
+                score = 0.8 * similarity(query, playlist.name) + 0.2 * (
+                    1 - position / _RESULTS_PER_QUERY
+                )
+                hits.append(
+                    PlaylistHit(
+                        playlist.uri,
+                        playlist.name,
+                        playlist.owner_id,
+                        playlist.tracks_total,
+                        round(score, 3),
+                    )
+                )
+            hits.sort(key=lambda hit: -hit.score)
+            return hits
+
+        return await self._staged(stages, "playlist", rank, k, cutoff)
+
+
+search_engine = SearchEngine()
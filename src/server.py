@@ -1,3 +1,178 @@
+import functools
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+from weakref import WeakSet
+
+from mcp import types
 from mcp.server.fastmcp import FastMCP
+from mcp.server.session import ServerSession
+from mcp.types import AnyFunction
+from pydantic import AnyUrl
+
+from auth import client
+from history import listening_history
+from metrics import metrics
+from sessions import current_user, existing
+from utils import logger
+
+
+class InstrumentedFastMCP(FastMCP):
+    """
+    FastMCP whose tools and resources record latency, error and upstream call
+    metrics. The decorators return the undecorated function, so handlers that
+    call each other directly are only measured as the outer handler.
+
+    The first tool or resource call of a connected user that reaches Spotify
+    starts collecting their listening history in the background, so that
+    neither the server's startup nor a user without credentials triggers
+    Spotify requests of its own.
+
+    Clients may also subscribe to resources; ``notify_resource_updated`` then
+    tells each session of the current user subscribed to it that a resource
+    changed. Subscriptions are kept per user, since the same URI names each
+    user's own data.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # Subscribed sessions by user and URI, held weakly so that closed
+        # sessions drop out.
+        self._subscribers: defaultdict[
+            tuple[str | None, str], WeakSet[ServerSession]
+        ] = defaultdict(WeakSet)
+        self._on_subscribe: dict[str, Callable[[], None]] = {}
+        server = self._mcp_server
+        server.subscribe_resource()(self._subscribe)
+        server.unsubscribe_resource()(self._unsubscribe)
+        get_capabilities = server.get_capabilities
+
+        # The low-level server always advertises subscribe=False.
+        def capabilities(*args: Any, **kwargs: Any) -> types.ServerCapabilities:
+            result = get_capabilities(*args, **kwargs)
+            if result.resources is not None:
+                result.resources.subscribe = True
+            return result
+
+        server.get_capabilities = capabilities  # type: ignore[method-assign]
+
+    def on_subscribe(self, uri: str, callback: Callable[[], None]) -> None:
+        """
+        Call ``callback`` whenever a session subscribes to ``uri``.
+        """
+        self._on_subscribe[uri] = callback
+
+    async def _subscribe(self, uri: AnyUrl) -> None:
+        session = self._mcp_server.request_context.session
+        self._subscribers[(current_user.get(), str(uri))].add(session)
+        if str(uri) in self._on_subscribe:
+            self._on_subscribe[str(uri)]()
+
+    async def _unsubscribe(self, uri: AnyUrl) -> None:
+        session = self._mcp_server.request_context.session
+        self._subscribers[(current_user.get(), str(uri))].discard(session)
+
+    def has_subscribers(self, uri: str) -> bool:
+        """
+        Whether any of the current user's sessions is subscribed to ``uri``.
+        """
+        return bool(self._subscribers.get((current_user.get(), uri)))
+
+    async def notify_resource_updated(self, uri: str) -> None:
+        """
+        Send a resource updated notification to every session of the current
+        user subscribed to ``uri``.
+        """
+        key = (current_user.get(), uri)
+        for session in list(self._subscribers.get(key, ())):
+            try:
+                await session.send_resource_updated(AnyUrl(uri))
+            except Exception as e:
+                logger.warning(f"Dropping subscriber to {uri}: {str(e)}")
+                self._subscribers[key].discard(session)
+
+    def tool(
+        self, name: str | None = None, description: str | None = None
+    ) -> Callable[[AnyFunction], AnyFunction]:
+        register = super().tool(name=name, description=description)
+
+        def decorator(fn: AnyFunction) -> AnyFunction:
+            register(metrics.instrument("tool", name or fn.__name__, _collecting(fn)))
+            return fn
+
+        return decorator
+
+    def resource(self, uri: str, **kwargs) -> Callable[[AnyFunction], AnyFunction]:
+        register = super().resource(uri, **kwargs)
+
+        def decorator(fn: AnyFunction) -> AnyFunction:
+            register(metrics.instrument("resource", uri, _collecting(fn)))
+            return fn
+
+        return decorator
+
+
+def _collecting(fn: AnyFunction) -> AnyFunction:
+    """
+    Wrap a handler so that its success, if it reached Spotify, starts the
+    current user's listening history collector.
+    """
+
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = await fn(*args, **kwargs)
+        # Only while one of the user's MCP sessions is open to stop it again.
+        if metrics.upstream_calls() and current_user.get() in _user_sessions:
+            listening_history.start()
+        return result
+
+    return wrapper
+
+
+# Number of open ``serving`` blocks.
+_holders = 0
+
+
+@asynccontextmanager
+async def serving() -> AsyncIterator[None]:
+    """
+    Keep the process's shared state open while the block runs.
+
+    When the last holder leaves, every user's session, with its pollers and
+    collectors, and the HTTP client are closed. Over stdio the one MCP
+    session is the only holder; a network server holds it for its whole
+    lifetime, so clients disconnecting do not drop the warm caches.
+    """
+    global _holders
+    _holders += 1
+    try:
+        yield
+    finally:
+        _holders -= 1
+        if _holders == 0:
+            await client.aclose()
+
+
+# Number of open MCP sessions of each user.
+_user_sessions: Counter[str | None] = Counter()
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    # Runs once per MCP session, as the session's user.
+    user = current_user.get()
+    _user_sessions[user] += 1
+    try:
+        async with serving():
+            yield
+    finally:
+        _user_sessions[user] -= 1
+        if not _user_sessions[user]:
+            del _user_sessions[user]
+            # Nobody is listening for this user's plays any more.
+            history = existing(listening_history, user)
+            if history is not None:
+                history.stop()
+
 
-mcp = FastMCP("Spotify_MCP")
+mcp = InstrumentedFastMCP("Spotify_MCP", lifespan=lifespan)
@@ -0,0 +1,251 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar, cast
+from urllib.parse import quote
+
+from config import MAX_SESSIONS, SESSION_IDLE_TIMEOUT, USER_DATA_DIR
+from utils import logger
+
+T = TypeVar("T")
+
+# The Spotify user the current request acts for. None is the default user,
+# whose token cache and database live at the configured paths.
+current_user: ContextVar[str | None] = ContextVar("current_user", default=None)
+# Whether per-user state is being used by background work rather than by a
+# request, which must not keep an idle session alive.
+_background: ContextVar[bool] = ContextVar("background", default=False)
+
+
+@contextmanager
+def as_user(user: str | None) -> Iterator[None]:
+    """
+    Act for ``user`` within the block, including in tasks it starts.
+    """
+    token = current_user.set(user)
+    try:
+        yield
+    finally:
+        current_user.reset(token)
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """
+    Use per-user state within the block, including in tasks it starts,
+    without counting as the user's activity, so that periodic background
+    work does not keep an idle session from being evicted.
+    """
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def user_path(path: Path, user: str | None) -> Path:
+    """
+    Get a user's copy of a per-user file, such as a token cache or database.
+
+    Args:
+        path (Path): The file used for the default user.
+        user (str | None): The user.
+
+    Returns:
+        Path: ``path`` for the default user, otherwise a file of the same
+            name in the user's directory under ``USER_DATA_DIR``.
+
+    Raises:
+        Exception: If ``user`` is empty, ``.`` or ``..``.
+    """
+    if user is None:
+        return path
+    if user in ("", ".", ".."):
+        raise Exception(f"Invalid Spotify user name {user!r}.")
+    # Percent-encoding keeps distinct users in distinct directories.
+    directory = USER_DATA_DIR / quote(user, safe="")
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / path.name
+
+
+class SessionPool:
+    """
+    A bounded pool of per-user state, evicting the least recently used.
+
+    Each user's session holds that user's instance of every ``per_user``
+    object (token manager, caches, stores), created on first use. Sessions
+    unused for ``idle_timeout`` seconds, and the least recently used beyond
+    ``max_sessions``, are evicted; their instances' ``aclose`` is awaited in
+    the background and they are recreated from disk if the user returns.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_SESSIONS,
+        idle_timeout: float = SESSION_IDLE_TIMEOUT,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: OrderedDict[str | None, dict[Any, Any]] = OrderedDict()
+        self._used_at: dict[str | None, float] = {}
+        self._closing: set[asyncio.Task] = set()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def users(self) -> list[str | None]:
+        """
+        The users with a session, most recently active first.
+        """
+        return list(reversed(self._sessions))
+
+    def state(self, key: Any, factory: Callable[[str | None], T]) -> T:
+        """
+        Get the current user's instance for ``key``, creating it if needed.
+        Unless in a ``background`` block, this marks the session as used.
+        """
+        user = current_user.get()
+        now = time.monotonic()
+        session = self._sessions.get(user)
+        if session is None:
+            session = self._sessions[user] = {}
+            self._used_at[user] = now
+        if not _background.get():
+            self._sessions.move_to_end(user)
+            self._used_at[user] = now
+        self._evict(now)
+        if key not in session:
+            session[key] = factory(user)
+        return session[key]
+
+    def peek(self, key: Any, user: str | None) -> Any | None:
+        """
+        Get a user's existing instance for ``key``, without creating it or
+        marking the session as used.
+        """
+        session = self._sessions.get(user)
+        return session.get(key) if session is not None else None
+
+    def instances(self, key: Any) -> list[Any]:
+        """
+        Every user's existing instance for ``key``.
+        """
+        return [s[key] for s in self._sessions.values() if key in s]
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            user = next(iter(self._sessions))
+            idle = now - self._used_at[user] > self.idle_timeout
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            self._close(user)
+
+    def _close(self, user: str | None) -> None:
+        session = self._sessions.pop(user)
+        del self._used_at[user]
+        self.evictions += 1
+        logger.info(f"Closing session of user {user!r}")
+        for instance in session.values():
+            if hasattr(instance, "aclose"):
+                try:
+                    task = asyncio.get_running_loop().create_task(instance.aclose())
+                except RuntimeError:
+                    continue
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+    async def aclose(self) -> None:
+        """
+        Close every session.
+        """
+        for user in list(self._sessions):
+            self._close(user)
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+
+sessions = SessionPool()
+
+
+class PerUser:
+    """
+    Stands in for a module-level singleton that must be kept per user.
+
+    Attribute access is forwarded to the current user's instance, which
+    ``factory`` creates from the user on first use. Use ``current`` for the
+    instance itself, e.g. to call ``len`` on it.
+    """
+
+    __slots__ = ("_factory", "_setup")
+
+    def __init__(self, factory: Callable[[str | None], Any]):
+        self._factory = factory
+        self._setup: list[Callable[[Any], None]] = []
+
+    def _create(self, user: str | None) -> Any:
+        instance = self._factory(user)
+        for setup in self._setup:
+            setup(instance)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(sessions.state(self, self._create), name)
+
+
+def per_user(factory: Callable[[str | None], T]) -> T:
+    """
+    Create a per-user stand-in for the object ``factory`` makes.
+
+    Args:
+        factory (Callable[[str | None], T]): Creates a user's instance.
+
+    Returns:
+        T: A ``PerUser`` proxy, typed as the object it stands in for.
+    """
+    return cast(T, PerUser(factory))
+
+
+def current(proxy: T) -> T:
+    """
+    Get the current user's instance behind a ``per_user`` proxy.
+    """
+    return sessions.state(proxy, cast(PerUser, proxy)._create)
+
+
+def existing(proxy: Any, user: str | None) -> Any | None:
+    """
+    Get a user's instance behind a ``per_user`` proxy if their session holds
+    one, without creating it.
+    """
+    return sessions.peek(proxy, user)
+
+
+def on_create(proxy: Any, setup: Callable[[Any], None]) -> None:
+    """
+    Run ``setup`` on every user's instance of a ``per_user`` proxy, including
+    the instances that already exist.
+    """
+    cast(PerUser, proxy)._setup.append(setup)
+    for instance in sessions.instances(proxy):
+        setup(instance)
+
+
+def totals(
+    proxy: Any, stats: Callable[[Any], tuple[int, int]]
+) -> Callable[[], tuple[int, int]]:
+    """
+    Sum cache statistics over every user's instance of a ``per_user`` proxy.
+
+    Returns:
+        Callable[[], tuple[int, int]]: Returns the summed ``stats``, suitable
+            for ``metrics.register_cache``.
+    """
+
+    def summed() -> tuple[int, int]:
+        pairs = [stats(instance) for instance in sessions.instances(proxy)]
+        return sum(p[0] for p in pairs), sum(p[1] for p in pairs)
+
+    return summed
@@ -0,0 +1,382 @@
+import asyncio
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from auth import client
+from config import SIMILARITY_CACHE_TTL
+from history import listening_history
+from library import saved_tracks
+from metadata import MetadataStore, metadata_store
+from metrics import metrics
+from models import Track
+from scheduler import Priority, priority
+from sessions import per_user, totals
+from top_tracks import TIME_RANGES, top_tracks
+from utils import logger, normalize_name
+
+# Spotify's maximum number of IDs in one tracks or artists request.
+_BATCH = 50
+# Largest genre vocabulary; rarer genres are left out of the vectors.
+_MAX_GENRES = 512
+# Weights of the score components, which each range from 0 to 1.
+_GENRE_WEIGHT = 0.6
+_ARTIST_WEIGHT = 0.2
+_POPULARITY_WEIGHT = 0.1
+_YEAR_WEIGHT = 0.1
+# Years apart at which the release year stops contributing to the score.
+_YEAR_SPAN = 30
+
+
+@dataclass
+class Candidates:
+    """
+    Candidate tracks and their features, in parallel sequences.
+
+    ``genre_ids`` lists each track's genres as vocabulary indexes. The
+    features are also held as arrays for vectorized scoring: ``genre_matrix``
+    has one L2-normalized row of genre weights per track.
+    """
+
+    tracks: list[Track]
+    genre_ids: list[list[int]]
+    genres: list[str]
+    artist_index: dict[str, int]
+    artist_ids: list[int]
+    years: list[float | None]
+    popularity: list[float | None]
+    genre_matrix: np.ndarray = field(default_factory=lambda: np.zeros((0, 0)))
+    arrays: dict[str, np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def build(
+        cls, tracks: list[Track], artist_genres: dict[str, list[str]]
+    ) -> "Candidates":
+        counts = Counter(
+            g for t in tracks for g in artist_genres.get(t.artist_id or "", [])
+        )
+        genres = [g for g, _ in counts.most_common(_MAX_GENRES)]
+        genre_index = {g: i for i, g in enumerate(genres)}
+        artist_index: dict[str, int] = {}
+        candidates = cls(
+            tracks=tracks,
+            genre_ids=[
+                [
+                    genre_index[g]
+                    for g in artist_genres.get(t.artist_id or "", [])
+                    if g in genre_index
+                ]
+                for t in tracks
+            ],
+            genres=genres,
+            artist_index=artist_index,
+            artist_ids=[
+                artist_index.setdefault(normalize_name(t.artist), len(artist_index))
+                for t in tracks
+            ],
+            years=[t.release_year for t in tracks],
+            popularity=[t.popularity for t in tracks],
+        )
+        matrix = np.zeros((len(tracks), len(genres)), dtype=np.float32)
+        for row, ids in enumerate(candidates.genre_ids):
+            if ids:
+                matrix[row, ids] = 1.0 / math.sqrt(len(ids))
+        candidates.genre_matrix = matrix
+        candidates.arrays = {
+            "artist_ids": np.array(candidates.artist_ids),
+            "years": np.array([math.nan if y is None else y for y in candidates.years]),
+            "popularity": np.array(
+                [math.nan if p is None else p for p in candidates.popularity]
+            ),
+        }
+        return candidates
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+
+def _mean(values: list[float | None]) -> float | None:
+    present = [v for v in values if v is not None]
+    return sum(present) / len(present) if present else None
+
+
+class SimilarityEngine:
+    """
+    Ranks the user's own tracks by similarity to a set of seeds.
+
+    Candidates are the user's top tracks, liked songs and listening history.
+    Their metadata is stored as those are synced; only the artist genres, and
+    any track metadata still missing, are batch-fetched (50 IDs per request,
+    concurrently) and kept in SQLite. The feature vectors are rebuilt in
+    memory at most every ``ttl`` seconds. A query scores every
+    candidate at once against the seeds' genre centroid, artists, release
+    year and popularity, so a ranked list costs no Spotify requests once the
+    candidates are built.
+    """
+
+    def __init__(
+        self, store: MetadataStore | None = None, ttl: float = SIMILARITY_CACHE_TTL
+    ):
+        self.store = store or MetadataStore()
+        self.ttl = ttl
+        self._candidates: Candidates | None = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def _fetch_missing(self, uris: list[str]) -> None:
+        """
+        Fetch and store the metadata of the tracks, and the genres of their
+        artists, that are not stored yet.
+        """
+        uris = list(dict.fromkeys(uris))
+        known = self.store.tracks(uris)
+        missing = [u for u in uris if u not in known]
+
+        async def fetch_tracks(ids: list[str]) -> list[Track]:
+            response = await client.sp.tracks(ids, market="from_token")
+            return [t for t in map(Track.from_api, response["tracks"]) if t]
+
+        batches = await asyncio.gather(
+            *(
+                fetch_tracks([u.rsplit(":", 1)[-1] for u in missing[i : i + _BATCH]])
+                for i in range(0, len(missing), _BATCH)
+            )
+        )
+        self.store.put_tracks([t for batch in batches for t in batch])
+
+        known_genres = self.store.genres()
+        artist_ids = list(
+            dict.fromkeys(
+                t.artist_id
+                for t in self.store.tracks(uris).values()
+                if t.artist_id and t.artist_id not in known_genres
+            )
+        )
+
+        async def fetch_artists(ids: list[str]) -> dict[str, list[str]]:
+            response = await client.sp.artists(ids)
+            return {a["id"]: a.get("genres", []) for a in response["artists"] if a}
+
+        genre_batches = await asyncio.gather(
+            *(
+                fetch_artists(artist_ids[i : i + _BATCH])
+                for i in range(0, len(artist_ids), _BATCH)
+            )
+        )
+        self.store.put_genres(
+            {k: v for batch in genre_batches for k, v in batch.items()}
+        )
+        if missing or artist_ids:
+            logger.info(
+                f"Fetched metadata for {len(missing)} tracks and "
+                f"{len(artist_ids)} artists"
+            )
+
+    async def candidates(self, force: bool = False) -> Candidates:
+        """
+        Get the candidate set, rebuilding it if it is older than ``ttl``.
+
+        Args:
+            force (bool, optional): Rebuild even if the candidates are recent.
+                Defaults to False.
+        """
+        async with self._lock:
+            if (
+                not force
+                and self._candidates is not None
+                and time.monotonic() - self._built_at < self.ttl
+            ):
+                self.hits += 1
+                return self._candidates
+            self.misses += 1
+            with priority(Priority.BULK):
+                await saved_tracks.sync()
+                await listening_history.collect()
+                top = [t for r in TIME_RANGES for t in await top_tracks.tracks(r)]
+            self.store.put_tracks(top)
+            uris = list(
+                dict.fromkeys(
+                    [t.uri for t in top]
+                    + saved_tracks.uris()
+                    + listening_history.uris()
+                )
+            )
+            with priority(Priority.BULK):
+                await self._fetch_missing(uris)
+            known = self.store.tracks(uris)
+            self._candidates = Candidates.build(
+                [known[u] for u in uris if u in known], self.store.genres()
+            )
+            self._built_at = time.monotonic()
+            return self._candidates
+
+    async def similar(
+        self,
+        seed_uris: list[str] | None = None,
+        artists: list[str] | None = None,
+        genres: list[str] | None = None,
+        min_year: int | None = None,
+        max_year: int | None = None,
+        min_popularity: int | None = None,
+        max_popularity: int | None = None,
+        max_per_artist: int = 3,
+        include_seeds: bool = False,
+        count: int = 30,
+    ) -> list[dict]:
+        """
+        Rank the user's tracks by similarity to seed tracks, artists and
+        genres, subject to constraints.
+
+        Args:
+            seed_uris (list[str] | None, optional): Seed track URIs. Defaults
+                to None.
+            artists (list[str] | None, optional): Seed artist names; their
+                tracks among the candidates are used as seeds. Defaults to
+                None.
+            genres (list[str] | None, optional): Seed genres, matched against
+                candidate genres by substring, e.g. "dance" matches
+                "dance pop". Defaults to None.
+            min_year (int | None, optional): Earliest release year. Defaults
+                to None.
+            max_year (int | None, optional): Latest release year. Defaults to
+                None.
+            min_popularity (int | None, optional): Lowest Spotify popularity,
+                0 to 100. Defaults to None.
+            max_popularity (int | None, optional): Highest Spotify popularity.
+                Defaults to None.
+            max_per_artist (int, optional): The most tracks by one artist.
+                Defaults to 3.
+            include_seeds (bool, optional): Allow the seed tracks in the
+                results. Defaults to False.
+            count (int, optional): The number of tracks returned. Defaults to
+                30.
+
+        Returns:
+            list[dict]: The best matching tracks with their score, best first.
+                With no seeds at all, the user's recent top tracks are used.
+        """
+        pool = await self.candidates()
+        if not len(pool):
+            return []
+        seed_uris = list(seed_uris or [])
+        position = {t.uri: i for i, t in enumerate(pool.tracks)}
+        # Seeds outside the candidate set still contribute their features.
+        outside_uris = [u for u in seed_uris if u not in position]
+        outside: list[Track] = []
+        if outside_uris:
+            await self._fetch_missing(outside_uris)
+            outside = list(self.store.tracks(outside_uris).values())
+            if len(outside) < len(outside_uris):
+                logger.warning("Some seed tracks could not be found")
+        seed_artists = {
+            pool.artist_index[n]
+            for n in map(normalize_name, artists or [])
+            if n in pool.artist_index
+        }
+        seeds = [position[u] for u in seed_uris if u in position]
+        seeds += [i for i, a in enumerate(pool.artist_ids) if a in seed_artists]
+        seed_genres = [
+            i
+            for i, g in enumerate(pool.genres)
+            if any(normalize_name(q) in g for q in genres or [])
+        ]
+        if not seeds and not seed_genres and not seed_uris:
+            short_term = await top_tracks.tracks("short_term")
+            seeds = [position[t.uri] for t in short_term if t.uri in position]
+
+        artist_genres = self.store.genres() if outside else {}
+        centroid = [0.0] * len(pool.genres)
+        for i in seeds:
+            for g in pool.genre_ids[i]:
+                centroid[g] += 1.0 / math.sqrt(len(pool.genre_ids[i]))
+        genre_index = {g: i for i, g in enumerate(pool.genres)}
+        for t in outside:
+            ids = [
+                genre_index[g]
+                for g in artist_genres.get(t.artist_id or "", [])
+                if g in genre_index
+            ]
+            for g in ids:
+                centroid[g] += 1.0 / math.sqrt(len(ids))
+            if normalize_name(t.artist) in pool.artist_index:
+                seed_artists.add(pool.artist_index[normalize_name(t.artist)])
+        for g in seed_genres:
+            centroid[g] += max(1.0, len(seeds) / len(seed_genres))
+        norm = math.sqrt(sum(c * c for c in centroid)) or 1.0
+        centroid = [c / norm for c in centroid]
+        seed_artists |= {pool.artist_ids[i] for i in seeds}
+        year = _mean([pool.years[i] for i in seeds] + [t.release_year for t in outside])
+        popularity = _mean(
+            [pool.popularity[i] for i in seeds] + [t.popularity for t in outside]
+        )
+
+        scores = self._score(pool, centroid, seed_artists, year, popularity)
+        excluded = (
+            set()
+            if include_seeds
+            else {position[u] for u in seed_uris if u in position}
+        )
+        per_artist: Counter[int] = Counter()
+        results = []
+        for i in sorted(range(len(pool)), key=scores.__getitem__, reverse=True):
+            track = pool.tracks[i]
+            if (
+                i in excluded
+                or per_artist[pool.artist_ids[i]] >= max_per_artist
+                or not _within(track.release_year, min_year, max_year)
+                or not _within(track.popularity, min_popularity, max_popularity)
+            ):
+                continue
+            per_artist[pool.artist_ids[i]] += 1
+            results.append(
+                {
+                    "uri": track.uri,
+                    "name": track.name,
+                    "artist": track.artist,
+                    "release_year": track.release_year,
+                    "popularity": track.popularity,
+                    "score": round(float(scores[i]), 4),
+                }
+            )
+            if len(results) == count:
+                break
+        return results
+
+    @staticmethod
+    def _score(
+        pool: Candidates,
+        centroid: list[float],
+        seed_artists: set[int],
+        year: float | None,
+        popularity: float | None,
+    ) -> list[float]:
+        arrays = pool.arrays
+        scores = _GENRE_WEIGHT * (
+            pool.genre_matrix @ np.array(centroid, dtype=np.float32)
+        )
+        scores += _ARTIST_WEIGHT * np.isin(arrays["artist_ids"], list(seed_artists))
+        if year is not None:
+            closeness = np.clip(1 - np.abs(arrays["years"] - year) / _YEAR_SPAN, 0, 1)
+            scores += _YEAR_WEIGHT * np.nan_to_num(closeness, nan=0.5)
+        if popularity is not None:
+            closeness = 1 - np.abs(arrays["popularity"] - popularity) / 100
+            scores += _POPULARITY_WEIGHT * np.nan_to_num(closeness, nan=0.5)
+        return scores.tolist()
+
+
+def _within(value: int | None, low: int | None, high: int | None) -> bool:
+    if value is None:
+        return low is None and high is None
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+similarity_engine = per_user(lambda user: SimilarityEngine(metadata_store))
+metrics.register_cache(
+    "similarity_candidates",
+    totals(similarity_engine, lambda s: (s.hits, s.misses)),
+)
@@ -0,0 +1,80 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from metrics import metrics
+
+# Maximum number of keys whose statistics are kept.
+_MAX_STATS_KEYS = 256
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one.
+
+    While a call for a key is in flight, later callers with the same key wait
+    for it and receive the same result (or exception) instead of starting
+    their own. Callers must treat shared results as read-only.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._stats: OrderedDict[str, dict[str, int]] = OrderedDict()
+        self.calls = 0
+        self.shared = 0
+
+    def _record(self, key: str, shared: bool) -> None:
+        self.calls += 1
+        self.shared += shared
+        stats = self._stats.setdefault(key, {"calls": 0, "shared": 0})
+        self._stats.move_to_end(key)
+        stats["calls"] += 1
+        stats["shared"] += shared
+        while len(self._stats) > _MAX_STATS_KEYS:
+            self._stats.popitem(last=False)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run ``fn`` unless a call with the same key is already in flight, in
+        which case wait for that call instead.
+
+        Args:
+            key (str): Identifies calls that are interchangeable.
+            fn (Callable[[], Awaitable[Any]]): Starts the call.
+
+        Returns:
+            Any: The result of the (possibly shared) call.
+        """
+        future = self._inflight.get(key)
+        self._record(key, shared=future is not None)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        # Shield the shared call so one caller being cancelled does not
+        # cancel it for everyone else.
+        return await asyncio.shield(future)
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved; callers re-raise it themselves.
+            future.exception()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Per-key call counts and how many of those calls shared another's
+        request, most recent first.
+        """
+        return dict(reversed(self._stats.items()))
+
+    def saved(self) -> int:
+        return self.shared
+
+
+singleflight = SingleFlight()
+metrics.register_cache(
+    "coalesced_reads",
+    lambda: (singleflight.shared, singleflight.calls - singleflight.shared),
+)
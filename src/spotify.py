@@ -0,0 +1,376 @@
+import importlib.util
+import random
+import time
+from urllib.parse import urlencode
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+from config import (
+    API_BASE_URL,
+    HTTP2,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_TIMEOUT,
+    RATE_LIMIT_MAX_RETRIES,
+)
+from etag_cache import ETagCache, etag_cache
+from metrics import Metrics, metrics
+from scheduler import Priority, RequestScheduler, current_priority, scheduler
+from sessions import current_user
+from singleflight import SingleFlight, singleflight
+from utils import logger
+
+
+class SpotifyError(Exception):
+    """
+    An error response from the Spotify Web API.
+    """
+
+    def __init__(
+        self, http_status: int, message: str, headers: httpx.Headers | None = None
+    ):
+        super().__init__(f"HTTP {http_status}: {message}")
+        self.http_status = http_status
+        self.message = message
+        self.headers = headers or httpx.Headers()
+
+
+class AsyncSpotify:
+    """
+    A minimal asyncio client for the Spotify Web API.
+
+    Requests share one pooled, keep-alive ``httpx.AsyncClient`` so that
+    concurrent tool calls overlap instead of blocking the event loop. Every
+    request goes through the shared ``RequestScheduler``, and responses with
+    HTTP 429 are retried after their ``Retry-After`` delay. Identical GETs
+    that are in flight at the same time share one request, and reads
+    Spotify tagged with an ETag are revalidated against the stored body.
+    Method names and arguments mirror the spotipy calls they replace.
+    """
+
+    def __init__(
+        self,
+        token_provider: Callable[[], Awaitable[str]],
+        base_url: str = API_BASE_URL,
+        http2: bool = HTTP2,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        timeout: float = HTTP_TIMEOUT,
+        request_scheduler: RequestScheduler = scheduler,
+        max_retries: int = RATE_LIMIT_MAX_RETRIES,
+        coalescer: SingleFlight = singleflight,
+        recorder: Metrics = metrics,
+        response_cache: ETagCache | None = etag_cache,
+    ):
+        """
+        Args:
+            token_provider (Callable[[], Awaitable[str]]): Returns a valid
+                access token for each request.
+            base_url (str, optional): The Web API base URL.
+            http2 (bool, optional): Negotiate HTTP/2 when the optional ``h2``
+                package is installed.
+            max_connections (int, optional): The connection pool size.
+            timeout (float, optional): The per-request timeout in seconds.
+            request_scheduler (RequestScheduler, optional): Rate limits and
+                orders requests.
+            max_retries (int, optional): Retries for rate-limited requests.
+            coalescer (SingleFlight, optional): Shares concurrent identical
+                GET requests.
+            recorder (Metrics, optional): Records each request's status and
+                latency.
+            response_cache (ETagCache | None, optional): Stores ETagged read
+                responses for conditional requests. None disables it.
+        """
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but h2 is not installed, using HTTP/1.1")
+            http2 = False
+        self._token_provider = token_provider
+        self._base_url = base_url
+        self._http2 = http2
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._http: httpx.AsyncClient | None = None
+        self._scheduler = request_scheduler
+        self._max_retries = max_retries
+        self._singleflight = coalescer
+        self._metrics = recorder
+        self._etags = response_cache
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        The pooled HTTP client, created on first use and after ``aclose``.
+        """
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self._base_url,
+                http2=self._http2,
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @staticmethod
+    def _priority(method: str, path: str) -> Priority:
+        """
+        Playback commands, and the device lookups they depend on, jump ahead
+        of other requests unless the caller set a priority explicitly.
+        """
+        level = current_priority()
+        if level is not None:
+            return level
+        if path.startswith("me/player") and (
+            method != "GET" or path == "me/player/devices"
+        ):
+            return Priority.INTERACTIVE
+        return Priority.DEFAULT
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        json: Any = None,
+    ) -> Any:
+        if method != "GET":
+            return await self._call(method, path, params, json)
+        query = urlencode(
+            sorted((k, v) for k, v in (params or {}).items() if v is not None)
+        )
+        key = f"GET {path}?{query}" if query else f"GET {path}"
+        # Users' reads are never shared, since each sees their own data.
+        user = current_user.get()
+        return await self._singleflight.do(
+            key if user is None else f"{user}: {key}",
+            lambda: self._call(method, path, params, json),
+        )
+
+    async def _call(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        json: Any = None,
+    ) -> Any:
+        level = self._priority(method, path)
+        for attempt in range(self._max_retries + 1):
+            await self._scheduler.acquire(level)
+            try:
+                return await self._send(method, path, params, json)
+            except SpotifyError as e:
+                if e.http_status != 429 or attempt == self._max_retries:
+                    raise
+                retry_after = float(e.headers.get("Retry-After") or 1)
+                delay = retry_after + random.uniform(0, 2**attempt)
+                logger.warning(
+                    f"Rate limited on {method} {path}, retrying in {delay:.1f}s"
+                )
+                self._scheduler.pause(delay)
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, Any] | None = None,
+        json: Any = None,
+    ) -> Any:
+        token = await self._token_provider()
+        if params:
+            params = {k: v for k, v in params.items() if v is not None}
+        # An empty mapping would replace the query string of a "next" URL.
+        params = params or None
+        headers = {"Authorization": f"Bearer {token}"}
+        # The current user's cache, when reads are cached.
+        etags = self._etags if method == "GET" else None
+        if etags is not None and not etags.enabled:
+            etags = None
+        cache_key = cached = None
+        if etags is not None:
+            query = urlencode(sorted((params or {}).items()))
+            cache_key = f"{path}?{query}"
+            cached = etags.get(cache_key)
+            if cached is not None:
+                headers["If-None-Match"] = cached.etag
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(
+                method, path, params=params, json=json, headers=headers
+            )
+        except httpx.HTTPError as e:
+            self._metrics.record_upstream(
+                method, path, type(e).__name__, time.perf_counter() - start
+            )
+            raise
+        self._metrics.record_upstream(
+            method, path, response.status_code, time.perf_counter() - start
+        )
+        if response.status_code >= 400:
+            try:
+                message = response.json()["error"]["message"]
+            except Exception:
+                message = response.text or response.reason_phrase
+            raise SpotifyError(response.status_code, message, response.headers)
+        if etags is not None and response.status_code == 304 and cached is not None:
+            etags.revalidated()
+            return cached.parsed()
+        etag = response.headers.get("ETag")
+        if etags is not None and cache_key is not None and etag and response.content:
+            etags.put(cache_key, etag, response.content)
+        if not response.content:
+            return None
+        return response.json()
+
+    async def _get(self, path: str, **params: Any) -> Any:
+        return await self._request("GET", path, params=params)
+
+    async def _put(self, path: str, json: Any = None, **params: Any) -> Any:
+        return await self._request("PUT", path, params=params, json=json)
+
+    async def _post(self, path: str, json: Any = None, **params: Any) -> Any:
+        return await self._request("POST", path, params=params, json=json)
+
+    async def next(self, result: dict) -> dict | None:
+        """
+        Fetch the page after ``result`` of a paged response, if there is one.
+        """
+        if not result.get("next"):
+            return None
+        return await self._get(result["next"])
+
+    async def search(
+        self,
+        q: str,
+        type: str = "track",
+        limit: int = 10,
+        offset: int = 0,
+        market: str | None = None,
+    ) -> dict:
+        return await self._get(
+            "search", q=q, type=type, limit=limit, offset=offset, market=market
+        )
+
+    async def tracks(self, ids: list[str], market: str | None = None) -> dict:
+        return await self._get("tracks", ids=",".join(ids), market=market)
+
+    async def artists(self, ids: list[str]) -> dict:
+        return await self._get("artists", ids=",".join(ids))
+
+    async def current_user(self) -> dict:
+        return await self._get("me")
+
+    async def current_user_playlists(self, limit: int = 50, offset: int = 0) -> dict:
+        return await self._get("me/playlists", limit=limit, offset=offset)
+
+    async def playlist(self, playlist_id: str, fields: str | None = None) -> dict:
+        return await self._get(f"playlists/{playlist_id}", fields=fields)
+
+    async def user_playlist_create(
+        self,
+        user: str,
+        name: str,
+        public: bool = False,
+        description: str = "",
+    ) -> dict:
+        return await self._post(
+            f"users/{user}/playlists",
+            json={"name": name, "public": public, "description": description},
+        )
+
+    async def playlist_add_items(
+        self, playlist_id: str, items: list[str], position: int | None = None
+    ) -> dict:
+        body: dict[str, Any] = {"uris": items}
+        if position is not None:
+            body["position"] = position
+        return await self._post(f"playlists/{playlist_id}/tracks", json=body)
+
+    async def playlist_replace_items(self, playlist_id: str, items: list[str]) -> dict:
+        return await self._put(f"playlists/{playlist_id}/tracks", json={"uris": items})
+
+    async def playlist_items(
+        self,
+        playlist_id: str,
+        limit: int = 100,
+        offset: int = 0,
+        fields: str | None = None,
+        market: str | None = None,
+    ) -> dict:
+        return await self._get(
+            f"playlists/{playlist_id}/tracks",
+            limit=limit,
+            offset=offset,
+            fields=fields,
+            market=market,
+        )
+
+    async def current_user_saved_tracks(
+        self, limit: int = 20, offset: int = 0, market: str | None = None
+    ) -> dict:
+        return await self._get("me/tracks", limit=limit, offset=offset, market=market)
+
+    async def current_user_recently_played(
+        self, limit: int = 50, after: int | None = None, before: int | None = None
+    ) -> dict:
+        return await self._get(
+            "me/player/recently-played", limit=limit, after=after, before=before
+        )
+
+    async def current_user_top_tracks(
+        self, limit: int = 20, offset: int = 0, time_range: str = "medium_term"
+    ) -> dict:
+        return await self._get(
+            "me/top/tracks", limit=limit, offset=offset, time_range=time_range
+        )
+
+    async def current_playback(self, market: str | None = None) -> dict | None:
+        return await self._get("me/player", market=market)
+
+    async def currently_playing(self) -> dict | None:
+        return await self._get("me/player/currently-playing")
+
+    async def queue(self) -> dict:
+        return await self._get("me/player/queue")
+
+    async def devices(self) -> dict:
+        return await self._get("me/player/devices")
+
+    async def start_playback(
+        self,
+        device_id: str | None = None,
+        context_uri: str | None = None,
+        uris: list[str] | None = None,
+        offset: dict | None = None,
+    ) -> None:
+        body: dict[str, Any] = {}
+        if context_uri is not None:
+            body["context_uri"] = context_uri
+        if uris is not None:
+            body["uris"] = uris
+        if offset is not None:
+            body["offset"] = offset
+        await self._put("me/player/play", json=body or None, device_id=device_id)
+
+    async def pause_playback(self, device_id: str | None = None) -> None:
+        await self._put("me/player/pause", device_id=device_id)
+
+    async def next_track(self, device_id: str | None = None) -> None:
+        await self._post("me/player/next", device_id=device_id)
+
+    async def previous_track(self, device_id: str | None = None) -> None:
+        await self._post("me/player/previous", device_id=device_id)
+
+    async def shuffle(self, state: bool, device_id: str | None = None) -> None:
+        await self._put(
+            "me/player/shuffle", state=str(state).lower(), device_id=device_id
+        )
+
+    async def add_to_queue(self, uri: str, device_id: str | None = None) -> None:
+        await self._post("me/player/queue", uri=uri, device_id=device_id)
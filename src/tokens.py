@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import httpx
+
+from config import HTTP_TIMEOUT, TOKEN_REFRESH_MARGIN
+from utils import logger
+
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+# Seconds before a retry after a failed background refresh.
+_RETRY_DELAY = 30.0
+
+
+class TokenManager:
+    """
+    Keeps the user's OAuth token in memory and refreshes it ahead of expiry.
+
+    The token cache file is read once. A background task refreshes the token
+    ``refresh_margin`` seconds before it expires, so requests only wait for
+    a refresh if the background one failed. Concurrent refreshes share one
+    request, and the cache file is rewritten atomically, and only when the
+    token actually changed. Without a cached refresh token, the blocking
+    ``authorize`` callable runs the first-time interactive authorization, if
+    there is one.
+    """
+
+    def __init__(
+        self,
+        cache_path: Path,
+        credentials: Callable[[], tuple[str, str]],
+        authorize: Callable[[], dict] | None,
+        token_url: str = TOKEN_URL,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN,
+        timeout: float = HTTP_TIMEOUT,
+    ):
+        """
+        Args:
+            cache_path (Path): The spotipy-compatible token cache file.
+            credentials (Callable[[], tuple[str, str]]): Returns the app's
+                client id and client secret.
+            authorize (Callable[[], dict] | None): Runs the interactive
+                authorization and returns the new token info. None makes a
+                missing token an error instead, for users who cannot
+                authorize from here.
+            token_url (str, optional): The OAuth token endpoint.
+            refresh_margin (float, optional): Seconds before expiry at which
+                the token is refreshed in the background.
+            timeout (float, optional): The refresh request timeout in seconds.
+        """
+        self.cache_path = cache_path
+        self._credentials = credentials
+        self._authorize = authorize
+        self.token_url = token_url
+        self.refresh_margin = refresh_margin
+        self._timeout = timeout
+        self._token: dict | None = None
+        self._load_lock = asyncio.Lock()
+        self._refreshing: asyncio.Future | None = None
+        self._refresher: asyncio.Task | None = None
+        self.refreshes = 0
+
+    @property
+    def token(self) -> dict:
+        """
+        The loaded token info.
+
+        Raises:
+            Exception: If the token has not been loaded yet.
+        """
+        if self._token is None:
+            raise Exception("Spotify token has not been loaded.")
+        return self._token
+
+    def _expires_in(self) -> float:
+        return self.token["expires_at"] - time.time()
+
+    async def access_token(self) -> str:
+        """
+        Get a valid access token, usually straight from memory.
+        """
+        if self._token is None:
+            await self._load()
+        if self._expires_in() < 10:
+            await self.refresh()
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_ahead())
+        return self.token["access_token"]
+
+    async def _load(self) -> None:
+        async with self._load_lock:
+            if self._token is not None:
+                return
+            token = await asyncio.to_thread(self._read)
+            if not token or not token.get("refresh_token"):
+                if self._authorize is None:
+                    raise Exception(
+                        "Spotify user not authorized, run "
+                        "`python src/auth.py <user>` on the server."
+                    )
+                logger.info("No cached Spotify token, starting authorization")
+                token = await asyncio.to_thread(self._authorize)
+                await asyncio.to_thread(self._write, token)
+            self._token = token
+
+    def _read(self) -> dict | None:
+        try:
+            return json.loads(self.cache_path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable token cache {self.cache_path}: {e}")
+            return None
+
+    def _write(self, token: dict) -> None:
+        # Write a sibling file and rename it over the cache, so a crash or a
+        # concurrent reader never sees a partial token.
+        fd, tmp = tempfile.mkstemp(
+            dir=self.cache_path.parent, prefix=f"{self.cache_path.name}."
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(token, f)
+            os.replace(tmp, self.cache_path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    async def refresh(self) -> None:
+        """
+        Refresh the token, joining a refresh already in flight.
+        """
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self) -> None:
+        current = self.token
+        client_id, client_secret = self._credentials()
+        try:
+            async with httpx.AsyncClient(timeout=self._timeout) as http:
+                response = await http.post(
+                    self.token_url,
+                    data={
+                        "grant_type": "refresh_token",
+                        "refresh_token": current["refresh_token"],
+                    },
+                    auth=(client_id, client_secret),
+                )
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"Error refreshing Spotify token: {str(e)}")
+            raise
+        token = response.json()
+        token["expires_at"] = int(time.time()) + token["expires_in"]
+        # Spotify may omit these when they are unchanged.
+        token.setdefault("refresh_token", current["refresh_token"])
+        token.setdefault("scope", current.get("scope"))
+        self.refreshes += 1
+        if token != current:
+            await asyncio.to_thread(self._write, token)
+        self._token = token
+
+    async def _refresh_ahead(self) -> None:
+        while True:
+            await asyncio.sleep(max(0.0, self._expires_in() - self.refresh_margin))
+            try:
+                await self.refresh()
+            except Exception:
+                await asyncio.sleep(_RETRY_DELAY)
+
+    async def aclose(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
@@ -1,26 +1,41 @@
+import asyncio
+from collections import deque
+
+from pydantic import BaseModel
+
 from auth import client
+from catalog import catalog
+from commands import PlaybackCommand, command_pipeline
+from config import PLAYBACK_URI_CHUNK
+from devices import device_registry
+from history import listening_history
+from library import saved_tracks
+from playback import playback_state
+from playlist_writer import playlist_writer
 from resources import (
+    _find_user_playlists,
     _get_recent_tracks,
     _get_uri_from_artist_song,
+    _get_uris_from_artist_songs,
     _get_user_playlist_id,
     _get_user_playlists,
 )
+from search import search_engine
 from server import mcp
-from utils import logger, strip_playlist_uri, strip_track_uri
-
-
-def get_device_id():
-    devices = client.sp.devices()
-    if not devices:
-        raise Exception("No active devices found. Please open Spotify on a device.")
+from sessions import current, per_user
+from similarity import similarity_engine
+from top_tracks import top_tracks
+from utils import logger, strip_playlist_uri, strip_track_uri, true_shuffle
 
-    return devices["devices"][0]["id"]
+# Liked songs that did not fit in the last play_user_liked_songs request,
+# handed out by queue_more_liked_songs.
+_liked_songs_backlog: deque[str] = per_user(lambda user: deque())
 
 
 @mcp.tool(
     name="play_song_by_uri", description="play a song on spotify given its unique uri"
 )
-def _play_song_by_uri(uri: str) -> bool:
+async def _play_song_by_uri(uri: str) -> bool:
     """
     Play a song by its URI.
 
@@ -33,7 +48,11 @@ def _play_song_by_uri(uri: str) -> bool:
     try:
         sp = client.sp
         uri = strip_track_uri(uri)
-        sp.start_playback(uris=[f"spotify:track:{uri}"])
+        await device_registry.run(
+            lambda device_id: sp.start_playback(
+                device_id=device_id, uris=[f"spotify:track:{uri}"]
+            )
+        )
         return True
     except Exception as e:
         logger.error(f"Failed to play song: {str(e)}")
@@ -44,7 +63,7 @@ def _play_song_by_uri(uri: str) -> bool:
     name="play_public_playlist_by_name",
     description="play a public playlist given it's name",
 )
-def play_public_playlist_by_name(playlist_name: str) -> bool:
+async def play_public_playlist_by_name(playlist_name: str) -> bool:
     """
     Play a public playlist on Spotify using its name.
 
@@ -54,9 +73,9 @@ def play_public_playlist_by_name(playlist_name: str) -> bool:
     Returns:
         bool: True if the playlist was successfully played, False otherwise.
     """
-    playlist_id = _get_playlist_id(playlist_name)
+    playlist_id = await _get_playlist_id(playlist_name)
     if playlist_id:
-        return _play_playlist_by_id(playlist_id)
+        return await _play_playlist_by_id(playlist_id)
     else:
         return False
 
@@ -65,7 +84,7 @@ def play_public_playlist_by_name(playlist_name: str) -> bool:
     name="play_song_by_artist_song",
     description="play a song on spotify given its artist and song",
 )
-def _play_song_by_artist(artist: str, song: str) -> bool:
+async def _play_song_by_artist(artist: str, song: str) -> bool:
     """
     Play a song by its artist and song name.
 
@@ -76,18 +95,94 @@ def _play_song_by_artist(artist: str, song: str) -> bool:
     Returns:
         bool: True if the song was successfully played, False otherwise.
     """
-    song_uri = _get_uri_from_artist_song(artist, song)
+    song_uri = await _get_uri_from_artist_song(artist, song)
     if song_uri:
-        return _play_song_by_uri(song_uri)
+        return await _play_song_by_uri(song_uri)
     else:
         return False
 
 
+class SongRequest(BaseModel):
+    artist: str
+    song: str
+
+
+async def _resolve_songs(songs: list[SongRequest]) -> tuple[list[str], list[str]]:
+    """
+    Resolve requested songs to URIs, keeping the requested order.
+
+    Returns:
+        tuple[list[str], list[str]]: The URIs that were found, and an
+            "artist - song" label for each request that was not.
+    """
+    uris = await _get_uris_from_artist_songs([(s.artist, s.song) for s in songs])
+    found = [uri for uri in uris if uri]
+    missing = [f"{s.artist} - {s.song}" for s, uri in zip(songs, uris) if not uri]
+    if missing:
+        logger.info(f"Could not resolve {len(missing)} of {len(songs)} songs")
+    return found, missing
+
+
+@mcp.tool(
+    name="play_songs_by_artist_and_song",
+    description="play a list of songs on spotify given their artists and names",
+)
+async def play_songs_by_artist_and_song(songs: list[SongRequest]) -> dict:
+    """
+    Resolve a list of songs concurrently and play all that were found.
+
+    Args:
+        songs (list[SongRequest]): The songs to play, in order.
+
+    Returns:
+        dict: The number of songs played and the songs that were not found.
+    """
+    try:
+        uris, missing = await _resolve_songs(songs)
+        if uris:
+            await device_registry.run(
+                lambda device_id: client.sp.start_playback(
+                    device_id=device_id, uris=uris
+                )
+            )
+        return {"played": len(uris), "missing": missing}
+    except Exception as e:
+        logger.error(f"Failed to play songs: {str(e)}")
+        raise
+
+
+@mcp.tool(
+    name="add_tracks_to_queue_by_artist_and_song",
+    description="Add a list of tracks to the active device's queue, in order",
+)
+async def add_tracks_to_queue_by_artist_and_song(songs: list[SongRequest]) -> dict:
+    """
+    Resolve a list of songs concurrently and add those found to the queue.
+
+    Args:
+        songs (list[SongRequest]): The songs to queue, in order.
+
+    Returns:
+        dict: The number of songs queued and the songs that were not found.
+    """
+    try:
+        uris, missing = await _resolve_songs(songs)
+        # Queue requests must be sent one at a time to keep their order.
+        for uri in uris:
+            await device_registry.run(
+                lambda device_id: client.sp.add_to_queue(uri, device_id=device_id)
+            )
+        return {"queued": len(uris), "missing": missing}
+    except Exception as e:
+        logger.error(f"Failed to add tracks to queue: {str(e)}")
+        raise
+
+
 @mcp.tool(
     name="get_currently_playing",
     description="get the currently playing artist and song",
 )
-def _get_currently_playing() -> str:
+async def _get_currently_playing() -> str:
     """
     Get the currently playing track and artist.
 
@@ -96,12 +191,11 @@ def _get_currently_playing() -> str:
             indicating that no track is currently playing.
     """
     try:
-        sp = client.sp
-        current_track = sp.currently_playing()
+        current = await playback_state.snapshot()
 
-        if current_track and current_track["is_playing"]:
-            track_name = current_track["item"]["name"]
-            artist_name = current_track["item"]["artists"][0]["name"]
+        if current and current["is_playing"] and current["track"]:
+            track_name = current["track"]["name"]
+            artist_name = current["track"]["artist"]
             return f"Now playing: {track_name} by {artist_name}"
         else:
             return "No track is currently playing."
@@ -114,18 +208,56 @@ def _get_currently_playing() -> str:
     name="get_user_playlists",
     description="list the users playlists",
 )
-def _list_user_playlists() -> str:
+async def _list_user_playlists() -> str:
     """
     List the names of the user's playlists.
 
     Returns:
         str: A comma-separated string of the user's playlist names.
     """
-    user_playlists = _get_user_playlists()
+    user_playlists = await _get_user_playlists()
     return f"User playlists: {', '.join(user_playlists)}"
 
 
-def _play_playlist_by_id(playlist_uri: str) -> bool:
+@mcp.tool(
+    name="find_user_playlists",
+    description="find the user's playlists with names closest to a given name",
+)
+async def find_user_playlists(playlist_name: str, limit: int = 5) -> list[dict]:
+    """
+    Find the user's playlists that best match a name.
+
+    Args:
+        playlist_name (str): The name to search for.
+        limit (int, optional): The maximum number of matches. Defaults to 5.
+
+    Returns:
+        list[dict]: Matching playlists with their id, name and similarity
+            score, best match first.
+    """
+    return await _find_user_playlists(playlist_name, limit=limit)
+
+
+@mcp.tool(
+    name="refresh_playlist_cache",
+    description="Re-fetch the user's playlists from Spotify, discarding cached data",
+)
+async def _refresh_playlist_cache() -> str:
+    """
+    Force a refresh of the cached playlist catalog.
+
+    Returns:
+        str: A message with the number of playlists now cached.
+    """
+    try:
+        count = await catalog.refresh()
+        return f"Playlist cache refreshed: {count} playlists"
+    except Exception as e:
+        logger.error(f"Failed to refresh playlist cache: {str(e)}")
+        raise
+
+
+async def _play_playlist_by_id(playlist_uri: str) -> bool:
     """
     Play a playlist on Spotify using its URI.
 
@@ -138,17 +270,13 @@ def _play_playlist_by_id(playlist_uri: str) -> bool:
 
     playlist_uri = strip_playlist_uri(playlist_uri)
     sp = client.sp
-    devices = sp.devices()
-    device_id = None
-    if devices is None or "devices" not in devices:
-        logger.error("Failed to get active devices")
-        return False
-
-    device_id = get_device_id()
-
     playlist_uri = f"spotify:playlist:{playlist_uri}"
 
-    sp.start_playback(device_id=device_id, context_uri=playlist_uri)
+    await device_registry.run(
+        lambda device_id: sp.start_playback(
+            device_id=device_id, context_uri=playlist_uri
+        )
+    )
     logger.info(f"Playing playlist: {playlist_uri}")
     return True
 
@@ -157,7 +285,7 @@ def _play_playlist_by_id(playlist_uri: str) -> bool:
     name="play_user_playlist_by_name",
     description="play a user's playlist given its name",
 )
-def _play_user_playlist_by_name(playlist_name: str) -> bool:
+async def _play_user_playlist_by_name(playlist_name: str) -> bool:
     """
     Play a user's playlist by its name.
 
@@ -168,39 +296,114 @@ def _play_user_playlist_by_name(playlist_name: str) -> bool:
         bool: True if the playlist was successfully played, False otherwise.
     """
 
-    playlist_id = _get_user_playlist_id(playlist_name)
+    playlist_id = await _get_user_playlist_id(playlist_name)
     if playlist_id:
-        return _play_playlist_by_id(playlist_id)
+        return await _play_playlist_by_id(playlist_id)
     else:
         return False
 
 
-def _get_playlist_id(query: str, limit: int = 50) -> str | None:
-    # limit is high becauses sometimes intial results are None
+async def _get_playlist_id(query: str) -> str | None:
     """
-    Search for a playlist with the given query and return its uri.
+    Search for a public playlist with the given query and return its uri.
 
     Args:
         query (str): The query to search for.
-        limit (int, optional): The number of results to limit to. Defaults to 50.
 
     Returns:
-        str | None: The uri of the first playlist found, or None if no results were returned.
+        str | None: The uri of the best matching playlist, or None if no
+            results were returned.
     """
-    sp = client.sp
-    results = sp.search(q=query, type="playlist", limit=limit)
-    if results is None:
+    hits = await search_engine.playlists(query, k=1)
+    if not hits:
+        logger.error(f"No playlist found for '{query}'")
         return None
-    results = [x for x in results["playlists"]["items"] if x]
-    logger.info(f"Found playlist: {results[0]['name']}")
-    return results[0]["uri"]
+    logger.info(f"Found playlist: {hits[0].name}")
+    return hits[0].uri
+
+
+@mcp.tool(
+    name="search_tracks",
+    description="Search Spotify for the tracks best matching an artist and song, "
+    "returning several ranked candidates with their uri and score",
+)
+async def search_tracks(artist: str, song: str, limit: int = 5) -> list[dict]:
+    """
+    Find the tracks best matching an artist and song name.
+
+    Args:
+        artist (str): The artist's name, or an empty string if unknown.
+        song (str): The song's name.
+        limit (int, optional): The maximum number of tracks. Defaults to 5.
+
+    Returns:
+        list[dict]: Candidates with their uri, name, artist, album, popularity
+            and score, best match first.
+    """
+    try:
+        hits = await search_engine.tracks(artist, song, k=limit)
+        return [hit._asdict() for hit in hits]
+    except Exception as e:
+        logger.error(f"Failed to search tracks: {str(e)}")
+        raise
+
+
+@mcp.tool(
+    name="search_public_playlists",
+    description="Search Spotify for the public playlists best matching a name, "
+    "returning several ranked candidates with their uri and score",
+)
+async def search_public_playlists(playlist_name: str, limit: int = 5) -> list[dict]:
+    """
+    Find the public playlists best matching a name.
+
+    Args:
+        playlist_name (str): The name to search for.
+        limit (int, optional): The maximum number of playlists. Defaults to 5.
+
+    Returns:
+        list[dict]: Candidates with their uri, name, owner, track count and
+            score, best match first.
+    """
+    try:
+        hits = await search_engine.playlists(playlist_name, k=limit)
+        return [hit._asdict() for hit in hits]
+    except Exception as e:
+        logger.error(f"Failed to search playlists: {str(e)}")
+        raise
+
+
+@mcp.tool(
+    name="set_playback_device",
+    description="Send playback commands to the device with the given name, "
+    "or to the active device if no name is given",
+)
+async def set_playback_device(device_name: str | None = None) -> str:
+    """
+    Pin playback to a device, or clear the pin.
+
+    Args:
+        device_name (str | None, optional): The name of the device to pin.
+            Defaults to None, which clears the pin.
+
+    Returns:
+        str: A message describing the device playback is now sent to.
+    """
+    try:
+        device = await device_registry.pin(device_name)
+        if device is None:
+            return "Playback will use the active device."
+        return f"Playback pinned to {device.name}."
+    except Exception as e:
+        logger.error(f"Failed to set playback device: {str(e)}")
+        raise
 
 
 @mcp.tool(
     name="pause_playback",
     description="pause playback on active device",
 )
-def _pause_playback() -> bool:
+async def _pause_playback() -> bool:
     """
     Pause the user's active Spotify playback.
 
@@ -208,8 +411,7 @@ def _pause_playback() -> bool:
         bool: True if the playback was successfully paused, False otherwise.
     """
     try:
-        sp = client.sp
-        sp.pause_playback()
+        await command_pipeline.submit("pause")
         logger.info("Playback paused")
         return True
     except Exception as e:
@@ -221,7 +423,7 @@ def _pause_playback() -> bool:
     name="start_playback",
     description="start playback on active device",
 )
-def _start_playback() -> bool:
+async def _start_playback() -> bool:
     """
     Start the user's active Spotify playback.
 
@@ -229,8 +431,7 @@ def _start_playback() -> bool:
         bool: True if the playback was successfully started, False otherwise.
     """
     try:
-        sp = client.sp
-        sp.start_playback()
+        await command_pipeline.submit("play")
         logger.info("Playback started")
         return True
     except Exception as e:
@@ -242,7 +443,7 @@ def _start_playback() -> bool:
     name="next_track",
     description="skip to next track on active device",
 )
-def _next_track() -> bool:
+async def _next_track() -> bool:
     """
     Skip to the next track on the user's active Spotify playback.
 
@@ -250,8 +451,7 @@ def _next_track() -> bool:
         bool: True if the track was successfully skipped, False otherwise.
     """
     try:
-        sp = client.sp
-        sp.next_track()
+        await command_pipeline.submit("next")
         logger.info("Skipped to next track")
         return True
     except Exception as e:
@@ -263,7 +463,7 @@ def _next_track() -> bool:
     name="previous_track",
     description="skip to previous track on active device",
 )
-def _previous_track() -> bool:
+async def _previous_track() -> bool:
     """
     Skip to the previous track on the user's active Spotify playback.
 
@@ -271,8 +471,7 @@ def _previous_track() -> bool:
         bool: True if the track was successfully skipped, False otherwise.
     """
     try:
-        sp = client.sp
-        sp.previous_track()
+        await command_pipeline.submit("previous")
         logger.info("Skipped to previous track")
         return True
     except Exception as e:
@@ -284,7 +483,7 @@ def _previous_track() -> bool:
     name="turn_shuffle_on",
     description="Toggle shuffle on active device",
 )
-def _turn_shuffle_on() -> bool:
+async def _turn_shuffle_on() -> bool:
     """
     Enable shuffle on the user's active Spotify playback.
 
@@ -292,8 +491,7 @@ def _turn_shuffle_on() -> bool:
         bool: True if shuffle was successfully enabled, False otherwise.
     """
     try:
-        sp = client.sp
-        sp.shuffle(True)
+        await command_pipeline.submit("shuffle_on")
         logger.info("Shuffle on")
         return True
     except Exception as e:
@@ -305,7 +503,7 @@ def _turn_shuffle_on() -> bool:
     name="turn_shuffle_off",
     description="Toggle shuffle off active device",
 )
-def _turn_shuffle_off() -> bool:
+async def _turn_shuffle_off() -> bool:
     """
     Disable shuffle on the user's active Spotify playback.
 
@@ -314,8 +512,7 @@ def _turn_shuffle_off() -> bool:
     """
 
     try:
-        sp = client.sp
-        sp.shuffle(False)
+        await command_pipeline.submit("shuffle_off")
         logger.info("Shuffle off")
         return True
     except Exception as e:
@@ -323,25 +520,101 @@ def _turn_shuffle_off() -> bool:
         raise
 
 
+@mcp.tool(
+    name="send_playback_commands",
+    description="Send several playback commands (next, previous, pause, play, "
+    "shuffle_on, shuffle_off) in order in one call; repeated or opposing "
+    "commands are coalesced into as few requests as possible",
+)
+async def send_playback_commands(commands: list[PlaybackCommand]) -> list[dict]:
+    """
+    Send a burst of playback commands, coalesced and in order.
+
+    Args:
+        commands (list[PlaybackCommand]): The commands, in the order to apply
+            them.
+
+    Returns:
+        list[dict]: Each command's result: whether it was sent, coalesced
+            into another command, cancelled out or failed, and the request it
+            was sent as.
+    """
+    try:
+        return await command_pipeline.submit_all(commands)
+    except Exception as e:
+        logger.error(f"Failed to send playback commands: {str(e)}")
+        raise
+
+
 @mcp.tool(
     name="play_user_liked_songs",
     description="Play the user's liked songs",
 )
-def _play_user_liked_songs() -> bool:
+async def _play_user_liked_songs(shuffle: bool = False) -> bool:
     """
-    Play the user's liked songs.
+    Play the user's liked songs from the local library mirror.
+
+    The first chunk of songs starts playback; the rest are kept back and can
+    be added to the queue with ``queue_more_liked_songs``.
+
+    Args:
+        shuffle (bool, optional): Shuffle the whole library locally before
+            playing. Defaults to False.
 
     Returns:
         bool: True if the tracks were successfully played, False otherwise.
     """
-    current_user_saved_tracks = client.sp.current_user_saved_tracks()
-    if current_user_saved_tracks:
-        tracks = current_user_saved_tracks["items"]
-        uris = [track["track"]["uri"] for track in tracks]
-        client.sp.start_playback(uris=uris)
+    try:
+        await saved_tracks.sync()
+        uris = saved_tracks.uris()
+        if not uris:
+            logger.error("Failed to get user saved tracks")
+            return False
+        if shuffle:
+            uris = true_shuffle(uris)
+
+        first = uris[:PLAYBACK_URI_CHUNK]
+        await device_registry.run(
+            lambda device_id: client.sp.start_playback(device_id=device_id, uris=first)
+        )
+        backlog = current(_liked_songs_backlog)
+        backlog.clear()
+        backlog.extend(uris[PLAYBACK_URI_CHUNK:])
+        logger.info(f"Playing {len(first)} liked songs, {len(backlog)} held back")
         return True
-    else:
-        logger.error("Failed to get user saved tracks")
+    except Exception as e:
+        logger.error(f"Failed to play liked songs: {str(e)}")
+        raise
+
+
+@mcp.tool(
+    name="queue_more_liked_songs",
+    description="Add the next liked songs after the ones already playing to the queue",
+)
+async def queue_more_liked_songs(count: int = 20) -> str:
+    """
+    Top up the queue with liked songs held back by the last
+    ``play_user_liked_songs`` call.
+
+    Args:
+        count (int, optional): The number of songs to queue. Defaults to 20.
+
+    Returns:
+        str: A message with the number of songs queued and still held back.
+    """
+    try:
+        backlog = current(_liked_songs_backlog)
+        queued = 0
+        while backlog and queued < count:
+            uri = backlog[0]
+            await device_registry.run(
+                lambda device_id: client.sp.add_to_queue(uri, device_id=device_id)
+            )
+            backlog.popleft()
+            queued += 1
+        return f"Queued {queued} liked songs, {len(backlog)} remaining."
+    except Exception as e:
+        logger.error(f"Failed to queue liked songs: {str(e)}")
         raise
 
 
@@ -349,14 +622,14 @@ def _play_user_liked_songs() -> bool:
     name="get_recent_tracks",
     description="Return the user's recently played tracks",
 )
-def get_recent_tracks() -> bool:
+async def get_recent_tracks() -> bool:
     """
     Return the user's recently played tracks.
 
     Returns:
         dict[str, str]: A dictionary of recently played tracks with artist as the key and song as the value.
     """
-    tracks = _get_recent_tracks()
+    tracks = await _get_recent_tracks()
     if not tracks:
         logger.error("Failed to get recent tracks")
         raise
@@ -367,7 +640,7 @@ def get_recent_tracks() -> bool:
     name="add_track_to_queue_by_artist_and_song",
     description="Add a track to the active device's queue",
 )
-def add_to_queue_by_artist_and_song(artist: str, song: str) -> bool:
+async def add_to_queue_by_artist_and_song(artist: str, song: str) -> bool:
     """
     Add a track to the active device's queue given its artist and song name.
 
@@ -380,85 +653,377 @@ def add_to_queue_by_artist_and_song(artist: str, song: str) -> bool:
     """
 
     try:
-        uri = _get_uri_from_artist_song(artist=artist, song=song)
-        client.sp.add_to_queue(uri)
+        uri = await _get_uri_from_artist_song(artist=artist, song=song)
+        await device_registry.run(
+            lambda device_id: client.sp.add_to_queue(uri, device_id=device_id)
+        )
         return True
     except Exception as e:
         logger.error(f"Failed to add track to queue: {str(e)}")
         raise
 
 
+async def _play_top_tracks(time_range: str, period: str, count: int = 20) -> None:
+    """
+    Play the user's top tracks for a time range from the shared top tracks
+    cache.
+
+    Args:
+        time_range (str): The Spotify time range.
+        period (str): The time range as described to the user.
+        count (int, optional): How many top tracks to play. Defaults to 20.
+    """
+    track_uris = [t.uri for t in await top_tracks.tracks(time_range)][:count]
+    if not track_uris:
+        raise Exception(f"No top tracks found for {period}.")
+
+    await device_registry.run(
+        lambda device_id: client.sp.start_playback(device_id=device_id, uris=track_uris)
+    )
+
+    logger.info(f"Now playing your top {len(track_uris)} tracks from {period}.")
+
+
 @mcp.tool(
     name="play_top_tracks_short_term",
     description="Play the user's top 20 tracks from the last month.",
 )
-def play_top_tracks_short_term():
+async def play_top_tracks_short_term():
     """
     Play the user's top 20 tracks from the last month.
+    """
+    await _play_top_tracks("short_term", "the last month")
+
+
+@mcp.tool(
+    name="play_top_tracks_medium_term",
+    description="Play the user's top 20 tracks from the last 6 months.",
+)
+async def play_top_tracks_medium_term():
+    """
+    Play the user's top 20 tracks from the last 6 months.
+    """
+    await _play_top_tracks("medium_term", "the last 6 months")
+
+
+@mcp.tool(
+    name="play_top_tracks_long_term",
+    description="Play the user's top 20 tracks from the last year.",
+)
+async def play_top_tracks_long_term():
+    """
+    Play the user's top 20 tracks from the last year.
+    """
+    await _play_top_tracks("long_term", "the last year")
+
+
+def _track_uris(track_uris: list[str]) -> list[str]:
+    """
+    Accept track IDs or URIs and return URIs.
+    """
+    return [f"spotify:track:{strip_track_uri(uri)}" for uri in track_uris]
+
+
+async def _exact_playlist_id(playlist_name: str) -> str | None:
+    """
+    Get the ID of the one user playlist named exactly ``playlist_name``, once
+    normalized. Writes never go to a fuzzy match, which could be another
+    playlist with a similar name.
 
     Returns:
-        bool: True if the tracks were successfully played, False otherwise.
+        str | None: The playlist's ID, or None if no playlist or several
+            playlists have this name.
     """
-    top_tracks = client.sp.current_user_top_tracks(limit=20, time_range="short_term")
-    if top_tracks:
-        track_uris = [track["uri"] for track in top_tracks["items"]]
-    else:
-        logger.error("Failed to get top tracks")
+    matches = (await catalog.name_index()).exact(playlist_name)
+    if len(matches) > 1:
+        logger.warning(
+            f"Playlist name '{playlist_name}' names {len(matches)} playlists"
+        )
+    return matches[0].id if len(matches) == 1 else None
+
+
+async def _write_target(playlist_name: str, playlist_id: str | None) -> str | dict:
+    """
+    Resolve the playlist a write goes to.
+
+    Returns:
+        str | dict: The playlist's ID or, when the name does not name exactly
+            one playlist, a result listing the closest playlists, to pass one
+            of them by ``playlist_id``.
+    """
+    if playlist_id:
+        return strip_playlist_uri(playlist_id)
+    target = await _exact_playlist_id(playlist_name)
+    if target is not None:
+        return target
+    return {
+        "status": "not_written",
+        "error": f"No single playlist is named '{playlist_name}'; "
+        "pass a candidate's id as playlist_id.",
+        "candidates": await _find_user_playlists(playlist_name),
+    }
+
+
+@mcp.tool(
+    name="create_playlist",
+    description="Create a new playlist for the user, optionally filled with tracks",
+)
+async def create_playlist(
+    name: str,
+    track_uris: list[str] | None = None,
+    description: str = "",
+    public: bool = False,
+) -> dict:
+    """
+    Create a playlist and add tracks to it.
+
+    Args:
+        name (str): The name of the new playlist.
+        track_uris (list[str] | None, optional): Track URIs or IDs to add, in
+            order. Defaults to None.
+        description (str, optional): The playlist description. Defaults to "".
+        public (bool, optional): Whether the playlist is public. Defaults to
+            False.
+
+    Returns:
+        dict: The new playlist's id and name, and a summary of the track write.
+    """
+    try:
+        playlist = await playlist_writer.create(
+            name, public=public, description=description
+        )
+        result = {"playlist_id": playlist.id, "name": playlist.name}
+        if track_uris:
+            job = await playlist_writer.write(playlist.id, _track_uris(track_uris))
+            result |= job.summary()
+        return result
+    except Exception as e:
+        logger.error(f"Failed to create playlist: {str(e)}")
         raise
 
-    device_id = get_device_id()
-    client.sp.start_playback(device_id=device_id, uris=track_uris)
 
-    logger.info("Now playing your top 20 tracks from the last month.")
+@mcp.tool(
+    name="add_tracks_to_playlist",
+    description="Add tracks to the end of one of the user's playlists, by exact "
+    "playlist name or by playlist_id. Tracks already in the playlist are skipped "
+    "unless skip_duplicates is false",
+)
+async def add_tracks_to_playlist(
+    playlist_name: str,
+    track_uris: list[str],
+    skip_duplicates: bool = True,
+    playlist_id: str | None = None,
+) -> dict:
+    """
+    Append tracks to a user's playlist.
+
+    Args:
+        playlist_name (str): The exact name of the user's playlist.
+        track_uris (list[str]): Track URIs or IDs to add, in order.
+        skip_duplicates (bool, optional): Skip tracks the playlist already
+            contains and repeats in ``track_uris``. Defaults to True.
+        playlist_id (str | None, optional): The playlist's ID or URI, used
+            instead of the name. Defaults to None.
+
+    Returns:
+        dict: A summary of the write. If it failed part way, its ``job_id``
+            can be passed to ``resume_playlist_write``. If the name matches no
+            playlist or several, nothing is written and the closest
+            playlists are returned as ``candidates``.
+    """
+    try:
+        target = await _write_target(playlist_name, playlist_id)
+        if isinstance(target, dict):
+            return target
+        job = await playlist_writer.write(
+            target, _track_uris(track_uris), skip_duplicates=skip_duplicates
+        )
+        return job.summary()
+    except Exception as e:
+        logger.error(f"Failed to add tracks to playlist: {str(e)}")
+        raise
 
 
 @mcp.tool(
-    name="play_top_tracks_medium_term",
-    description="Play the user's top 20 tracks from the last 6 months.",
+    name="replace_playlist_tracks",
+    description="Replace all tracks of one of the user's playlists, by exact "
+    "playlist name or by playlist_id",
 )
-def play_top_tracks_medium_term():
+async def replace_playlist_tracks(
+    playlist_name: str, track_uris: list[str], playlist_id: str | None = None
+) -> dict:
     """
-    Play the user's top 20 tracks from the 6 months.
+    Replace the tracks of a user's playlist.
+
+    Args:
+        playlist_name (str): The exact name of the user's playlist.
+        track_uris (list[str]): Track URIs or IDs the playlist should contain,
+            in order. Repeats are kept.
+        playlist_id (str | None, optional): The playlist's ID or URI, used
+            instead of the name. Defaults to None.
 
     Returns:
-        bool: True if the tracks were successfully played, False otherwise.
+        dict: A summary of the write. If it failed part way, its ``job_id``
+            can be passed to ``resume_playlist_write``. If the name matches no
+            playlist or several, nothing is written and the closest
+            playlists are returned as ``candidates``.
     """
-    top_tracks = client.sp.current_user_top_tracks(limit=20, time_range="medium_term")
-    if top_tracks:
-        track_uris = [track["uri"] for track in top_tracks["items"]]
-    else:
-        logger.error("Failed to get top tracks")
+    try:
+        target = await _write_target(playlist_name, playlist_id)
+        if isinstance(target, dict):
+            return target
+        job = await playlist_writer.write(target, _track_uris(track_uris), replace=True)
+        return job.summary()
+    except Exception as e:
+        logger.error(f"Failed to replace playlist tracks: {str(e)}")
         raise
 
-    device_id = get_device_id()
-    client.sp.start_playback(device_id=device_id, uris=track_uris)
 
-    logger.info("Now playing your top 20 tracks from the last 6 months.")
+@mcp.tool(
+    name="resume_playlist_write",
+    description="Finish a playlist write that failed part way, or list unfinished "
+    "writes if no job id is given",
+)
+async def resume_playlist_write(job_id: str | None = None) -> dict | list[dict]:
+    """
+    Resume an unfinished playlist write from its last confirmed chunk.
+
+    Args:
+        job_id (str | None, optional): The ``job_id`` of the failed write.
+            Defaults to None, which lists the unfinished writes instead.
+
+    Returns:
+        dict | list[dict]: A summary of the resumed write, or summaries of the
+            unfinished writes.
+    """
+    try:
+        if job_id is None:
+            return playlist_writer.pending()
+        return (await playlist_writer.resume(job_id)).summary()
+    except Exception as e:
+        logger.error(f"Failed to resume playlist write: {str(e)}")
+        raise
 
 
 @mcp.tool(
-    name="play_top_tracks_long_term",
-    description="Play the user's top 20 tracks from the last 6 months.",
+    name="play_recent_discoveries",
+    description="Play the songs the user discovered recently and has been "
+    "playing a lot, from their local listening history",
 )
-def play_top_tracks_long_term():
+async def play_recent_discoveries(days: int = 30, count: int = 20) -> dict:
     """
-    Play the user's top 20 tracks from the year.
+    Play the tracks first heard in the last ``days`` days that the user has
+    played at least twice since, most played first.
+
+    Args:
+        days (int, optional): How recently the tracks must have been first
+            heard. Defaults to 30.
+        count (int, optional): The most tracks to play. Defaults to 20.
 
     Returns:
-        bool: True if the tracks were successfully played, False otherwise.
+        dict: The number of tracks played and the top few of them.
     """
-    top_tracks = client.sp.current_user_top_tracks(limit=20, time_range="long_term")
-    if top_tracks:
-        track_uris = [track["uri"] for track in top_tracks["items"]]
-    else:
-        logger.error("Failed to get top tracks")
+    try:
+        await listening_history.collect()
+        tracks = listening_history.discoveries(days=days, limit=count)
+        if not tracks:
+            raise Exception(
+                f"No tracks discovered in the last {days} days have been played "
+                "more than once yet."
+            )
+        uris = [t["uri"] for t in tracks]
+        await device_registry.run(
+            lambda device_id: client.sp.start_playback(device_id=device_id, uris=uris)
+        )
+        logger.info(f"Playing {len(uris)} recent discoveries")
+        return {
+            "played": len(uris),
+            "top": [f"{t['artist']} - {t['name']}" for t in tracks[:5]],
+        }
+    except Exception as e:
+        logger.error(f"Failed to play recent discoveries: {str(e)}")
         raise
 
-    device_id = get_device_id()
-    client.sp.start_playback(device_id=device_id, uris=track_uris)
 
-    logger.info("Now playing your top 20 tracks from the last year.")
+@mcp.tool(
+    name="find_similar_tracks",
+    description="Rank the user's own tracks (top tracks, liked songs and "
+    "listening history) by similarity to seed tracks, artists or genres, with "
+    "optional year and popularity constraints. Optionally play the result or "
+    "save it as a new playlist. Use this to build playlists in one call.",
+)
+async def find_similar_tracks(
+    seed_uris: list[str] | None = None,
+    artists: list[str] | None = None,
+    genres: list[str] | None = None,
+    min_year: int | None = None,
+    max_year: int | None = None,
+    min_popularity: int | None = None,
+    max_popularity: int | None = None,
+    max_per_artist: int = 3,
+    count: int = 30,
+    play: bool = False,
+    playlist_name: str | None = None,
+) -> dict:
+    """
+    Find the user's tracks most similar to the seeds, and optionally play
+    them or write them to a new playlist.
+
+    Args:
+        seed_uris (list[str] | None, optional): Seed track URIs or IDs.
+            Defaults to None.
+        artists (list[str] | None, optional): Seed artist names. Defaults to
+            None.
+        genres (list[str] | None, optional): Seed genres, e.g. "dance" or
+            "indie rock". Defaults to None.
+        min_year (int | None, optional): Earliest release year. Defaults to
+            None.
+        max_year (int | None, optional): Latest release year. Defaults to None.
+        min_popularity (int | None, optional): Lowest popularity, 0 to 100.
+            Defaults to None.
+        max_popularity (int | None, optional): Highest popularity. Defaults to
+            None.
+        max_per_artist (int, optional): The most tracks by one artist.
+            Defaults to 3.
+        count (int, optional): The number of tracks. Defaults to 30.
+        play (bool, optional): Play the tracks. Defaults to False.
+        playlist_name (str | None, optional): Save the tracks as a new
+            playlist with this name. Defaults to None.
+
+    Returns:
+        dict: The ranked tracks, best first, and the playlist write summary
+            if a playlist was created.
+    """
+    try:
+        tracks = await similarity_engine.similar(
+            seed_uris=_track_uris(seed_uris or []),
+            artists=artists,
+            genres=genres,
+            min_year=min_year,
+            max_year=max_year,
+            min_popularity=min_popularity,
+            max_popularity=max_popularity,
+            max_per_artist=max_per_artist,
+            count=count,
+        )
+        result: dict = {"tracks": tracks}
+        uris = [t["uri"] for t in tracks]
+        if uris and play:
+            await device_registry.run(
+                lambda device_id: client.sp.start_playback(
+                    device_id=device_id, uris=uris
+                )
+            )
+            result["played"] = len(uris)
+        if uris and playlist_name:
+            playlist = await playlist_writer.create(playlist_name)
+            job = await playlist_writer.write(playlist.id, uris)
+            result["playlist"] = job.summary() | {"name": playlist.name}
+        return result
+    except Exception as e:
+        logger.error(f"Failed to find similar tracks: {str(e)}")
+        raise
 
 
 if __name__ == "__main__":
-    print(play_top_tracks_short_term())
+    print(asyncio.run(play_top_tracks_short_term()))
@@ -0,0 +1,77 @@
+import asyncio
+
+from auth import client
+from cache import TTLCache
+from config import TOP_TRACKS_CACHE_TTL
+from metrics import metrics
+from models import Track
+from sessions import per_user, totals
+
+TIME_RANGES = ("short_term", "medium_term", "long_term")
+
+# Spotify's maximum page size for top items.
+_TOP_TRACKS_LIMIT = 50
+
+
+class TopTracks:
+    """
+    The user's top tracks for every time range, from one shared cache.
+
+    A miss on any range fetches all three ranges concurrently, so reading one
+    range and then playing another costs a single round of requests, and a
+    read followed by a play of the same range costs none. Concurrent misses
+    share one fetch.
+    """
+
+    def __init__(self, ttl: float = TOP_TRACKS_CACHE_TTL):
+        self._cache = TTLCache(maxsize=len(TIME_RANGES), ttl=ttl)
+        self._fetching: asyncio.Future | None = None
+
+    async def tracks(self, time_range: str) -> list[Track]:
+        """
+        Get the user's top tracks for a time range, most played first.
+
+        Args:
+            time_range (str): One of "short_term", "medium_term" or
+                "long_term".
+
+        Returns:
+            list[Track]: Up to 50 top tracks.
+        """
+        if time_range not in TIME_RANGES:
+            raise ValueError(f"Unknown time range: {time_range}")
+        tracks = self._cache.get(time_range)
+        if tracks is not None:
+            return tracks
+        if self._fetching is None or self._fetching.done():
+            self._fetching = asyncio.ensure_future(self._fetch_all())
+        return (await asyncio.shield(self._fetching))[time_range]
+
+    async def _fetch_all(self) -> dict[str, list[Track]]:
+        responses = await asyncio.gather(
+            *(
+                client.sp.current_user_top_tracks(
+                    limit=_TOP_TRACKS_LIMIT, time_range=time_range
+                )
+                for time_range in TIME_RANGES
+            )
+        )
+        result = {}
+        for time_range, response in zip(TIME_RANGES, responses):
+            tracks = [
+                track
+                for track in map(Track.from_api, (response or {}).get("items", []))
+                if track
+            ]
+            self._cache.set(time_range, tracks)
+            result[time_range] = tracks
+        return result
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+
+top_tracks = per_user(lambda user: TopTracks())
+metrics.register_cache(
+    "top_tracks", totals(top_tracks, lambda t: (t._cache.hits, t._cache.misses))
+)
@@ -1,6 +1,7 @@
 import logging
 import random
 import re
+import unicodedata
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,3 +22,13 @@ def strip_playlist_uri(uri: str) -> str:
 
 def true_shuffle(uris: list[str]) -> list[str]:
     return random.sample(uris, len(uris))
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a name for matching: casefolded, accents stripped, punctuation
+    removed and whitespace collapsed.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[\W_]+", " ", stripped.casefold()).split())
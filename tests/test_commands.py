@@ -0,0 +1,109 @@
+import asyncio
+
+import commands
+from commands import CommandPipeline, _coalesce, _Command
+
+
+def _commands(*names: str) -> list[_Command]:
+    loop = asyncio.new_event_loop()
+    try:
+        return [_Command(name, loop.create_future()) for name in names]
+    finally:
+        loop.close()
+
+
+def _steps(*names: str) -> list[tuple[str, int]]:
+    return [(step.name, step.count) for step in _coalesce(_commands(*names))]
+
+
+def test_coalesce_merges_consecutive_skips():
+    assert _steps("next", "next", "next", "pause") == [("next", 3), ("pause", 1)]
+
+
+def test_coalesce_cancels_next_with_previous():
+    assert _steps("next", "previous") == [("next", 0)]
+    assert _steps("next", "next", "previous") == [("next", 1)]
+    assert _steps("previous", "previous") == [("previous", 2)]
+
+
+def test_coalesce_keeps_last_setting_between_skips():
+    steps = _steps("pause", "shuffle_on", "play", "shuffle_off", "next", "pause")
+    assert steps == [("play", 1), ("shuffle_off", 1), ("next", 1), ("pause", 1)]
+
+
+def test_coalesce_keeps_every_command():
+    batch = _commands("next", "pause", "next", "previous", "play")
+    steps = _coalesce(batch)
+    assert sorted(id(c) for s in steps for c in s.commands) == sorted(map(id, batch))
+
+
+class _FakeSpotify:
+    def __init__(self, playback: dict | None, queue: list[str], fail: int = 0):
+        self.playback = playback
+        self.upcoming = queue
+        self.fail = fail
+        self.played: list[dict] = []
+
+    async def current_playback(self) -> dict | None:
+        return self.playback
+
+    async def queue(self) -> dict:
+        return {"queue": [{"uri": uri} for uri in self.upcoming]}
+
+    async def start_playback(self, **kwargs) -> None:
+        if self.fail:
+            raise commands.SpotifyError(self.fail, "failed")
+        self.played.append(kwargs)
+
+
+class _FakeDevices:
+    async def run(self, command):
+        return await command(None)
+
+
+def _jump(monkeypatch, sp: _FakeSpotify, count: int) -> bool:
+    monkeypatch.setattr(commands.client, "sp", sp)
+    monkeypatch.setattr(commands, "device_registry", _FakeDevices())
+    return asyncio.run(CommandPipeline()._jump(count))
+
+
+def test_jump_plays_target_in_context(monkeypatch):
+    sp = _FakeSpotify({"context": {"uri": "ctx"}}, ["a", "b", "c", "d", "e"])
+    assert _jump(monkeypatch, sp, 4)
+    assert sp.played == [
+        {"device_id": None, "context_uri": "ctx", "offset": {"uri": "d"}}
+    ]
+
+
+def test_jump_falls_back_without_context_or_queue(monkeypatch):
+    assert not _jump(monkeypatch, _FakeSpotify({"context": None}, ["a"] * 5), 4)
+    assert not _jump(monkeypatch, _FakeSpotify({"context": {"uri": "c"}}, ["a"]), 4)
+    assert not _jump(monkeypatch, _FakeSpotify(None, []), 4)
+
+
+def test_jump_falls_back_when_target_not_in_context(monkeypatch):
+    sp = _FakeSpotify({"context": {"uri": "ctx"}}, ["a"] * 5, fail=400)
+    assert not _jump(monkeypatch, sp, 4)
+
+
+def test_cancelled_command_does_not_stop_dispatch():
+    async def run() -> list[dict]:
+        pipeline = CommandPipeline(window=0.01)
+        sent = []
+
+        async def send(step):
+            sent.append(step.name)
+            return step.name
+
+        pipeline._send = send  # type: ignore[method-assign]
+        cancelled = asyncio.ensure_future(pipeline.submit("pause"))
+        kept = asyncio.ensure_future(pipeline.submit("shuffle_on"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        first = await asyncio.wait_for(kept, 1)
+        second = await asyncio.wait_for(pipeline.submit("next"), 1)
+        assert sent == ["pause", "shuffle_on", "next"]
+        return [first, second]
+
+    first, second = asyncio.run(run())
+    assert first["status"] == second["status"] == "sent"
@@ -0,0 +1,122 @@
+import asyncio
+from pathlib import Path
+
+import httpx
+
+from etag_cache import ETagCache, ResponseMemory
+from metrics import Metrics
+from scheduler import RequestScheduler
+from singleflight import SingleFlight
+from spotify import AsyncSpotify
+
+
+class _Playlists:
+    """
+    Serves a playlist with an ETag, answering 304 when it is unchanged.
+    """
+
+    def __init__(self):
+        self.version = 1
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        etag = f'"v{self.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(
+            200, json={"name": f"Version {self.version}"}, headers={"ETag": etag}
+        )
+
+
+def _client(api: _Playlists, cache: ETagCache) -> AsyncSpotify:
+    async def token() -> str:
+        return "token"
+
+    sp = AsyncSpotify(
+        token,
+        request_scheduler=RequestScheduler(rate=1000, burst=100),
+        coalescer=SingleFlight(),
+        recorder=Metrics(),
+        response_cache=cache,
+    )
+    sp._http = httpx.AsyncClient(
+        base_url="https://api.test/v1/", transport=httpx.MockTransport(api)
+    )
+    return sp
+
+
+def test_unchanged_reads_are_revalidated(tmp_path: Path):
+    api = _Playlists()
+    cache = ETagCache(tmp_path / "cache.sqlite", ResponseMemory())
+    sp = _client(api, cache)
+
+    async def run() -> list[dict]:
+        first = await sp.playlist("p1")
+        second = await sp.playlist("p1")
+        # A caller modifying its copy must not change the cached body.
+        second["name"] = "Changed"
+        third = await sp.playlist("p1")
+        api.version = 2
+        fourth = await sp.playlist("p1")
+        await sp.aclose()
+        return [first, second, third, fourth]
+
+    first, _, third, fourth = asyncio.run(run())
+    assert first == third == {"name": "Version 1"}
+    assert fourth == {"name": "Version 2"}
+    sent = [r.headers.get("If-None-Match") for r in api.requests]
+    assert sent == [None, '"v1"', '"v1"', '"v1"']
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_disabled_cache_sends_plain_requests(tmp_path: Path):
+    api = _Playlists()
+    sp = _client(api, ETagCache(tmp_path / "cache.sqlite", ResponseMemory(0), 0))
+
+    async def run() -> None:
+        await sp.playlist("p1")
+        await sp.playlist("p1")
+        await sp.aclose()
+
+    asyncio.run(run())
+    assert [r.headers.get("If-None-Match") for r in api.requests] == [None, None]
+
+
+def test_bodies_spill_to_disk_and_return(tmp_path: Path):
+    memory = ResponseMemory(10)
+    cache = ETagCache(tmp_path / "cache.sqlite", memory, disk_bytes=100)
+    cache.put("a", "1", b"aaaaaaaa")
+    cache.put("b", "2", b"bbbbbbbb")
+    assert memory.keys(cache) == ["b"]
+    assert cache._disk_size == 8
+    entry = cache.get("a")
+    assert entry is not None and entry.body == b"aaaaaaaa"
+    assert memory.keys(cache) == ["a"]
+    assert cache.get("missing") is None
+
+
+def test_users_share_the_memory_budget(tmp_path: Path):
+    memory = ResponseMemory(20)
+    alice = ETagCache(tmp_path / "alice.sqlite", memory, disk_bytes=100)
+    bob = ETagCache(tmp_path / "bob.sqlite", memory, disk_bytes=100)
+    alice.put("playlists/p1", "1", b"a" * 8)
+    bob.put("playlists/p1", "1", b"b" * 8)
+    bob.put("playlists/p2", "2", b"b" * 8)
+    # Bob's reads pushed Alice's body out of memory, into her own database.
+    assert memory.size == 16
+    assert memory.keys(alice) == [] and alice._disk_size == 8
+    assert bob._disk_size == 0
+    entry = alice.get("playlists/p1")
+    assert entry is not None and entry.body == b"a" * 8
+    asyncio.run(alice.aclose())
+    assert memory.keys(alice) == [] and alice._disk_size == 8
+
+
+def test_disk_is_trimmed_to_its_budget(tmp_path: Path):
+    cache = ETagCache(tmp_path / "cache.sqlite", ResponseMemory(0), disk_bytes=20)
+    for key in "abcd":
+        cache.put(key, key, key.encode() * 8)
+    assert cache._disk_size <= 20
+    assert cache.get("a") is None
+    assert cache.get("d") is not None
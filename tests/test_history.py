@@ -0,0 +1,83 @@
+import asyncio
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+import history
+from history import ListeningHistory
+from metadata import MetadataStore
+
+
+def _play(uri: str, days_ago: float) -> dict:
+    played_at = datetime.fromtimestamp(time.time() - days_ago * 86400, UTC)
+    return {
+        "played_at": played_at.isoformat(timespec="milliseconds"),
+        "track": {"uri": uri, "name": uri, "artists": [{"name": "Artist"}]},
+    }
+
+
+class _FakeSpotify:
+    """
+    Serves the recently played tracks after a cursor, newest first.
+    """
+
+    def __init__(self, plays: list[dict]):
+        self.plays = plays
+        self.cursors: list[int | None] = []
+
+    async def current_user_recently_played(self, limit: int, after: int | None):
+        self.cursors.append(after)
+        newer = [
+            p
+            for p in self.plays
+            if after is None or history._played_at_ms(p["played_at"]) > after
+        ]
+        return {"items": newer[:limit], "cursors": None}
+
+
+def _history(monkeypatch, tmp_path: Path) -> ListeningHistory:
+    monkeypatch.setattr(
+        history, "metadata_store", MetadataStore(tmp_path / "metadata.sqlite")
+    )
+    return ListeningHistory(tmp_path / "history.sqlite")
+
+
+def test_plays_are_stored_once(monkeypatch, tmp_path: Path):
+    plays = _history(monkeypatch, tmp_path)
+    first = [_play("a", 2), _play("b", 1)]
+    assert plays._insert(first) == 2
+    # A later page repeats a play already stored.
+    assert plays._insert([first[1], _play("a", 0.5)]) == 1
+    assert plays.count() == 3
+    counts = {row["uri"]: row["plays"] for row in plays.play_counts(days=None)}
+    assert counts == {"a": 2, "b": 1}
+
+
+def test_collection_continues_after_the_newest_play(monkeypatch, tmp_path: Path):
+    plays = _history(monkeypatch, tmp_path)
+    sp = _FakeSpotify([_play("b", 1), _play("a", 2)])
+    monkeypatch.setattr(history.client, "sp", sp)
+    assert asyncio.run(plays.collect(force=True)) == 2
+    sp.plays.insert(0, _play("c", 0.1))
+    assert asyncio.run(plays.collect(force=True)) == 1
+    newest = history._played_at_ms(sp.plays[1]["played_at"])
+    assert sp.cursors == [None, newest]
+
+
+def test_trending_compares_recent_plays_with_the_baseline(monkeypatch, tmp_path):
+    plays = _history(monkeypatch, tmp_path)
+    # Plays are keyed by their time, so each is made on a different day.
+    plays._insert(
+        # Steady: once a week. Rising: three plays this week, one before.
+        [_play("steady", d) for d in (1, 8, 15, 22, 29)]
+        + [_play("rising", d) for d in (2, 3, 5, 10)]
+        # New this week, and played only before the window.
+        + [_play("new", 4)]
+        + [_play("old", 20)]
+    )
+    rows = plays.trending(days=7, baseline_days=28)
+    scores = {row["uri"]: row["score"] for row in rows}
+    # recent / (baseline * 7 / 28 + 1)
+    assert scores == {"rising": 2.4, "new": 1.0, "steady": 0.5}
+    assert [row["uri"] for row in rows] == ["rising", "new", "steady"]
+    assert rows[0]["recent_plays"] == 3 and rows[0]["baseline_plays"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+from pathlib import Path
+
+import library
+from library import SavedTracksMirror
+from metadata import MetadataStore
+
+
+class _FakeSpotify:
+    """
+    Serves saved tracks, newest first, as Spotify pages them.
+    """
+
+    def __init__(self, saved: list[tuple[str, str]]):
+        # (added_at, uri) pairs, oldest first.
+        self.saved = saved
+        self.offsets: list[int] = []
+
+    async def current_user_saved_tracks(
+        self, limit: int, offset: int, market: str
+    ) -> dict:
+        self.offsets.append(offset)
+        page = self.saved[::-1][offset : offset + limit]
+        return {
+            "items": [
+                {"added_at": added_at, "track": {"uri": uri, "name": uri}}
+                for added_at, uri in page
+            ],
+            "total": len(self.saved),
+            "next": "more" if offset + limit < len(self.saved) else None,
+        }
+
+
+def _mirror(monkeypatch, tmp_path: Path, sp: _FakeSpotify) -> SavedTracksMirror:
+    monkeypatch.setattr(library.client, "sp", sp)
+    monkeypatch.setattr(
+        library, "metadata_store", MetadataStore(tmp_path / "metadata.sqlite")
+    )
+    return SavedTracksMirror(tmp_path / "library.sqlite")
+
+
+def _saved(start: int, stop: int) -> list[tuple[str, str]]:
+    # One track added per second.
+    return [
+        (f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}Z", f"spotify:track:{i}")
+        for i in range(start, stop)
+    ]
+
+
+def test_sync_reads_only_the_new_pages(monkeypatch, tmp_path: Path):
+    sp = _FakeSpotify(_saved(0, 120))
+    mirror = _mirror(monkeypatch, tmp_path, sp)
+    assert asyncio.run(mirror.sync()) == 120
+    sp.saved += _saved(120, 180)
+    sp.offsets.clear()
+    assert asyncio.run(mirror.sync(force=True)) == 180
+    # 60 new tracks: the second page of 50 reaches the mirrored ones.
+    assert sp.offsets == [0, 50]
+    assert mirror.uris()[:2] == ["spotify:track:179", "spotify:track:178"]
+
+
+def test_tracks_added_in_the_same_second_are_kept(monkeypatch, tmp_path: Path):
+    sp = _FakeSpotify(_saved(0, 3))
+    mirror = _mirror(monkeypatch, tmp_path, sp)
+    asyncio.run(mirror.sync())
+    sp.saved.append((sp.saved[-1][0], "spotify:track:same-second"))
+    sp.offsets.clear()
+    assert asyncio.run(mirror.sync(force=True)) == 4
+    assert sp.offsets == [0]
+    assert "spotify:track:same-second" in mirror.uris()
+
+
+def test_removed_tracks_trigger_a_reimport(monkeypatch, tmp_path: Path):
+    sp = _FakeSpotify(_saved(0, 10))
+    mirror = _mirror(monkeypatch, tmp_path, sp)
+    asyncio.run(mirror.sync())
+    # The oldest track is removed: nothing is new, but the totals disagree.
+    sp.saved = sp.saved[1:]
+    assert asyncio.run(mirror.sync(force=True)) == 9
+    assert "spotify:track:0" not in mirror.uris()
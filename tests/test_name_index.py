@@ -0,0 +1,37 @@
+from name_index import NameIndex, similarity
+
+
+def _index() -> NameIndex:
+    return NameIndex(
+        [
+            ("p1", "Chill Vibes"),
+            ("p2", "Workout Mix"),
+            ("p3", "chill vibes"),
+            ("p4", "Late Night Jazz"),
+            ("p5", "Chill Vibes 2"),
+        ]
+    )
+
+
+def test_duplicate_names_are_all_returned():
+    matches = _index().search("Chill Vibes", k=5)
+    # Both exact matches score 1 and keep their indexing order.
+    assert [(m.id, m.score) for m in matches[:2]] == [("p1", 1.0), ("p3", 1.0)]
+    assert matches[2].id == "p5"
+    assert [m.id for m in _index().exact("CHILL  vibes")] == ["p1", "p3"]
+
+
+def test_fuzzy_matches_are_ranked_and_cut_off():
+    index = _index()
+    assert index.search("late nite jazz", k=1)[0].id == "p4"
+    best = index.search("workout", k=1)[0]
+    assert best.id == "p2"
+    assert best.score == round(similarity("workout", "Workout Mix"), 3)
+    assert index.search("classical opera", cutoff=0.5) == []
+    assert len(index.search("chill", k=2)) == 2
+
+
+def test_empty_queries_and_indexes_match_nothing():
+    assert _index().search("") == []
+    assert NameIndex([]).search("Chill Vibes") == []
+    assert similarity("", "Chill Vibes") == 0.0
@@ -0,0 +1,57 @@
+import asyncio
+
+from pagination import paginate
+
+
+class _Collection:
+    """
+    Serves an offset-paged collection, later pages answering sooner.
+    """
+
+    def __init__(self, size: int, total: int | None = None):
+        self.size = size
+        self.total = size if total is None else total
+        self.offsets: list[int] = []
+        self.in_flight = 0
+        self.most_in_flight = 0
+
+    async def __call__(self, limit: int, offset: int) -> dict:
+        self.offsets.append(offset)
+        self.in_flight += 1
+        self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        await asyncio.sleep(0.001 * (self.size - offset) / limit)
+        self.in_flight -= 1
+        items = list(range(offset, min(offset + limit, self.size)))
+        return {"items": items, "total": self.total}
+
+
+def test_pages_are_reassembled_in_order():
+    collection = _Collection(95)
+    items = asyncio.run(paginate(collection, limit=10, max_concurrency=3))
+    assert items == list(range(95))
+    assert collection.offsets[0] == 0
+    assert sorted(collection.offsets) == list(range(0, 95, 10))
+    assert collection.most_in_flight == 3
+
+
+def test_first_page_total_decides_the_requests():
+    # No total, or one within the first page, means a single request.
+    for total in (0, 10):
+        collection = _Collection(10, total=total)
+        assert asyncio.run(paginate(collection, limit=10)) == list(range(10))
+        assert collection.offsets == [0]
+
+
+def test_items_are_projected_and_dropped():
+    collection = _Collection(30)
+    items = asyncio.run(
+        paginate(collection, limit=10, project=lambda i: None if i % 2 else f"item {i}")
+    )
+    assert items == [f"item {i}" for i in range(0, 30, 2)]
+
+
+def test_empty_responses_yield_no_items():
+    async def fetch_page(limit: int, offset: int) -> dict:
+        return {}
+
+    assert asyncio.run(paginate(fetch_page)) == []
@@ -0,0 +1,85 @@
+import asyncio
+from pathlib import Path
+
+import playlist_writer
+from playlist_writer import PlaylistWriter
+
+
+class _LostResponse(Exception):
+    pass
+
+
+class _FakeSpotify:
+    """
+    A playlist whose next addition can fail before or after it is applied.
+    """
+
+    def __init__(self, tracks: list[str]):
+        self.tracks = tracks
+        self.version = 0
+        # "before" fails the next addition, "after" applies it, then fails.
+        self.fail: str | None = None
+
+    async def playlist(self, playlist_id: str, fields: str) -> dict:
+        return {
+            "snapshot_id": f"s{self.version}",
+            "tracks": {"total": len(self.tracks)},
+        }
+
+    async def playlist_add_items(self, playlist_id: str, uris: list[str]) -> dict:
+        fail, self.fail = self.fail, None
+        if fail == "before":
+            raise _LostResponse("Connection reset")
+        self.tracks += uris
+        self.version += 1
+        if fail == "after":
+            raise _LostResponse("Read timed out")
+        return {"snapshot_id": f"s{self.version}"}
+
+
+def _uris(count: int) -> list[str]:
+    return [f"spotify:track:{i}" for i in range(count)]
+
+
+def _write_and_resume(
+    monkeypatch, tmp_path: Path, sp: _FakeSpotify, fail: str, between=None
+) -> PlaylistWriter:
+    monkeypatch.setattr(playlist_writer.client, "sp", sp)
+    writer = PlaylistWriter(tmp_path / "jobs.sqlite", chunk_size=2)
+
+    async def run() -> None:
+        await writer.write("p1", _uris(2))
+        sp.fail = fail
+        job = await writer.write("p1", _uris(6)[2:])
+        assert job.error is not None and job.written == 0
+        if between is not None:
+            between()
+        job = await writer.resume(job.id)
+        assert job.done
+        assert writer.pending() == []
+
+    asyncio.run(run())
+    return writer
+
+
+def test_resume_skips_a_chunk_applied_despite_the_error(monkeypatch, tmp_path):
+    sp = _FakeSpotify([])
+    _write_and_resume(monkeypatch, tmp_path, sp, "after")
+    assert sp.tracks == _uris(6)
+
+
+def test_resume_resends_a_chunk_that_was_not_applied(monkeypatch, tmp_path):
+    sp = _FakeSpotify([])
+    _write_and_resume(monkeypatch, tmp_path, sp, "before")
+    assert sp.tracks == _uris(6)
+
+
+def test_resume_after_other_changes_continues_from_confirmed(monkeypatch, tmp_path):
+    sp = _FakeSpotify([])
+
+    def edit_elsewhere() -> None:
+        sp.tracks.append("spotify:track:other")
+        sp.version += 1
+
+    _write_and_resume(monkeypatch, tmp_path, sp, "before", edit_elsewhere)
+    assert sp.tracks == _uris(2) + ["spotify:track:other"] + _uris(6)[2:]
@@ -0,0 +1,39 @@
+import asyncio
+
+from scheduler import Priority, RequestScheduler
+
+
+def test_waiters_are_served_in_priority_order():
+    async def run() -> list[Priority]:
+        scheduler = RequestScheduler(rate=50, burst=1, bulk_reserve=0)
+        # Spend the only token, so that the next requests queue up.
+        await scheduler.acquire()
+        served: list[Priority] = []
+
+        async def request(level: Priority) -> None:
+            await scheduler.acquire(level)
+            served.append(level)
+
+        levels = [Priority.BULK, Priority.DEFAULT, Priority.INTERACTIVE]
+        await asyncio.gather(*(request(level) for level in levels))
+        return served
+
+    assert asyncio.run(run()) == [
+        Priority.INTERACTIVE,
+        Priority.DEFAULT,
+        Priority.BULK,
+    ]
+
+
+def test_bulk_requests_leave_the_reserve():
+    async def run() -> tuple[bool, bool]:
+        scheduler = RequestScheduler(rate=1, burst=3, bulk_reserve=2)
+        await scheduler.acquire(Priority.BULK)
+        bulk = asyncio.ensure_future(scheduler.acquire(Priority.BULK))
+        interactive = asyncio.ensure_future(scheduler.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0.1)
+        done = interactive.done(), bulk.done()
+        bulk.cancel()
+        return done
+
+    assert asyncio.run(run()) == (True, False)
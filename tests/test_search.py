@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+import search
+from search import SearchEngine
+
+
+def _track(uri: str, name: str, artist: str, popularity: int) -> dict:
+    return {
+        "uri": f"spotify:track:{uri}",
+        "name": name,
+        "artists": [{"name": artist}],
+        "popularity": popularity,
+    }
+
+
+ORIGINAL = _track("original", "Dancing Queen", "ABBA", 80)
+KARAOKE = _track("karaoke", "Dancing Queen", "Karaoke Stars", 95)
+LIVE = _track("live", "Dancing Queen - Live", "ABBA", 40)
+
+
+class _FakeSpotify:
+    """
+    Answers each (query, market) search from a table, recording the searches.
+    """
+
+    def __init__(self, results: dict[tuple[str, str | None], list[dict | None]]):
+        self.results = results
+        self.searches: list[tuple[str, str | None]] = []
+
+    async def search(self, q: str, type: str, limit: int, market: str | None):
+        self.searches.append((q, market))
+        if (q, market) not in self.results:
+            raise Exception(f"Search for {q!r} failed")
+        return {f"{type}s": {"items": self.results[(q, market)]}}
+
+
+def _tracks(monkeypatch, sp: _FakeSpotify, k: int, cutoff: float = 0.0):
+    monkeypatch.setattr(search.client, "sp", sp)
+    return asyncio.run(SearchEngine().tracks("ABBA", "Dancing Queen", k, cutoff))
+
+
+STRICT = "artist:ABBA track:Dancing Queen"
+LOOSE = "ABBA Dancing Queen"
+
+
+def test_strict_query_alone_when_it_finds_enough(monkeypatch):
+    sp = _FakeSpotify({(STRICT, "from_token"): [ORIGINAL, None, LIVE]})
+    hits = _tracks(monkeypatch, sp, k=1, cutoff=0.9)
+    assert [hit.uri for hit in hits] == ["spotify:track:original"]
+    assert sp.searches == [(STRICT, "from_token")]
+
+
+def test_fallbacks_are_merged_and_ranked(monkeypatch):
+    sp = _FakeSpotify(
+        {
+            (STRICT, "from_token"): [],
+            (STRICT, None): [LIVE, ORIGINAL],
+            (LOOSE, "from_token"): [KARAOKE, ORIGINAL],
+        }
+    )
+    hits = _tracks(monkeypatch, sp, k=5)
+    assert sorted(sp.searches[1:], key=str) == [
+        (LOOSE, "from_token"),
+        (STRICT, None),
+    ]
+    # The original recording beats a more popular karaoke version, and
+    # appears once although two strategies found it.
+    assert [hit.uri.rsplit(":", 1)[1] for hit in hits] == [
+        "original",
+        "live",
+        "karaoke",
+    ]
+    assert hits[0].score == round(0.5 + 0.3 + 0.2 * 0.8, 3)
+
+
+def test_failed_strategies_are_skipped_until_all_fail(monkeypatch):
+    sp = _FakeSpotify({(LOOSE, "from_token"): [ORIGINAL]})
+    assert [hit.uri for hit in _tracks(monkeypatch, sp, k=1)] == [ORIGINAL["uri"]]
+    with pytest.raises(Exception, match="failed"):
+        _tracks(monkeypatch, _FakeSpotify({}), k=1)
+
+
+def test_playlists_rank_by_name_then_spotify_order(monkeypatch):
+    def playlist(uri: str, name: str) -> dict:
+        return {
+            "id": uri,
+            "uri": f"spotify:playlist:{uri}",
+            "name": name,
+            "snapshot_id": "s",
+        }
+
+    sp = _FakeSpotify(
+        {
+            ("Top 50", "from_token"): [
+                playlist("fan", "Top 50 Fan Picks"),
+                None,
+                playlist("top", "Top 50"),
+            ],
+            ("Top 50", None): [playlist("top", "Top 50")],
+        }
+    )
+    monkeypatch.setattr(search.client, "sp", sp)
+    hits = asyncio.run(SearchEngine().playlists("Top 50", k=1, cutoff=0.5))
+    assert [hit.uri for hit in hits] == ["spotify:playlist:top"]
+    assert sp.searches == [("Top 50", "from_token")]
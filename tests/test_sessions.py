@@ -0,0 +1,87 @@
+import asyncio
+
+import sessions
+from sessions import SessionPool, as_user, background
+
+
+class _State:
+    def __init__(self, user: str | None):
+        self.user = user
+        self.closed = False
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+def test_least_recently_used_session_is_evicted():
+    async def run() -> tuple[SessionPool, dict[str, _State]]:
+        pool = SessionPool(max_sessions=2, idle_timeout=3600)
+        states = {}
+        for user in ("alice", "bob", "alice", "carol"):
+            with as_user(user):
+                states[user] = pool.state("key", _State)
+        await pool.aclose()
+        return pool, states
+
+    pool, states = asyncio.run(run())
+    assert states["bob"].closed
+    assert pool.evictions == 3
+
+
+def test_evicted_user_gets_a_new_instance():
+    async def run() -> tuple[_State, _State, list[str | None]]:
+        pool = SessionPool(max_sessions=1, idle_timeout=3600)
+        with as_user("alice"):
+            first = pool.state("key", _State)
+        with as_user("bob"):
+            pool.state("key", _State)
+        users = pool.users()
+        with as_user("alice"):
+            second = pool.state("key", _State)
+        await asyncio.sleep(0)
+        return first, second, users
+
+    first, second, users = asyncio.run(run())
+    assert users == ["bob"]
+    assert first.closed and not second.closed
+    assert first is not second
+
+
+def test_idle_sessions_are_evicted(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: now)
+
+    async def run() -> list[str | None]:
+        nonlocal now
+        pool = SessionPool(max_sessions=10, idle_timeout=60)
+        with as_user("alice"):
+            pool.state("key", _State)
+        now += 30
+        with as_user("bob"):
+            pool.state("key", _State)
+        now += 45
+        with as_user("carol"):
+            pool.state("key", _State)
+        return pool.users()
+
+    assert asyncio.run(run()) == ["carol", "bob"]
+
+
+def test_background_use_does_not_keep_a_session_alive(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(sessions.time, "monotonic", lambda: now)
+
+    async def run() -> list[str | None]:
+        nonlocal now
+        pool = SessionPool(max_sessions=10, idle_timeout=60)
+        with as_user("alice"):
+            pool.state("key", _State)
+        for _ in range(3):
+            now += 30
+            with as_user("alice"), background():
+                pool.state("key", _State)
+        with as_user("bob"):
+            pool.state("key", _State)
+        return pool.users()
+
+    assert asyncio.run(run()) == ["bob"]
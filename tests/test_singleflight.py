@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    async def run() -> tuple[list[int], int, SingleFlight]:
+        flight = SingleFlight()
+        started = 0
+
+        async def fetch() -> int:
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.01)
+            return 42
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        return list(results), started, flight
+
+    results, started, flight = asyncio.run(run())
+    assert results == [42] * 5
+    assert started == 1
+    assert (flight.calls, flight.shared) == (5, 4)
+
+
+def test_different_keys_and_later_calls_are_not_shared():
+    async def run() -> int:
+        flight = SingleFlight()
+        started = 0
+
+        async def fetch() -> None:
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0)
+
+        await asyncio.gather(flight.do("a", fetch), flight.do("b", fetch))
+        await flight.do("a", fetch)
+        return started
+
+    assert asyncio.run(run()) == 3
+
+
+def test_errors_reach_every_caller():
+    async def run() -> list:
+        flight = SingleFlight()
+
+        async def fail() -> None:
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(
+            *(flight.do("key", fail) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def run() -> str:
+        flight = SingleFlight()
+
+        async def fetch() -> str:
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"